@@ -0,0 +1,68 @@
+# Licensed under MIT.
+"""Benchmark memory use of PsqlWrapper output interception over a simulated \
+hour-long psql session.
+
+Run with `poetry run python benchmarks/bench_memory.py`.
+"""
+
+import tracemalloc
+
+from pg4n.psqlparser import PsqlParser
+from pg4n.psqlwrapper import PsqlWrapper
+
+# A query every 3 seconds for an hour
+QUERIES: int = 1200
+SAMPLE_EVERY: int = 100
+RESULT_ROWS: int = 50
+
+PSQL_START: bytes = \
+    b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# '
+PROMPT: bytes = b'\x1b[?2004hpgdb=# '
+RETURN: bytes = b'\r\n\x1b[?2004l\r'
+
+
+def simulate_query(psql: PsqlWrapper, i: int) -> None:
+    """Type a query key by key, send it, and print its results."""
+    query: bytes = \
+        bytes(f"SELECT * FROM orders WHERE order_id = {i};", "utf-8")
+    for key in query:
+        psql._input(bytes([key]))
+        psql._intercept(bytes([key]))
+    psql._input(b'\r')
+    psql._intercept(RETURN)
+    psql._intercept(
+        b' order_id | order_total_eur | customer_id \r\n'
+        + b'----------+-----------------+-------------\r\n'
+        + bytes(f'{i:>9} |          471.12 |         179\r\n', 'utf-8')
+        * RESULT_ROWS
+        + bytes(f'({RESULT_ROWS} rows)\r\n\r\n', 'utf-8')
+    )
+    psql._intercept(PROMPT)
+
+
+def main() -> None:
+    """Print traced memory at intervals of the session."""
+    tracemalloc.start()
+    psql = PsqlWrapper("",
+                       lambda query: "Warning: message",
+                       lambda error: "",
+                       PsqlParser())
+    psql._intercept(PSQL_START)
+
+    print(f"{'queries':>8} {'current KiB':>12} {'peak KiB':>9}")
+    baseline: int = 0
+    for i in range(1, QUERIES + 1):
+        simulate_query(psql, i)
+        if i % SAMPLE_EVERY == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            if i == SAMPLE_EVERY:
+                baseline = current
+            print(f"{i:>8} {current / 1024:>12.1f} {peak / 1024:>9.1f}")
+
+    current, _ = tracemalloc.get_traced_memory()
+    print(f"growth after first {SAMPLE_EVERY} queries: "
+          f"{(current - baseline) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
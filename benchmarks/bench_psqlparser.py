@@ -0,0 +1,59 @@
+# Licensed under MIT.
+"""Benchmark PsqlParser screen-scraping against amount of output above the \
+latest statement.
+
+Run with `poetry run python benchmarks/bench_psqlparser.py`.
+"""
+
+import timeit
+
+from pg4n.psqlparser import PsqlParser
+
+# Screens as screen-scraped from psql, with rows of earlier query results
+# above the latest statement.
+RESULT_ROW: str = "       21 |          471.12 |         179\n"
+STMT: str = \
+    "pgdb=# SELECT * FROM orders\npgdb-# WHERE order_total_eur = 100;\n\n"
+SYNTAX_ERROR: str = (
+    "pgdb=# SELEC * FROM orders;\n"
+    "ERROR:  syntax error at or near \"SELEC\"\n"
+    "LINE 1: SELEC * FROM orders;\n"
+    "        ^\n"
+    "pgdb=# "
+)
+ROWS_ABOVE: list[int] = [0, 100, 1000, 10000, 100000]
+REPEATS: int = 200
+
+
+def screen(rows_above: int, latest: str) -> str:
+    """Build a screen with `rows_above` result rows above `latest`."""
+    return (
+        "pgdb=# SELECT * FROM orders;\n"
+        + RESULT_ROW * rows_above
+        + "(" + str(rows_above) + " rows)\n\n"
+        + latest
+    )
+
+
+def main() -> None:
+    """Print microseconds per call for each screen size."""
+    parser = PsqlParser()
+    print(f"{'rows above':>10} {'parse_last_stmt':>16} "
+          f"{'parse_syntax_error':>19}")
+    for rows_above in ROWS_ABOVE:
+        stmt_screen: str = screen(rows_above, STMT)
+        error_screen: str = screen(rows_above, SYNTAX_ERROR)
+        assert parser.parse_last_stmt(stmt_screen) != ""
+        assert parser.parse_syntax_error(error_screen) != ""
+
+        stmt_us: float = timeit.timeit(
+            lambda: parser.parse_last_stmt(stmt_screen), number=REPEATS
+        ) / REPEATS * 1e6
+        error_us: float = timeit.timeit(
+            lambda: parser.parse_syntax_error(error_screen), number=REPEATS
+        ) / REPEATS * 1e6
+        print(f"{rows_above:>10} {stmt_us:>14.1f}us {error_us:>17.1f}us")
+
+
+if __name__ == "__main__":
+    main()
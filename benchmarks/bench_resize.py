@@ -0,0 +1,69 @@
+# Licensed under MIT.
+"""Benchmark resizing PsqlWrapper's emulated screen in place against \
+rebuilding it from the session's output.
+
+Run with `poetry run python benchmarks/bench_resize.py`.
+"""
+
+import timeit
+
+from pg4n.psqlparser import PsqlParser
+from pg4n.psqlwrapper import PsqlWrapper
+
+PROMPT: bytes = b'\x1b[?2004hpgdb=# '
+QUERIES: int = 200
+REPEATS: int = 200
+SIZES: list[tuple[int, int]] = [(120, 40), (80, 24)]
+
+
+def session_output() -> list[bytes]:
+    """Build output of a session with some queries and their results."""
+    output: list[bytes] = [
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n' + PROMPT
+    ]
+    for i in range(QUERIES):
+        output.append(bytes(f'SELECT * FROM orders WHERE order_id = {i};',
+                            'utf-8'))
+        output.append(b'\r\n\x1b[?2004l\r')
+        output.append(
+            b' order_id | order_total_eur | customer_id \r\n'
+            b'----------+-----------------+-------------\r\n'
+            + bytes(f'{i:>9} |          471.12 |         179\r\n', 'utf-8')
+            + b'(1 row)\r\n\r\n' + PROMPT
+        )
+    output.append(b'SELECT * FROM orders WHERE order_total_eur = 100')
+    return output
+
+
+def main() -> None:
+    """Print time per resize for both approaches."""
+    output: list[bytes] = session_output()
+    psql = PsqlWrapper("", lambda query: "", lambda error: "", PsqlParser(),
+                       dimensions=SIZES[-1])
+    for chunk in output:
+        psql._intercept(chunk)
+    sizes = iter(SIZES * REPEATS)
+
+    def resize_in_place() -> None:
+        psql.resize(*next(sizes))
+        psql._intercept(b'0')
+
+    def rebuild() -> None:
+        (cols, rows) = next(sizes)
+        psql.pyte_screen.reset()
+        psql.pyte_screen.resize(rows, cols)
+        for chunk in output:
+            psql.pyte_screen_output_sink.feed(bytes.decode(chunk))
+
+    in_place_us: float = \
+        timeit.timeit(resize_in_place, number=REPEATS) / REPEATS * 1e6
+    sizes = iter(SIZES * REPEATS)
+    rebuild_us: float = \
+        timeit.timeit(rebuild, number=REPEATS // 10) / (REPEATS // 10) * 1e6
+
+    print(f"resize in place:           {in_place_us:>10.1f}us")
+    print(f"rebuild from {QUERIES} queries: {rebuild_us:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Licensed under MIT.
+"""Benchmark pg4n's time-to-prompt and import cost per module.
+
+A stand-in psql that prints its prompt right away is put first in PATH, so
+that time-to-prompt only measures pg4n itself. Exits with an error if
+time-to-prompt exceeds `--max-ms`.
+
+Run with `poetry run python benchmarks/bench_startup.py`.
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import pexpect
+
+FAKE_PSQL: str = """#!/bin/sh
+if [ "$1" = "--version" ]; then
+    echo "psql (PostgreSQL) 14.5"
+    exit 0
+fi
+printf 'psql (14.5)\\r\\nType "help" for help.\\r\\n\\r\\npgdb=# '
+read line
+"""
+RUNS: int = 5
+
+
+def time_to_prompt(bin_dir: str) -> float:
+    """Start pg4n and wait for psql prompt.
+
+    :returns: milliseconds from spawning pg4n to the prompt.
+    """
+    env: dict[str, str] = dict(os.environ)
+    env["PATH"] = bin_dir + os.pathsep + env["PATH"]
+    start: float = time.perf_counter()
+    pg4n = pexpect.spawn(
+        sys.executable, ["-m", "pg4n.main", "pgdb"], env=env, timeout=30
+    )
+    pg4n.expect_exact("pgdb=# ")
+    elapsed_ms: float = (time.perf_counter() - start) * 1000
+    pg4n.sendline("")
+    pg4n.expect(pexpect.EOF)
+    return elapsed_ms
+
+
+def import_times(module: str) -> list[tuple[int, str]]:
+    """Get cumulative import time of each top-level import of `module`.
+
+    :returns: (microseconds, module) pairs, slowest first.
+    """
+    stderr: str = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        capture_output=True, text=True, check=True
+    ).stderr
+    times: list[tuple[int, str]] = []
+    for line in stderr.splitlines():
+        if m := re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line):
+            # direct imports are indented by one level
+            if len(m.group(2)) <= 3:
+                times.append((int(m.group(1)), m.group(3)))
+    return sorted(times, reverse=True)
+
+
+def main() -> None:
+    """Print import costs and time-to-prompt."""
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--max-ms", type=float, default=400.0,
+                            help="fail if median time-to-prompt is slower")
+    args = arg_parser.parse_args()
+
+    for module in ["pg4n.main", "pg4n.semanticrouter"]:
+        print(f"import {module}:")
+        for micros, name in import_times(module)[:8]:
+            print(f"  {micros / 1000:>8.1f}ms {name}")
+
+    with tempfile.TemporaryDirectory() as bin_dir:
+        psql_path: str = os.path.join(bin_dir, "psql")
+        with open(psql_path, "w") as psql_file:
+            psql_file.write(FAKE_PSQL)
+        os.chmod(psql_path, 0o755)
+        time_to_prompt(bin_dir)  # fills psql version cache
+        times: list[float] = sorted(
+            time_to_prompt(bin_dir) for _ in range(RUNS)
+        )
+
+    median_ms: float = times[len(times) // 2]
+    print(f"time-to-prompt: median {median_ms:.1f}ms, "
+          f"min {times[0]:.1f}ms, max {times[-1]:.1f}ms")
+    if median_ms > args.max_ms:
+        print(f"time-to-prompt regressed over {args.max_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
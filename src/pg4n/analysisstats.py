@@ -0,0 +1,53 @@
+# Licensed under MIT.
+"""Keep count of how semantic analysis has performed this session."""
+
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class AnalysisStats:
+    """Counters updated by every analysis, from any thread."""
+
+    analyses: int = 0
+    findings: int = 0
+    # analyses that reused work done while query was being typed
+    prepared: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def record(self, elapsed_ms: float, found: bool, prepared: bool) -> None:
+        """Count an analysis.
+
+        :param elapsed_ms: is how long the analysis took.
+        :param found: is if the analysis found an issue.
+        :param prepared: is if the analysis was prepared while typing.
+        """
+        with self._lock:
+            self.analyses += 1
+            self.findings += found
+            self.prepared += prepared
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def reset(self) -> None:
+        """Start counting from zero."""
+        with self._lock:
+            self.analyses = self.findings = self.prepared = 0
+            self.total_ms = self.max_ms = 0.0
+
+    def summary(self) -> str:
+        """Get the counters as human-readable lines."""
+        with self._lock:
+            mean_ms: float = \
+                self.total_ms / self.analyses if self.analyses else 0.0
+            return (
+                f"analyses:    {self.analyses}"
+                f" ({self.findings} with findings,"
+                f" {self.prepared} prepared while typing)\n"
+                f"time:        {self.total_ms:.1f} ms total,"
+                f" {mean_ms:.1f} ms mean, {self.max_ms:.1f} ms max"
+            )
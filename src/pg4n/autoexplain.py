@@ -0,0 +1,238 @@
+# Licensed under MIT.
+"""Harvest query plans from psql's own session with auto_explain.
+
+psql is started with a psqlrc that loads auto_explain and has it log the
+plan of every query as a JSON notice. The notices are cut out of psql's
+output, so queries run only once and still get analyzed with their actual
+plans.
+
+auto_explain's settings can only be changed by superusers (or users granted
+the right to set them), and others can only load it from `$libdir/plugins`.
+If it cannot be set up, psqlrc prints `setup_failed_notice` instead of an
+error, and queries are analyzed without plans. psql does not read psqlrc
+with `-X`, and other databases psql connects to with `\\c` do not load it.
+
+Plans are only recognized in notices of psql's default VERBOSITY.
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Optional
+
+
+class AutoExplain:
+    """Startup file that turns auto_explain on, and a filter that takes \
+    the plans it logs out of psql's output."""
+
+    setup_commands: list[str] = [
+        "LOAD 'auto_explain';",
+        "SET auto_explain.log_min_duration = 0;",
+        "SET auto_explain.log_format = json;",
+        "SET auto_explain.log_level = notice;",
+    ]
+    # printed by psql at startup if setup_commands failed
+    setup_failed_notice: str = "pg4n: auto_explain could not be set up, " \
+        "so queries are planned with EXPLAIN instead."
+
+    # per auto_explain's explain_ExecutorEnd, as psql prints notices
+    notice_start: bytes = b"NOTICE:  duration: "
+    _notice_header: re.Pattern = re.compile(
+        rb"NOTICE:  duration: \d+\.\d+ ms  plan:\r?\n"
+    )
+
+    # tmpfs keeps the startup file off the disk
+    tmpfs_dir: str = "/dev/shm"
+
+    def __init__(self, psql_version: str, directory: Optional[str] = None):
+        """Write a psqlrc that sets up auto_explain, and then runs user's \
+        own psqlrc like psql would.
+
+        :param psql_version: is used for finding version-specific psqlrc \
+        files, e.g `~/.psqlrc-14`.
+        :param directory: is where the file is placed, by default on tmpfs \
+        if available.
+        """
+        if directory is None and os.path.isdir(self.tmpfs_dir):
+            directory = self.tmpfs_dir
+        self.dir: str = tempfile.mkdtemp(prefix="pg4n-", dir=directory)
+        self.psqlrc: str = os.path.join(self.dir, "psqlrc")
+
+        # errors are caught, so that they are not printed at every start
+        lines: list[str] = [
+            "\\set pg4n_quiet :QUIET",
+            "\\set QUIET on",
+            "DO $pg4n$ BEGIN",
+            *self.setup_commands,
+            "EXCEPTION WHEN OTHERS THEN NULL;",
+            "END $pg4n$;",
+            "SELECT current_setting('auto_explain.log_level', true)",
+            "    IS DISTINCT FROM 'notice' AS pg4n_setup_failed \\gset",
+            "\\if :pg4n_setup_failed",
+            "\\echo '" + self.setup_failed_notice + "'",
+            "\\endif",
+            "\\unset pg4n_setup_failed",
+            "\\set QUIET :pg4n_quiet",
+            "\\unset pg4n_quiet",
+        ]
+        user_psqlrc: Optional[str] = self._user_psqlrc(psql_version)
+        if user_psqlrc is not None:
+            lines.append("\\i '" + user_psqlrc.replace("'", "''") + "'")
+        fd: int = os.open(self.psqlrc, os.O_WRONLY | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "w") as psqlrc_file:
+            psqlrc_file.write("\n".join(lines) + "\n")
+
+        self.plans: list[dict] = []
+        self._carry: bytes = b""
+        # JSON plan being cut out, and how far it has been scanned
+        self._plan: Optional[bytearray] = None
+        self._depth: int = 0
+        self._in_string: bool = False
+        self._escape: bool = False
+        # rest of the line break ending a plan, which may come in next output
+        self._line_end: bytes = b""
+
+    @staticmethod
+    def _user_psqlrc(psql_version: str) -> Optional[str]:
+        """Find the psqlrc psql would read, per psql's `process_psqlrc`."""
+        psqlrc: str = os.path.expanduser(
+            os.getenv("PSQLRC") or os.path.join("~", ".psqlrc")
+        )
+        major: str = psql_version.split(".")[0]
+        for candidate in (f"{psqlrc}-{psql_version}", f"{psqlrc}-{major}",
+                          psqlrc):
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def psql_env(self) -> dict[str, str]:
+        """Get environment psql is started with, so it reads the psqlrc."""
+        return dict(os.environ, PSQLRC=self.psqlrc)
+
+    def feed(self, output: bytes) -> bytes:
+        """Cut plan notices out of psql output.
+
+        A chunk ending in what could be the start of a notice is held back
+        until the next call, so call `flush` once psql is not running
+        anything.
+
+        :param output: is psql output.
+        :returns: output without plan notices.
+        """
+        data: bytes = self._carry + output
+        self._carry = b""
+        kept: list[bytes] = []
+        i: int = 0
+        while i < len(data):
+            if self._line_end != b"":
+                i = self._skip_line_end(data, i)
+                continue
+            if self._plan is not None:
+                i = self._scan_plan(data, i)
+                continue
+
+            start: int = data.find(self.notice_start, i)
+            if start == -1:
+                held: int = self._partial_notice_len(data, i)
+                kept.append(data[i:len(data) - held])
+                self._carry = data[len(data) - held:]
+                break
+            kept.append(data[i:start])
+
+            header: Optional[re.Match] = \
+                self._notice_header.match(data, start)
+            if header is None:
+                line_end: int = data.find(b"\n", start)
+                if line_end == -1:  # rest of the notice comes later
+                    self._carry = data[start:]
+                    break
+                kept.append(data[start:line_end + 1])  # some other notice
+                i = line_end + 1
+                continue
+
+            self._plan = bytearray()
+            self._depth = 0
+            self._in_string = False
+            self._escape = False
+            i = header.end()
+        return b"".join(kept)
+
+    def flush(self) -> bytes:
+        """Get output held back by `feed`."""
+        carry, self._carry = self._carry, b""
+        return carry
+
+    def _partial_notice_len(self, data: bytes, start: int) -> int:
+        for length in range(
+                min(len(self.notice_start) - 1, len(data) - start), 0, -1
+        ):
+            if data.endswith(self.notice_start[:length]):
+                return length
+        return 0
+
+    def _scan_plan(self, data: bytes, i: int) -> int:
+        """Scan JSON plan until its outermost object closes.
+
+        :returns: where scanning stopped.
+        """
+        start: int = i
+        while i < len(data):
+            c: int = data[i]
+            i += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == 0x5c:  # backslash
+                    self._escape = True
+                elif c == 0x22:  # double quote
+                    self._in_string = False
+            elif c == 0x22:
+                self._in_string = True
+            elif c == 0x7b:  # {
+                self._depth += 1
+            elif c == 0x7d:  # }
+                self._depth -= 1
+                if self._depth == 0:
+                    self._plan += data[start:i]
+                    self._end_plan()
+                    # psql ends the notice with a line break
+                    self._line_end = b"\r\n"
+                    return i
+        self._plan += data[start:i]
+        return i
+
+    def _skip_line_end(self, data: bytes, i: int) -> int:
+        if self._line_end == b"\r\n" and data.startswith(b"\r", i):
+            i += 1
+            self._line_end = b"\n"
+        if i < len(data):
+            if data.startswith(b"\n", i):
+                i += 1
+            self._line_end = b""
+        return i
+
+    def _end_plan(self) -> None:
+        try:
+            self.plans.append(json.loads(bytes(self._plan)))
+        except ValueError:
+            pass  # not a plan after all
+        self._plan = None
+
+    def take_plans(self) -> list[dict]:
+        """Get plans of queries that returned rows, e.g SELECTs, logged since \
+        last call.
+
+        :returns: plans in the order queries were run, as `QEPAnalysis` \
+        takes them.
+        """
+        plans, self.plans = self.plans, []
+        return [
+            plan for plan in plans
+            if plan.get("Plan", {}).get("Node Type") != "ModifyTable"
+        ]
+
+    def close(self) -> None:
+        """Remove the psqlrc."""
+        shutil.rmtree(self.dir, ignore_errors=True)
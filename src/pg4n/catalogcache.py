@@ -0,0 +1,39 @@
+# Licensed under MIT.
+"""Share catalog lookups between statements analyzed together."""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+
+class CatalogCache:
+    """Thread-safe cache that loads each entry only once, even if several \
+    threads ask for it at the same time."""
+
+    def __init__(self):
+        """Build an empty cache."""
+        self._entries: dict[str, Future] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str, load: Callable[[], Any]) -> Any:
+        """Get cached entry, loading it if needed.
+
+        :param key: identifies the entry, e.g a table name.
+        :param load: loads the entry. Exceptions are passed on to all \
+        threads waiting for the entry, and the entry is not cached.
+        :returns: the entry.
+        """
+        with self._lock:
+            future = self._entries.get(key)
+            loading: bool = future is None
+            if loading:
+                future = self._entries[key] = Future()
+
+        if loading:
+            try:
+                future.set_result(load())
+            except Exception as e:
+                with self._lock:
+                    del self._entries[key]
+                future.set_exception(e)
+        return future.result()
@@ -1,16 +1,32 @@
 import re
 import sys
 from dataclasses import dataclass
-from typing import Optional, TextIO
+from typing import Optional, TextIO, Union, get_type_hints
 
-from .config_values import ConfigValues
+from .config_values import ConfigProfile, ConfigValues
 
 
 class ConfigParser:
     _option_matcher: re.Pattern = re.compile(
-        r"\s*(?P<optname>\w+)\s+(?P<optval>1|0|true|false|yes|no)\s*$",
+        r"\s*(?P<optname>\w+)\s+(?P<optval>\S.*?)\s*$",
         flags=re.IGNORECASE,
     )
+    _bool_matcher: re.Pattern = re.compile(
+        r"^(1|0|true|false|yes|no)$", flags=re.IGNORECASE
+    )
+    _int_matcher: re.Pattern = re.compile(r"^[0-9]+$")
+    # Allowed values of string options that only have a fixed set of values
+    _option_choices: dict[str, tuple[str, ...]] = {
+        "CaptureMode": ("screen", "input", "querylog"),
+        "DebugLogStream": ("off", "info", "debug"),
+        "DebugLogScreen": ("off", "info", "debug"),
+        "DebugLogParser": ("off", "info", "debug"),
+        "AnalysisMode": ("full", "plan-only", "ast-only", "auto-explain"),
+    }
+    # Starts options for databases matching a pattern, e.g [prod-*/*]
+    _section_matcher: re.Pattern = re.compile(
+        r"^\s*\[\s*(?P<pattern>[^\]\s]+)\s*\]\s*$"
+    )
     _empty_line_matcher: re.Pattern = re.compile(r"^\s*$")
     _comment_matcher: re.Pattern = re.compile(r"^\s*#+.*$")
 
@@ -22,8 +38,16 @@ class ConfigParser:
         Reads config values from file givein in __init__.
         """
 
-        optnames = [x.lower() for x in ConfigValues.__annotations__.keys()]
+        opttypes = get_type_hints(ConfigValues)
+        # Profiles are written as sections, not as an option
+        optnames = [
+            name.lower() for name, opttype in opttypes.items()
+            if opttype in (bool, int, str)
+        ]
         config_values: ConfigValues = {}
+        # options of the section being read, if any, go to its profile
+        section_values: ConfigValues = config_values
+        section: Optional[str] = None
 
         # Needed for bytes containing files
         self.file.seek(0)
@@ -50,13 +74,25 @@ class ConfigParser:
             if match := ConfigParser._comment_matcher.match(line):
                 continue
 
+            if match := ConfigParser._section_matcher.match(line):
+                section = match.group("pattern")
+                profile = ConfigProfile(pattern=section, values={})
+                config_values.setdefault("Profiles", []).append(profile)
+                section_values = profile["values"]
+                continue
+
             if match := ConfigParser._option_matcher.match(line):
                 optname = match.group("optname")
+                optval = None
                 if optname.lower() in optnames:
                     key = self._convert_from_anycase_to_propercase(optname)
-                    config_values[key] = self._optval_to_bool(
-                        str(match.group("optval"))
+                    optval = self._convert_optval(
+                        key, opttypes[key], str(match.group("optval"))
                     )
+                if optval is not None:
+                    section_values[key] = optval
+                    if section is not None:
+                        key = f"[{section}] {key}"
 
                     if key in [x.key for x in seen_option_contexts]:
                         seen_option_contexts.append(
@@ -74,7 +110,7 @@ class ConfigParser:
                 else:
                     output_line = line.rstrip("\n")
                     print(
-                        f"warning: bad warning name or value in line {line_number}: '{output_line}' in configuration file: '{self.file.name}'",
+                        f"warning: bad option name or value in line {line_number}: '{output_line}' in configuration file: '{self.file.name}'",
                         file=sys.stderr,
                     )
             else:
@@ -96,6 +132,31 @@ class ConfigParser:
 
         return config_values if len(config_values) > 0 else None
 
+    def _convert_optval(
+        self, key: str, opttype: type, optval: str
+    ) -> Optional[Union[bool, int, str]]:
+        """
+        Converts config file option value string into the type of option
+        'key', or returns None if the value is not valid for the option.
+        """
+
+        if opttype is bool:
+            if ConfigParser._bool_matcher.match(optval):
+                return self._optval_to_bool(optval)
+            return None
+
+        if opttype is int:
+            if ConfigParser._int_matcher.match(optval):
+                return int(optval)
+            return None
+
+        if key in ConfigParser._option_choices:
+            if optval.lower() in ConfigParser._option_choices[key]:
+                return optval.lower()
+            return None
+
+        return optval
+
     def _optval_to_bool(self, optval: str) -> bool:
         """
         Excepts only valid option values.
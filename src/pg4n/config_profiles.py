@@ -0,0 +1,74 @@
+# Licensed under MIT.
+"""Pick options for a database from configuration sections, e.g
+
+    AnalysisMode full
+
+    [prod-*/*]
+    AnalysisMode plan-only
+    AnalysisWorkers 1
+
+where a section applies to databases whose `host/database` matches its
+pattern (with shell-style wildcards), overriding options outside sections.
+Several matching sections apply in the order they are written.
+"""
+
+import getpass
+import os
+from fnmatch import fnmatchcase
+from typing import Optional
+
+from .config_values import ConfigValues
+
+
+def database_key(params: dict[str, str]) -> str:
+    """Get the `host/database` section patterns are matched against.
+
+    :param params: are libpq connection parameters, where missing ones are \
+    defaulted from environment like libpq does, and host to `localhost`.
+    :returns: e.g `db.example.com/orders`.
+    """
+    host: str = params.get("host") or os.getenv("PGHOST") or "localhost"
+    user: Optional[str] = params.get("user") or os.getenv("PGUSER")
+    if user is None:
+        try:
+            user = getpass.getuser()
+        except Exception:  # user has no name, libpq would fail too
+            user = ""
+    dbname: str = params.get("dbname") or os.getenv("PGDATABASE") or user
+    return f"{host}/{dbname}"
+
+
+def matching_patterns(
+    config_values: ConfigValues,
+    params: dict[str, str]
+) -> list[str]:
+    """Get patterns of sections that apply to a database.
+
+    :param config_values: are the options read from configuration files.
+    :param params: are libpq connection parameters of the database.
+    :returns: the patterns in the order sections apply.
+    """
+    key: str = database_key(params)
+    return [
+        profile["pattern"] for profile in config_values.get("Profiles", [])
+        if fnmatchcase(key, profile["pattern"])
+    ]
+
+
+def for_database(
+    config_values: ConfigValues,
+    params: dict[str, str]
+) -> ConfigValues:
+    """Get options for a database.
+
+    :param config_values: are the options read from configuration files.
+    :param params: are libpq connection parameters of the database.
+    :returns: options outside sections, overridden by the sections that \
+    apply to the database. Sections are kept, for other databases.
+    """
+    key: str = database_key(params)
+    values: ConfigValues = ConfigValues(config_values)
+    for profile in config_values.get("Profiles", []):
+        if fnmatchcase(key, profile["pattern"]):
+            values.update(profile["values"])
+    return values
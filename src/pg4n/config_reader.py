@@ -61,7 +61,11 @@ class ConfigReader:
                     new_config_values: ConfigValues = config_parser.parse()
                     if new_config_values is not None:
                         for k, v in new_config_values.items():
-                            config_values[k] = v
+                            # sections of all files apply, latter ones last
+                            if k == "Profiles":
+                                config_values.setdefault(k, []).extend(v)
+                            else:
+                                config_values[k] = v
             except Exception as e:
                 if hasattr(e, "errno"):
                     print(
@@ -3,6 +3,7 @@ from typing import TypedDict
 
 # Contains all the key-value pairs meaningful in a config file.
 class ConfigValues(TypedDict):
+    # Warnings, see scripts/gen_config_values.bash
     CmpDomain: bool
     EqWildcard: bool
     ImpliedExpression: bool
@@ -11,3 +12,38 @@ class ConfigValues(TypedDict):
     SubqueryOrderBy: bool
     SubquerySelect: bool
     SumDistinct: bool
+    UndefinedObject: bool
+
+    # Other options
+    CaptureMode: str
+    ScrollbackLines: int
+    DebugLogFile: str
+    DebugLogStream: str
+    DebugLogScreen: str
+    DebugLogParser: str
+    SessionRecordFile: str
+    AnalysisMode: str
+    SpeculativeAnalysis: bool
+    CostGateRows: int
+    CostGateCost: int
+    CostGateSeqScanMB: int
+    CostGateBudgetMs: int
+    FastQueryMs: int
+    LargeResultRows: int
+    SlowQueryReport: bool
+    OverheadReport: bool
+    ThrottleActiveBackends: int
+    ThrottleLatencyMs: int
+    AnalysisDsn: str
+    AnalysisMaxLagS: int
+    AnalysisTimeoutMs: int
+    AnalysisWorkers: int
+
+    # Sections of options for databases matching a pattern, in order
+    Profiles: list["ConfigProfile"]
+
+
+# Options of a `[host/database]` section, see `config_profiles`.
+class ConfigProfile(TypedDict):
+    pattern: str
+    values: ConfigValues
@@ -0,0 +1,138 @@
+# Licensed under MIT.
+"""Reuse database connections between analyses."""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict
+
+from .replica import Replica
+from .serveroverhead import ServerOverhead, application_name
+
+
+class ConnectionPool:
+    """Keeps idle connections for reuse, opening more when all are in use, \
+    so that statements can be analyzed concurrently."""
+
+    def __init__(
+        self,
+        conninfo: str,
+        max_idle: int = 4,
+        overhead: Optional[ServerOverhead] = None,
+        replica: Optional[Replica] = None,
+        statement_timeout_ms: Optional[int] = None
+    ):
+        """Build an empty pool.
+
+        :param conninfo: is a libpq connection string.
+        :param max_idle: is how many idle connections are kept open at most.
+        :param overhead: counts statements run on the connections, if given.
+        :param replica: is connected to instead of `conninfo` while it is \
+        usable, if given.
+        :param statement_timeout_ms: is how long statements may run on the \
+        connections, if limited.
+        """
+        self.conninfo: str = conninfo
+        self.max_idle: int = max_idle
+        self.overhead: Optional[ServerOverhead] = overhead
+        self.replica: Optional[Replica] = replica
+        self.statement_timeout_ms: Optional[int] = statement_timeout_ms
+        self._idle: list[psycopg.Connection] = []
+        # idle and taken connections that are to the replica
+        self._on_replica: set[psycopg.Connection] = set()
+        self._lock: threading.Lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg.Connection]:
+        """Get a connection for exclusive use, and return it to the pool \
+        afterwards.
+
+        :returns: a context manager giving the connection.
+        """
+        with self._lock:
+            conn = self._idle.pop() if self._idle != [] else None
+        if conn is not None and not self._is_usable(conn):
+            self._discard(conn)
+            conn = None
+        if conn is None:
+            conn = self._connect()
+
+        try:
+            yield conn
+        finally:
+            self._put(conn)
+
+    def warm_up(self) -> None:
+        """Open a connection ahead of use, unless one is idle already."""
+        with self._lock:
+            if self._idle != []:
+                return
+        try:
+            conn = self._connect()
+        except psycopg.Error:
+            return  # analyses report nothing until database can be reached
+        self._put(conn)
+
+    def _connect(self) -> psycopg.Connection:
+        """Open a connection to the replica if it is usable, and otherwise \
+        to the database itself."""
+        if self.replica is not None and self.replica.usable():
+            try:
+                conn = self._open(self.replica.conninfo)
+            except psycopg.Error:
+                self.replica.set_unusable("unreachable")
+            else:
+                if self.replica.check(conn, force=True):
+                    with self._lock:
+                        self._on_replica.add(conn)
+                    return conn
+                conn.close()
+        return self._open(self.conninfo)
+
+    def _open(self, conninfo: str) -> psycopg.Connection:
+        """Open a connection, tagged as pg4n's."""
+        params: dict[str, str] = {"application_name": application_name}
+        if self.statement_timeout_ms is not None:
+            # added to server options given in connection string, if any
+            options: str = conninfo_to_dict(conninfo).get("options", "")
+            params["options"] = (
+                f"{options} -c statement_timeout={self.statement_timeout_ms}"
+            ).strip()
+        if self.overhead is not None:
+            return self.overhead.connect(conninfo, **params)
+        return psycopg.connect(conninfo, **params)
+
+    def _is_usable(self, conn: psycopg.Connection) -> bool:
+        """Check that an idle connection is not to a replica that has \
+        become unusable."""
+        with self._lock:
+            on_replica: bool = conn in self._on_replica
+        return not on_replica or (
+            self.replica.usable() and self.replica.check(conn)
+        )
+
+    def _discard(self, conn: psycopg.Connection) -> None:
+        with self._lock:
+            self._on_replica.discard(conn)
+        conn.close()
+
+    def _put(self, conn: psycopg.Connection) -> None:
+        if not conn.broken and not conn.closed:
+            try:
+                conn.rollback()  # analyses leave nothing behind
+            except psycopg.Error:
+                conn.close()
+        with self._lock:
+            if not conn.closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    def close(self) -> None:
+        """Close idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
@@ -0,0 +1,117 @@
+# Licensed under MIT.
+"""Commands for controlling pg4n at runtime, typed into psql as e.g \
+`\\pg4n mode plan-only`."""
+
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from .semanticrouter import SemanticRouter
+
+
+class ControlCommands:
+    """Runs `\\pg4n` commands against semantic analysis."""
+
+    usage: str = (
+        "\\pg4n stats                      show analysis statistics\n"
+        "\\pg4n cache clear                forget work prepared while typing\n"
+        "\\pg4n mode [full|plan-only|ast-only|auto-explain]\n"
+        "                                 show or set analysis mode\n"
+        "\\pg4n profile [on|off]           show timings with every analysis\n"
+        "\\pg4n checkers [NAME on|off]     list analysis modules, or turn one "
+        "on or off\n"
+        "\\pg4n overhead [reset]           show or reset pg4n's work on the "
+        "server"
+    )
+
+    def __init__(self, router: "SemanticRouter"):
+        """Build commands for a router.
+
+        :param router: is the semantic analysis controlled.
+        """
+        self.router: "SemanticRouter" = router
+        self._commands: dict[str, Callable[[list[str]], str]] = {
+            "stats": self.stats,
+            "cache": self.cache,
+            "mode": self.mode,
+            "profile": self.profile,
+            "checkers": self.checkers,
+            "overhead": self.overhead,
+        }
+
+    def run(self, args: list[str]) -> str:
+        """Run a command.
+
+        :param args: are the words after `\\pg4n`, e.g `["mode", "full"]`.
+        :returns: output of the command, or usage if command is not known.
+        """
+        if args == [] or args[0] not in self._commands:
+            return self.usage
+        return self._commands[args[0]](args[1:])
+
+    def stats(self, args: list[str]) -> str:
+        """Show analysis statistics."""
+        mode: str = self.router.analysis_mode
+        if self.router.throttle.level > 0:
+            mode += f", {self.router.throttle.describe()}"
+        stats: str = (
+            f"mode:        {mode}\n"
+            + self.router.stats.summary() + "\n"
+            f"prepared:    {len(self.router.speculator)} statements cached"
+        )
+        if self.router.pool.replica is not None:
+            stats += \
+                f"\nanalyzing:   on {self.router.pool.replica.describe()}"
+        return stats
+
+    def cache(self, args: list[str]) -> str:
+        """Forget work prepared while typing."""
+        if args != ["clear"]:
+            return self.usage
+        self.router.speculator.clear()
+        return "Cache cleared."
+
+    def mode(self, args: list[str]) -> str:
+        """Show or set analysis mode."""
+        if args == []:
+            return f"Analysis mode is {self.router.analysis_mode}."
+        if len(args) > 1 or args[0] not in self.router.analysis_modes:
+            return self.usage
+        self.router.analysis_mode = args[0]
+        return f"Analysis mode is now {args[0]}."
+
+    def profile(self, args: list[str]) -> str:
+        """Show or set whether timings are shown with every analysis."""
+        if args != []:
+            if args not in (["on"], ["off"]):
+                return self.usage
+            self.router.profile = args[0] == "on"
+        return f"Profiling is {'on' if self.router.profile else 'off'}."
+
+    def checkers(self, args: list[str]) -> str:
+        """List analysis modules, or turn one on or off."""
+        names: dict[str, str] = {
+            self.router.checker_name(checker).lower():
+                self.router.checker_name(checker)
+            for checker in self.router.checkers
+        }
+        if args != []:
+            if len(args) != 2 or args[0].lower() not in names or \
+                    args[1] not in ("on", "off"):
+                return self.usage
+            self.router.config_values[names[args[0].lower()]] = \
+                args[1] == "on"
+
+        return "\n".join(
+            f"{self.router.checker_name(checker):<30}"
+            f"{'on' if self.router.is_checker_enabled(checker) else 'off'}"
+            for checker in self.router.checkers
+        )
+
+    def overhead(self, args: list[str]) -> str:
+        """Show or reset counters of pg4n's own work on the server."""
+        if args == ["reset"]:
+            self.router.overhead.reset()
+            return "Overhead counters reset."
+        if args != []:
+            return self.usage
+        return self.router.overhead.summary()
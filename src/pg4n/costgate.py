@@ -0,0 +1,85 @@
+# Licensed under MIT.
+"""Ask for confirmation before running queries that are estimated to be \
+dangerously expensive."""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from .config_values import ConfigValues
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    """Planner's estimate of what running a query takes."""
+
+    # rows returned by the query
+    rows: float
+    # total cost in planner's units
+    cost: float
+    # size of tables read with sequential scans
+    seq_scan_bytes: int
+
+
+class CostGate:
+    """Checks cost estimates against thresholds from configuration."""
+
+    # wall-clock time the estimate may take before query is let through
+    default_budget_ms: int = 200
+
+    def __init__(
+        self,
+        max_rows: Optional[int] = None,
+        max_cost: Optional[int] = None,
+        max_seq_scan_mb: Optional[int] = None,
+        budget_ms: Optional[int] = None
+    ):
+        """Build gate with given thresholds, each of which is optional.
+
+        :param max_rows: is the most rows a query is estimated to return.
+        :param max_cost: is the most total cost of a query.
+        :param max_seq_scan_mb: is the most megabytes of tables a query is \
+        estimated to scan sequentially.
+        :param budget_ms: is how long estimating may take.
+        """
+        self.max_rows: Optional[int] = max_rows
+        self.max_cost: Optional[int] = max_cost
+        self.max_seq_scan_mb: Optional[int] = max_seq_scan_mb
+        self.budget_ms: int = budget_ms or self.default_budget_ms
+
+    @classmethod
+    def from_config(
+        cls,
+        config_values: ConfigValues
+    ) -> Optional["CostGate"]:
+        """Build gate from `CostGate*` options.
+
+        :param config_values: are the options read from configuration files.
+        :returns: the gate, or None if no threshold is configured.
+        """
+        gate = cls(
+            config_values.get("CostGateRows"),
+            config_values.get("CostGateCost"),
+            config_values.get("CostGateSeqScanMB"),
+            config_values.get("CostGateBudgetMs"),
+        )
+        if (gate.max_rows, gate.max_cost, gate.max_seq_scan_mb) == \
+                (None, None, None):
+            return None
+        return gate
+
+    def check(self, estimate: CostEstimate) -> str:
+        """Check estimate against thresholds.
+
+        :param estimate: is the planner's estimate for a query.
+        :returns: reasons the query is too expensive, or "" if it is not.
+        """
+        reasons: list[str] = []
+        if self.max_rows is not None and estimate.rows > self.max_rows:
+            reasons.append(f"{estimate.rows:,.0f} rows")
+        if self.max_cost is not None and estimate.cost > self.max_cost:
+            reasons.append(f"cost {estimate.cost:,.0f}")
+        seq_scan_mb: float = estimate.seq_scan_bytes / (1 << 20)
+        if self.max_seq_scan_mb is not None and \
+                seq_scan_mb > self.max_seq_scan_mb:
+            reasons.append(f"{seq_scan_mb:,.0f} MB read by sequential scans")
+        return ", ".join(reasons)
@@ -0,0 +1,79 @@
+# Licensed under MIT.
+"""Buffered debug logging that stays off the terminal's critical path.
+
+Log records are put on a queue by the logging thread, and written to a
+size-rotated file by a background thread, so that debugging does not make
+the terminal lag or change the timing of what is being debugged.
+
+Records are logged in categories:
+
+- `stream`: Return presses and fresh prompts (info), and every chunk of \
+terminal input and output (debug).
+- `screen`: emulated screen snapshots on SIGUSR1 (info), and also \
+whenever a statement is screen-scraped (debug).
+- `parser`: captured statements and syntax errors (info), and parsing \
+failures (debug).
+"""
+
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+# Keep pg4n records out of the terminal when debug logging is not turned on
+logging.getLogger("pg4n").addHandler(logging.NullHandler())
+
+
+class DebugLog:
+    """Debug log file written by a background thread."""
+
+    categories: list[str] = ["stream", "screen", "parser"]
+    levels: dict[str, int] = {
+        "off": logging.CRITICAL + 1,
+        "info": logging.INFO,
+        "debug": logging.DEBUG,
+    }
+    default_level: str = "info"
+
+    max_bytes: int = 1 << 22
+    backup_count: int = 3
+
+    def __init__(self, path: str, levels: Optional[dict[str, str]] = None):
+        """Start writing pg4n's log records to a file.
+
+        :param path: is the log file, rotated when it reaches `max_bytes`.
+        :param levels: maps categories to one of `levels`, by default \
+        `default_level`.
+        """
+        levels = levels or {}
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        file_handler = RotatingFileHandler(
+            path,
+            maxBytes=self.max_bytes,
+            backupCount=self.backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(name)s %(levelname)s %(message)s"
+        ))
+        self._listener = QueueListener(self._queue, file_handler)
+        self._queue_handler = QueueHandler(self._queue)
+
+        self._logger: logging.Logger = logging.getLogger("pg4n")
+        self._logger.addHandler(self._queue_handler)
+        self._logger.propagate = False
+        for category in self.categories:
+            logging.getLogger("pg4n." + category).setLevel(
+                self.levels[levels.get(category, self.default_level)]
+            )
+
+        self._listener.start()
+
+    def close(self) -> None:
+        """Write out queued records and stop logging to file."""
+        self._logger.removeHandler(self._queue_handler)
+        self._logger.propagate = True
+        for category in self.categories:
+            logging.getLogger("pg4n." + category).setLevel(logging.NOTSET)
+        self._listener.stop()
@@ -0,0 +1,231 @@
+# Licensed under MIT.
+"""Index relation and column names of a database for suggesting the ones \
+user may have meant, e.g `order_id` for `ordr_id`.
+
+Names are found by their deletion neighbourhood: every name is indexed under
+itself and each string left by deleting one of its characters, and a
+misspelling is looked up the same way. Two names sharing a key are at most
+one insertion, deletion, substitution or transposition (or a deletion and
+an insertion at nearby positions) apart, so candidates are found with a
+few dictionary lookups however many names there are, and only those few are
+ranked by edit distance.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from psycopg import Connection
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Get optimal string alignment distance between two strings, counting \
+    insertions, deletions, substitutions and transpositions of adjacent \
+    characters as one edit each."""
+    prev_prev: list[int] = []
+    prev: list[int] = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur: list[int] = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(
+                prev[j] + 1,
+                cur[j - 1] + 1,
+                prev[j - 1] + (a[i - 1] != b[j - 1]),
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] \
+                    and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev_prev[j - 2] + 1)
+        prev_prev, prev = prev, cur
+    return prev[-1]
+
+
+class NameIndex:
+    """Set of names that can be searched for names similar to a given one."""
+
+    def __init__(self):
+        """Build an empty index."""
+        # how many times each name has been added, e.g by several tables
+        self._counts: dict[str, int] = {}
+        self._neighbours: dict[str, set[str]] = {}
+
+    @staticmethod
+    def _keys(name: str) -> set[str]:
+        folded: str = name.lower()
+        return {folded} | {
+            folded[:i] + folded[i + 1:] for i in range(len(folded))
+        }
+
+    def add(self, name: str) -> None:
+        """Add a name, or count it once more if it has been added."""
+        count: int = self._counts.get(name, 0)
+        self._counts[name] = count + 1
+        if count == 0:
+            for key in self._keys(name):
+                self._neighbours.setdefault(key, set()).add(name)
+
+    def remove(self, name: str) -> None:
+        """Count a name once less, removing it once it is not counted."""
+        count: int = self._counts.get(name, 0)
+        if count > 1:
+            self._counts[name] = count - 1
+            return
+        if count == 0:
+            return
+        del self._counts[name]
+        for key in self._keys(name):
+            names: set[str] = self._neighbours[key]
+            names.discard(name)
+            if names == set():
+                del self._neighbours[key]
+
+    def __len__(self) -> int:
+        """Get the number of distinct names."""
+        return len(self._counts)
+
+    def __contains__(self, name: str) -> bool:
+        """Check if a name is in the index."""
+        return name in self._counts
+
+    def similar(self, name: str, count: int = 3) -> list[str]:
+        """Find names similar to a given one, most similar first.
+
+        :param name: is the name looked for, e.g a misspelling.
+        :param count: is how many names are returned at most.
+        :returns: the names, not including the name itself.
+        """
+        candidates: set[str] = set()
+        for key in self._keys(name):
+            candidates |= self._neighbours.get(key, set())
+        candidates.discard(name)
+        return sorted(
+            candidates,
+            key=lambda candidate:
+                (edit_distance(name.lower(), candidate.lower()), candidate)
+        )[:count]
+
+
+@dataclass
+class _Relation:
+    """A relation as indexed."""
+
+    name: str
+    # changes whenever relation or its columns are altered
+    version: str
+    columns: list[str] = field(default_factory=list)
+
+
+class IdentifierIndex:
+    """Names of relations visible in a database (per `search_path`) and \
+    of their columns, refreshed incrementally from the catalog."""
+
+    # A version of each relation's catalog rows, so that columns are only
+    # fetched for relations that have been created or altered since last
+    # refresh.
+    versions_query: str = """
+SELECT c.oid, c.relname,
+    md5(c.xmin::text || ':' || COALESCE(cols.names, ''))
+FROM pg_catalog.pg_class c,
+LATERAL (
+    SELECT string_agg(a.attname || '/' || a.xmin::text, ','
+                      ORDER BY a.attnum) AS names
+    FROM pg_catalog.pg_attribute a
+    WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+) cols
+WHERE c.relkind IN ('r', 'v', 'm', 'f', 'p')
+    AND pg_catalog.pg_table_is_visible(c.oid);
+"""
+    columns_query: str = """
+SELECT a.attrelid, a.attname
+FROM pg_catalog.pg_attribute a
+WHERE a.attrelid = ANY(%s) AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY a.attrelid, a.attnum;
+"""
+
+    def __init__(self):
+        """Build an empty index, to be filled by `refresh`."""
+        self.relation_names: NameIndex = NameIndex()
+        self.column_names: NameIndex = NameIndex()
+        self._relations: dict[int, _Relation] = {}
+        self._lock: threading.Lock = threading.Lock()
+        # time.monotonic() of last refresh, or 0.0 if index is empty
+        self.refreshed: float = 0.0
+
+    def refresh(self, conn: Connection) -> None:
+        """Bring index up to date with the catalog, fetching columns only \
+        for relations that have changed.
+
+        :param conn: is connected to the database indexed.
+        """
+        with conn.cursor() as cur:
+            cur.execute(self.versions_query)
+            versions: dict[int, tuple[str, str]] = \
+                {oid: (name, version) for oid, name, version in cur.fetchall()}
+            with self._lock:
+                changed: list[int] = [
+                    oid for oid, (_, version) in versions.items()
+                    if oid not in self._relations
+                    or self._relations[oid].version != version
+                ]
+            columns: dict[int, list[str]] = {oid: [] for oid in changed}
+            if changed != []:
+                cur.execute(self.columns_query, (changed,))
+                for oid, column in cur.fetchall():
+                    columns[oid].append(column)
+        conn.rollback()
+
+        with self._lock:
+            for oid in [oid for oid in self._relations
+                        if oid not in versions or oid in columns]:
+                self._remove(self._relations.pop(oid))
+            for oid, relation_columns in columns.items():
+                (name, version) = versions[oid]
+                relation = _Relation(name, version, relation_columns)
+                self._relations[oid] = relation
+                self.relation_names.add(relation.name)
+                for column in relation.columns:
+                    self.column_names.add(column)
+            self.refreshed = time.monotonic()
+
+    def _remove(self, relation: _Relation) -> None:
+        self.relation_names.remove(relation.name)
+        for column in relation.columns:
+            self.column_names.remove(column)
+
+    def suggest_relations(self, name: str) -> list[str]:
+        """Find relations user may have meant.
+
+        :param name: is the relation name, possibly schema-qualified.
+        :returns: names of similar relations, most similar first.
+        """
+        with self._lock:
+            return self.relation_names.similar(name.split(".")[-1])
+
+    def suggest_columns(
+        self,
+        name: str,
+        relation: Optional[str] = None
+    ) -> list[str]:
+        """Find columns user may have meant.
+
+        :param name: is the column name.
+        :param relation: is the relation (or alias) column was looked up \
+        in, if known.
+        :returns: names of similar columns, most similar first. Columns of \
+        the relation are preferred if it is known.
+        """
+        with self._lock:
+            if relation is not None:
+                relation = relation.split(".")[-1]
+                for indexed in self._relations.values():
+                    if indexed.name != relation:
+                        continue
+                    candidates: list[str] = \
+                        [c for c in indexed.columns if c != name]
+                    # any name similar enough to be found by the index
+                    ranked = sorted(
+                        (edit_distance(name.lower(), c.lower()), c)
+                        for c in candidates
+                    )
+                    return [c for d, c in ranked if d <= 2][:3]
+            return self.column_names.similar(name)
@@ -17,10 +17,12 @@ from .errfmt import ErrorFormatter
 
 class ImpliedExpressionChecker:
     def __init__(self, parsed_sql: exp.Expression, sql_statement: str,
-                 db_connection: Connection):
+                 db_connection: Connection, analyze: bool = True):
         self.parsed_sql: exp.Expression = parsed_sql
         self.sql_statement: str = sql_statement
         self.db_connection: Connection = db_connection
+        # plans are enough for finding One-Time Filters
+        self.analyze: bool = analyze
 
     def check(self) -> Optional[str]:
         """
@@ -31,7 +33,8 @@ class ImpliedExpressionChecker:
             return node.get("One-Time Filter") != None
 
         qep_parser_with_constraint_exclusion = \
-            QEPParser(conn=self.db_connection, constraint_exclusion=True)
+            QEPParser(conn=self.db_connection, constraint_exclusion=True,
+                      analyze=self.analyze)
         qep_analysis_with_constraint_exclusion = \
             qep_parser_with_constraint_exclusion.parse(self.sql_statement)
         if qep_analysis_with_constraint_exclusion is None:
@@ -40,7 +43,8 @@ class ImpliedExpressionChecker:
             len(qep_analysis_with_constraint_exclusion.root.rfind(finder)) > 0
 
         qep_parser_without_constraint_exclusion = \
-            QEPParser(conn=self.db_connection, constraint_exclusion=False)
+            QEPParser(conn=self.db_connection, constraint_exclusion=False,
+                      analyze=self.analyze)
         qep_analysis_without_constraint_exclusion = \
             qep_parser_without_constraint_exclusion.parse(self.sql_statement)
         if qep_analysis_without_constraint_exclusion is None:
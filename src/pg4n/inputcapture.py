@@ -0,0 +1,341 @@
+# Licensed under MIT.
+"""Capture submitted psql input by following the user's keystrokes.
+
+Instead of screen-scraping, `InputCapture` keeps a model of readline's line
+buffer (emacs keybindings, psql defaults) and of psql's query buffer, so the
+exact submitted text is known in O(keystrokes) regardless of terminal size.
+"""
+
+import codecs
+from typing import Optional
+
+from .psqlparser import PsqlParser
+
+
+class InputCapture:
+    """Models readline's line buffer and psql's query buffer from raw \
+    keystrokes.
+
+    Anything that cannot be modelled exactly (tab completion, incremental
+    history search, recalls beyond this session's history, unknown key
+    sequences) marks the capture unreliable until psql's query buffer is
+    known to be empty again, so that callers can fall back to screen-scraping.
+    """
+
+    # Readline's default redisplay only rewrites the part of the line that
+    # changed, so a history recall is verified against at most this many
+    # characters of the changed part in psql's echo.
+    recall_echo_len: int = 16
+
+    # psql's default HISTSIZE, older entries are dropped like readline does
+    history_size: int = 500
+
+    def __init__(self, parser: PsqlParser):
+        """Build capture for a fresh psql session.
+
+        :param parser: is used for splitting input into statements like psql.
+        """
+        self.parser: PsqlParser = parser
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+        # readline state
+        self.line: str = ""
+        self.point: int = 0
+        self.line_reliable: bool = True
+        self.kill_ring: str = ""
+        self._esc_seq: str = ""  # unfinished escape sequence
+        self._in_paste: bool = False
+        self._paste_cr: bool = False
+
+        # history as psql adds it, and readline's edits to recalled entries
+        self.history: list[str] = []
+        # None marks an edited line whose contents are not known
+        self.history_edits: dict[int, Optional[str]] = {}
+        self.history_index: int = 0
+        self._line_edited: bool = False
+        self._history_buf: list[str] = []
+        self._expected_echo: str = ""
+        self._echo_window: str = ""
+
+        # psql state
+        self.query_buffer: str = ""
+        self.buffer_reliable: bool = True
+        self.submitted: list[str] = []
+        self.submitted_reliable: bool = True
+
+    def feed_input(self, keys: bytes) -> None:
+        """Update line buffer with keystrokes read from the user's terminal.
+
+        :param keys: raw terminal input, as forwarded to psql.
+        """
+        for key in self._decoder.decode(keys):
+            if self._esc_seq != "":
+                self._esc_seq += key
+                if self._esc_seq_complete():
+                    seq = self._esc_seq
+                    self._esc_seq = ""
+                    self._handle_esc_seq(seq)
+            elif key == "\x1b":
+                self._esc_seq = key
+            elif self._in_paste:
+                # terminals paste line breaks as \r, readline inserts \n
+                if key != "\n" or not self._paste_cr:
+                    self._insert("\n" if key == "\r" else key)
+                self._paste_cr = key == "\r"
+            else:
+                self._handle_key(key)
+
+    def feed_output(self, output: str) -> None:
+        """Verify the latest history recall against psql's echo.
+
+        :param output: decoded psql output.
+        """
+        if self._expected_echo == "":
+            return
+        self._echo_window = (self._echo_window + output)[-4096:]
+        if self._expected_echo in self._echo_window:
+            self._expected_echo = ""
+            self._echo_window = ""
+
+    def pop_submitted(self) -> Optional[list[str]]:
+        """Get statements and meta-commands psql has been sent since last call.
+
+        :returns: complete SQL statements and meta-command lines in the \
+        order they were submitted, or None if they are not reliably known.
+        """
+        submitted = self.submitted
+        reliable = self.submitted_reliable and self._expected_echo == ""
+        self.submitted = []
+        self.submitted_reliable = True
+        self._expected_echo = ""
+        return submitted if reliable else None
+
+    def typed_stmt(self) -> str:
+        """Get the statement user has typed so far, if pressing Return \
+        would send it to the server.
+
+        :returns: the last complete statement at the end of the query and \
+        line buffers, or "" if there is none or it is not reliably known.
+        """
+        if not (self.line_reliable and self.buffer_reliable) or \
+                not self.line.rstrip().endswith(self.parser.stmt_end):
+            return ""
+        typed: str = self.query_buffer + "\n" + self.line \
+            if self.query_buffer != "" else self.line
+        statements, rest = self.parser.split_statements(typed)
+        return statements[-1] if statements != [] and rest == "" else ""
+
+    def on_new_prompt(self) -> None:
+        """Reset psql's query buffer when a fresh prompt (e.g `=> `) shows \
+        that psql has nothing pending."""
+        self.query_buffer = ""
+        self._history_buf = []
+        self.buffer_reliable = True
+
+    def _esc_seq_complete(self) -> bool:
+        seq = self._esc_seq
+        if len(seq) < 2:
+            return False
+        if seq[1] in "[O":
+            # CSI/SS3 sequences end with a byte from @ to ~
+            return len(seq) > 2 and "@" <= seq[-1] <= "~" and \
+                not (seq[1] == "[" and len(seq) == 3 and seq[2] == "[")
+        return True  # meta + key
+
+    def _handle_esc_seq(self, seq: str) -> None:
+        if seq == "\x1b[200~":
+            self._in_paste = True
+        elif seq == "\x1b[201~":
+            self._in_paste = False
+        elif self._in_paste:
+            self._insert(seq)
+        elif seq in ("\x1b[D", "\x1bOD"):
+            self.point = max(self.point - 1, 0)
+        elif seq in ("\x1b[C", "\x1bOC"):
+            self.point = min(self.point + 1, len(self.line))
+        elif seq in ("\x1b[H", "\x1bOH", "\x1b[1~"):
+            self.point = 0
+        elif seq in ("\x1b[F", "\x1bOF", "\x1b[4~"):
+            self.point = len(self.line)
+        elif seq == "\x1b[3~":
+            self._delete(self.point, self.point + 1)
+        elif seq in ("\x1b[A", "\x1bOA"):
+            self._recall(self.history_index - 1)
+        elif seq in ("\x1b[B", "\x1bOB"):
+            self._recall(self.history_index + 1)
+        elif seq == "\x1bb":
+            self.point = self._word_start(self.point)
+        elif seq == "\x1bf":
+            self.point = self._word_end(self.point)
+        elif seq == "\x1bd":
+            self._kill(self.point, self._word_end(self.point))
+        elif seq == "\x1b\x7f":
+            self._kill(self._word_start(self.point), self.point)
+        else:
+            self.line_reliable = False
+
+    def _handle_key(self, key: str) -> None:
+        if key in "\r\n":
+            self._accept_line()
+        elif key in "\x7f\x08":
+            self._delete(self.point - 1, self.point)
+        elif key == "\x01":
+            self.point = 0
+        elif key == "\x05":
+            self.point = len(self.line)
+        elif key == "\x02":
+            self.point = max(self.point - 1, 0)
+        elif key == "\x06":
+            self.point = min(self.point + 1, len(self.line))
+        elif key == "\x04":
+            self._delete(self.point, self.point + 1)
+        elif key == "\x0b":
+            self._kill(self.point, len(self.line))
+        elif key == "\x15":
+            self._kill(0, self.point)
+        elif key == "\x17":
+            # unix-word-rubout uses whitespace as word boundary
+            start = self.point
+            while start > 0 and self.line[start - 1].isspace():
+                start -= 1
+            while start > 0 and not self.line[start - 1].isspace():
+                start -= 1
+            self._kill(start, self.point)
+        elif key == "\x19":
+            self._insert(self.kill_ring)
+        elif key == "\x14":
+            p = min(self.point, len(self.line) - 1)
+            if self.point > 0 and p > 0:
+                self.line = self.line[:p - 1] + self.line[p] + \
+                    self.line[p - 1] + self.line[p + 1:]
+                self.point = p + 1
+                self._line_edited = True
+        elif key == "\x10":
+            self._recall(self.history_index - 1)
+        elif key == "\x0e":
+            self._recall(self.history_index + 1)
+        elif key == "\x03":
+            # psql discards both the line and the query buffer on ctrl-C
+            self._reset_line()
+            self.query_buffer = ""
+            self._history_buf = []
+            self.buffer_reliable = True
+        elif key == "\x0c":
+            pass  # clear-screen
+        elif key.isprintable():
+            self._insert(key)
+        else:
+            # tab completion, ctrl-R and the rest are not modelled
+            self.line_reliable = False
+
+    def _insert(self, text: str) -> None:
+        self.line = self.line[:self.point] + text + self.line[self.point:]
+        self.point += len(text)
+        self._line_edited = True
+
+    def _delete(self, start: int, end: int) -> None:
+        start = max(start, 0)
+        end = min(end, len(self.line))
+        if start >= end:
+            return
+        self.line = self.line[:start] + self.line[end:]
+        self.point = start
+        self._line_edited = True
+
+    def _kill(self, start: int, end: int) -> None:
+        if start < end:
+            self.kill_ring = self.line[start:end]
+        self._delete(start, end)
+
+    def _word_start(self, pos: int) -> int:
+        while pos > 0 and not self.line[pos - 1].isalnum():
+            pos -= 1
+        while pos > 0 and self.line[pos - 1].isalnum():
+            pos -= 1
+        return pos
+
+    def _word_end(self, pos: int) -> int:
+        n = len(self.line)
+        while pos < n and not self.line[pos].isalnum():
+            pos += 1
+        while pos < n and self.line[pos].isalnum():
+            pos += 1
+        return pos
+
+    def _recall(self, index: int) -> None:
+        """Move in history like readline's previous/next-history."""
+        if index < 0 or index > len(self.history) \
+                or index == self.history_index:
+            if index < 0:
+                # older entries come from psql's history file
+                self.line_reliable = False
+            return
+
+        # readline keeps edits made to lines while moving in history
+        if self._line_edited or self.history_index == len(self.history):
+            self.history_edits[self.history_index] = \
+                self.line if self.line_reliable else None
+
+        old_line = self.line
+        self.history_index = index
+        recalled = self.history_edits.get(index, self.history[index]
+                                          if index < len(self.history)
+                                          else "")
+        self.line = "" if recalled is None else recalled
+        self.line_reliable = recalled is not None
+        self.point = len(self.line)
+        self._line_edited = False
+
+        # psql only echoes the part of the line that changed
+        prefix = 0
+        while prefix < min(len(old_line), len(self.line)) and \
+                old_line[prefix] == self.line[prefix]:
+            prefix += 1
+        changed = self.line[prefix:].split("\n")[0]
+        self._expected_echo = changed[:self.recall_echo_len]
+        self._echo_window = ""
+
+    def _reset_line(self) -> None:
+        self.line = ""
+        self.point = 0
+        self.line_reliable = True
+        self.history_edits = {}
+        self.history_index = len(self.history)
+        self._line_edited = False
+
+    def _accept_line(self) -> None:
+        """Hand the line over to psql, which either runs a meta-command, or \
+        adds the line to its query buffer and sends all complete statements."""
+        line = self.line
+        reliable = self.line_reliable and self.buffer_reliable
+        self._reset_line()
+        if not reliable:
+            self.buffer_reliable = False
+            self.submitted_reliable = False
+            return
+
+        if line.strip() != "":
+            self._history_buf.append(line)
+
+        if self.query_buffer != "":
+            self.query_buffer += "\n"
+        statements, self.query_buffer = \
+            self.parser.split_statements(self.query_buffer + line)
+        self.submitted.extend(statements)
+
+        meta_command: str = line.strip()
+        if meta_command.startswith("\\"):
+            if meta_command in ("\\r", "\\reset"):
+                self.query_buffer = ""
+            self.submitted.append(meta_command)
+
+        if len(statements) > 0 or meta_command.startswith("\\"):
+            self._add_history()
+
+    def _add_history(self) -> None:
+        entry = "\n".join(self._history_buf).rstrip("\n")
+        self._history_buf = []
+        if entry != "":
+            self.history.append(entry)
+            del self.history[:-self.history_size]
+        self.history_index = len(self.history)
@@ -0,0 +1,222 @@
+# Licensed under MIT.
+"""Load semantic analysis in the background while psql starts up.
+
+Importing `SemanticRouter` imports psycopg, sqlglot and every analysis
+module, which would otherwise delay the first psql prompt.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from .config_values import ConfigValues
+from .costgate import CostEstimate
+from .psqlconninfo import PsqlConnInfo
+
+
+class LazyRouter:
+    """Stands in for `SemanticRouter`, which is imported, built and warmed \
+    up on a background thread."""
+
+    def __init__(
+        self,
+        conn_info: PsqlConnInfo,
+        config_values: Optional[ConfigValues]
+    ):
+        """Start loading semantic analysis.
+
+        :param conn_info: is the connection info of the psql session.
+        :param config_values: are the options read from configuration files.
+        """
+        self.conn_info: PsqlConnInfo = conn_info
+        self.config_values: Optional[ConfigValues] = config_values
+        # SemanticRouter, or None if it could not be loaded
+        self._router: Optional[Any] = None
+        self._loaded: threading.Event = threading.Event()
+        # database user switched to while loading, applied once loaded
+        self._switch_params: Optional[dict[str, str]] = None
+        # analyses submitted while loading, started once loaded
+        self._submitted: list[tuple[list[str], Future]] = []
+        self._lock: threading.Lock = threading.Lock()
+        threading.Thread(
+            target=self._load, name="pg4n-warm-up", daemon=True
+        ).start()
+
+    def _load(self) -> None:
+        try:
+            from .semanticrouter import SemanticRouter
+
+            router = SemanticRouter(self.conn_info.get(), self.config_values)
+            router.warm_up()
+            with self._lock:
+                self._router = router
+                switch_params = self._switch_params
+            if switch_params is not None:
+                router.switch_database(switch_params)
+        except Exception:  # analysis is just not available
+            pass
+        finally:
+            with self._lock:
+                self._loaded.set()
+                submitted, self._submitted = self._submitted, []
+            for sql_queries, summary in submitted:
+                self._chain(sql_queries, summary)
+
+    def run_analysis(
+        self,
+        sql_query: str
+    ) -> str:
+        """Run analysis once semantic analysis has been loaded.
+
+        :param sql_query: is a single well-formed query to run analytics on.
+        :returns: an insightful message, see `SemanticRouter.run_analysis`.
+        """
+        self._loaded.wait()
+        if self._router is None:
+            return ""
+        return self._router.run_analysis(sql_query)
+
+    def speculate(
+        self,
+        sql_query: str
+    ) -> None:
+        """Start preparing analysis of a query user is typing, unless \
+        semantic analysis is still being loaded.
+
+        :param sql_query: is a single well-formed query.
+        """
+        if self._loaded.is_set() and self._router is not None:
+            self._router.speculate(sql_query)
+
+    def estimate(
+        self,
+        sql_query: str,
+        budget_ms: int
+    ) -> Optional[CostEstimate]:
+        """Get cost estimate for a query, unless semantic analysis is still \
+        being loaded.
+
+        :param sql_query: is a single well-formed query.
+        :param budget_ms: is how long estimating may take.
+        :returns: the estimate, see `SemanticRouter.estimate`.
+        """
+        if not self._loaded.is_set() or self._router is None:
+            return None
+        return self._router.estimate(sql_query, budget_ms)
+
+    def run_syntax_analysis(
+        self,
+        syntax_error: str
+    ) -> str:
+        """Run syntax analysis once semantic analysis has been loaded.
+
+        :param syntax_error: is psql's error message.
+        :returns: an insightful message, see \
+        `SemanticRouter.run_syntax_analysis`.
+        """
+        self._loaded.wait()
+        if self._router is None:
+            return ""
+        return self._router.run_syntax_analysis(syntax_error)
+
+    def switch_database(
+        self,
+        params: dict[str, str]
+    ) -> None:
+        """Route analysis to another database, once semantic analysis has \
+        been loaded.
+
+        :param params: are connection parameters that differ from the \
+        current connection, see `SemanticRouter.switch_database`.
+        """
+        with self._lock:
+            if self._router is None:
+                self._switch_params = \
+                    dict(self._switch_params or {}, **params)
+                return
+        self._router.switch_database(params)
+
+    def run_command(
+        self,
+        args: list[str]
+    ) -> str:
+        """Run a `\\pg4n` command once semantic analysis has been loaded.
+
+        :param args: are the words after `\\pg4n`.
+        :returns: output of the command, see `SemanticRouter.run_command`.
+        """
+        self._loaded.wait()
+        if self._router is None:
+            return "Semantic analysis is not available."
+        return self._router.run_command(args)
+
+    def overhead_report(self) -> str:
+        """Get a report of pg4n's own work on the server, unless semantic \
+        analysis was never loaded.
+
+        :returns: the report, see `SemanticRouter.overhead_report`.
+        """
+        if not self._loaded.is_set() or self._router is None:
+            return ""
+        return self._router.overhead_report()
+
+    def run_analyses(
+        self,
+        sql_queries: list[str]
+    ) -> str:
+        """Run analyses once semantic analysis has been loaded.
+
+        :param sql_queries: are well-formed queries to run analytics on.
+        :returns: a summary, see `SemanticRouter.run_analyses`.
+        """
+        self._loaded.wait()
+        if self._router is None:
+            return ""
+        return self._router.run_analyses(sql_queries)
+
+    def submit_analyses(
+        self,
+        sql_queries: list[str]
+    ) -> Future:
+        """Start analyses without waiting for them, nor for semantic \
+        analysis to be loaded.
+
+        :param sql_queries: are well-formed queries to run analytics on.
+        :returns: a future of the summary, see \
+        `SemanticRouter.submit_analyses`.
+        """
+        summary: Future = Future()
+        with self._lock:
+            if not self._loaded.is_set():
+                self._submitted.append((sql_queries, summary))
+                return summary
+        self._chain(sql_queries, summary)
+        return summary
+
+    def _chain(self, sql_queries: list[str], summary: Future) -> None:
+        """Start analyses, passing their summary on to a future."""
+        if self._router is None:
+            summary.set_result("")
+            return
+        self._router.submit_analyses(sql_queries).add_done_callback(
+            lambda analyses: summary.set_result(
+                "" if analyses.exception() else analyses.result()
+            )
+        )
+
+    def run_planned_analyses(
+        self,
+        sql_queries: list[str],
+        plans: list[Optional[dict]]
+    ) -> str:
+        """Run analyses with known plans once semantic analysis has been \
+        loaded.
+
+        :param sql_queries: are well-formed queries to run analytics on.
+        :param plans: are plans of the queries in the same order.
+        :returns: a message, see `SemanticRouter.run_planned_analyses`.
+        """
+        self._loaded.wait()
+        if self._router is None:
+            return ""
+        return self._router.run_planned_analyses(sql_queries, plans)
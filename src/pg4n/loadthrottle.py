@@ -0,0 +1,181 @@
+# Licensed under MIT.
+"""Make analysis cheaper while the server is under load.
+
+Analysis degrades from `full` to `plan-only` to `ast-only` as load
+indicators exceed their thresholds, and recovers a level at a time once
+they have dropped well below them.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class LoadThrottle:
+    """Picks the costliest analysis mode the server can take right now, \
+    from the number of active backends and recent analysis latencies."""
+
+    # from costliest to cheapest
+    levels: list[str] = ["full", "plan-only", "ast-only"]
+    # how many levels below full each analysis mode is, e.g auto-explain
+    # plans queries it has no plans for
+    mode_levels: dict[str, int] = {
+        "full": 0, "plan-only": 1, "auto-explain": 1, "ast-only": 2,
+    }
+
+    # other sessions running a statement, sampled on pg4n's own connection
+    active_backends_query: str = """
+SELECT count(*)
+FROM pg_catalog.pg_stat_activity
+WHERE state = 'active' AND backend_type = 'client backend'
+    AND pid <> pg_catalog.pg_backend_pid();
+"""
+
+    # load is sampled at most this often
+    sample_interval_s: float = 5.0
+    # A level is kept at least this long before recovering from it, as
+    # cheaper analyses are faster whether the server is loaded or not.
+    hold_s: float = 30.0
+    # latencies of this many latest analyses are considered
+    latency_count: int = 10
+
+    def __init__(
+        self,
+        max_active_backends: int,
+        max_latency_ms: int,
+        count_active_backends: Callable[[], int]
+    ):
+        """Start unthrottled.
+
+        :param max_active_backends: is how many active backends the server \
+        takes before analysis degrades a level, and twice as many degrade \
+        it two levels. 0 ignores active backends.
+        :param max_latency_ms: is the median analysis latency that degrades \
+        analysis, like `max_active_backends`. 0 ignores latencies.
+        :param count_active_backends: queries the number of active backends.
+        """
+        self.max_active_backends: int = max_active_backends
+        self.max_latency_ms: int = max_latency_ms
+        self.count_active_backends: Callable[[], int] = count_active_backends
+        # index into levels
+        self.level: int = 0
+        self.active_backends: Optional[int] = None
+        self._latencies_ms: deque[float] = deque(maxlen=self.latency_count)
+        self._changed: float = time.monotonic()
+        self._sampled: float = 0.0
+        self._sampling: Optional[Future] = None
+        self._sampler: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pg4n-load"
+        )
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any load indicator is followed."""
+        return self.max_active_backends > 0 or self.max_latency_ms > 0
+
+    def limit(self, mode: str) -> str:
+        """Get the analysis mode to use instead of the one asked for, and \
+        sample load in the background if it is due.
+
+        :param mode: is one of `SemanticRouter.analysis_modes`.
+        :returns: the mode, or a cheaper one while server is under load.
+        """
+        if not self.enabled:
+            return mode
+        self._sample_if_due()
+        with self._lock:
+            level: int = self.level
+        if level > self.mode_levels.get(mode, 0):
+            return self.levels[level]
+        return mode
+
+    def record(self, latency_ms: float) -> None:
+        """Count how long an analysis took.
+
+        :param latency_ms: is the time from start to message.
+        """
+        with self._lock:
+            self._latencies_ms.append(latency_ms)
+            self._evaluate()
+
+    def update(self, active_backends: int) -> None:
+        """Take a sample of active backends.
+
+        :param active_backends: is how many other sessions are running \
+        a statement.
+        """
+        with self._lock:
+            self.active_backends = active_backends
+            self._evaluate()
+
+    def pressure(self) -> float:
+        """Get the highest load indicator relative to its threshold, e.g \
+        1.5 if there are 48 active backends out of 32."""
+        pressures: list[float] = [0.0]
+        if self.max_active_backends > 0 and self.active_backends is not None:
+            pressures.append(self.active_backends / self.max_active_backends)
+        if self.max_latency_ms > 0 and self._latencies_ms:
+            pressures.append(
+                statistics.median(self._latencies_ms) / self.max_latency_ms
+            )
+        return max(pressures)
+
+    def _evaluate(self) -> None:
+        """Degrade or recover a level per load. Call with lock held."""
+        pressure: float = self.pressure()
+        # level 1 above threshold, level 2 above twice the threshold
+        target: int = 0 if pressure <= 1 else 1 if pressure <= 2 else 2
+        now: float = time.monotonic()
+        if target > self.level:
+            self._set_level(target, now)
+        # well below where the level was entered, after holding it
+        elif self.level > 0 and pressure < self.level / 2 and \
+                now - self._changed >= self.hold_s:
+            self._set_level(self.level - 1, now)
+
+    def _set_level(self, level: int, now: float) -> None:
+        self.level = level
+        self._changed = now
+        # latencies at the previous level say little about the new one
+        self._latencies_ms.clear()
+
+    def _sample_if_due(self) -> None:
+        if self.max_active_backends <= 0:
+            return
+        with self._lock:
+            now: float = time.monotonic()
+            if now - self._sampled < self.sample_interval_s or (
+                self._sampling is not None and not self._sampling.done()
+            ):
+                return
+            self._sampled = now
+            self._sampling = self._sampler.submit(self._sample)
+
+    def _sample(self) -> None:
+        try:
+            self.update(self.count_active_backends())
+        except Exception:  # e.g database can not be reached, keep last level
+            pass
+
+    def describe(self) -> str:
+        """Get the current level and why, as a human-readable line."""
+        with self._lock:
+            indicators: list[str] = []
+            if self.active_backends is not None:
+                indicators.append(
+                    f"{self.active_backends} active backends"
+                )
+            if self._latencies_ms:
+                indicators.append(
+                    f"{statistics.median(self._latencies_ms):.0f} ms "
+                    "median latency"
+                )
+            state: str = f"throttled to {self.levels[self.level]}" \
+                if self.level > 0 else "not throttled"
+            if indicators != []:
+                state += " (" + ", ".join(indicators) + ")"
+            return state
@@ -1,21 +1,22 @@
-from functools import reduce
+import shlex
 import sys
 from typing import Optional
 
 import pexpect
 
+from .config_profiles import for_database
+from .config_reader import ConfigReader
+from .config_values import ConfigValues
+from .lazyrouter import LazyRouter
 from .psqlconninfo import PsqlConnInfo
-from .semanticrouter import SemanticRouter
 from .psqlparser import PsqlParser
 from .psqlwrapper import PsqlWrapper
-from .config_reader import ConfigReader
-from .config_values import ConfigValues
 
 
 def main() -> None:
-    """Initiate session by getting psql connection parameters via psql \
-    child process, initializing semantic analysis and wrapper modules, \
-    and then starting the session."""
+    """Initiate session by getting psql connection parameters from \
+    command-line arguments, initializing semantic analysis and wrapper \
+    modules, and then starting the session."""
 
     # Configuration is ignored if there is error reading config files
     config_values: Optional[ConfigValues] = None
@@ -26,31 +27,44 @@ def main() -> None:
         config_values = None
 
     if len(sys.argv) > 1:
-        conn_info = PsqlConnInfo(
-            reduce(lambda x, y: x + y, sys.argv[1:], "")  # concat arguments
-            ).get()
-        if conn_info is not None:
-            # asterisk unpacks the 5-tuple
-            sem_router = SemanticRouter(*conn_info, config_values)
+        # quote arguments back for psql command-line
+        psql_args: str = " ".join(shlex.quote(arg) for arg in sys.argv[1:])
+        conn_info = PsqlConnInfo(sys.argv[1:])
+        if conn_info.interactive:
+            # semantic analysis is loaded while psql starts, and picks
+            # options for each database itself
+            sem_router = LazyRouter(conn_info, config_values)
+            wrapper_values: Optional[ConfigValues] = config_values
+            if config_values and "Profiles" in config_values:
+                wrapper_values = \
+                    for_database(config_values, conn_info.known_params())
             psql = PsqlWrapper(
-                sys.argv[1].encode("utf-8"),
+                psql_args.encode("utf-8"),
                 # semantic analysis:
                 sem_router.run_analysis,
-                # no syntax error analysis:
-                lambda syntax_error_analysis: "",
-                PsqlParser()
+                # syntax error analysis:
+                sem_router.run_syntax_analysis,
+                PsqlParser(),
+                wrapper_values,
+                hook_semantic_batch_f=sem_router.run_analyses,
+                hook_speculate_f=sem_router.speculate,
+                hook_estimate_f=sem_router.estimate,
+                hook_command_f=sem_router.run_command,
+                hook_semantic_planned_f=sem_router.run_planned_analyses,
+                hook_switch_database_f=sem_router.switch_database,
+                hook_semantic_submit_f=sem_router.submit_analyses
             )
             psql.start()
+            if wrapper_values and \
+                    wrapper_values.get("OverheadReport", False):
+                report: str = sem_router.overhead_report()
+                if report != "":
+                    print(report)
         else:
             # Psql is not connecting to any database,
             # e.g. "pg4n --help" is being run.
             # for simplicity, just use pexpect here
-            psql_output = pexpect.spawn(
-                "psql "
-                + reduce(
-                    lambda x, y: x + y, sys.argv[1:], ""
-                )
-            )
+            psql_output = pexpect.spawn("psql " + psql_args)
             psql_output.expect(pexpect.EOF)
             print(bytes.decode(psql_output.before))
     else:
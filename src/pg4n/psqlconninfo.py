@@ -1,86 +1,150 @@
-import pexpect
-from typing import Optional, Tuple
-
-from pyparsing import Literal, Word, ParseException, ParserElement, \
-    identbodychars, nums
+import getopt
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
 
 
 class PsqlConnInfo:
-    """Get PostgreSQL server address, port, database name, and user via \
-    psql by supplying same arguments as the original psql process. This \
-    way we can avoid writing a command-line argument parser."""
-
-    # tok, or token, is parsing element with only single element output,
-    # either by only having single element, or using Combine to squash
-    # multiple elements into one. These are often combined to build functions
-    # for matching.
-
-    tok_pre_database: ParserElement = \
-        Literal("You are connected to database \"")
-    tok_database: ParserElement = \
-        Word(identbodychars)
-
-    tok_pre_user: ParserElement = \
-        Literal("\" as user \"")
-    tok_user: ParserElement = \
-        Word(identbodychars)
-
-    tok_pre_host: ParserElement = \
-        Literal("\" on host \"") | \
-        Literal("\" via socket in \"")
-    tok_host: ParserElement = \
-        Word(identbodychars + "/.")
-
-    tok_pre_port: ParserElement = \
-        Literal("\" at port \"")
-    tok_port: ParserElement = \
-        Word(nums)
-    tok_end: ParserElement = \
-        Literal("\".")
+    """Get PostgreSQL connection string from the same command-line arguments \
+    as the psql process is started with, without starting another psql.
+
+    Arguments are parsed like psql parses them, and anything not given on
+    command-line (e.g host from PGHOST, or service file entries) is left to
+    libpq to resolve on connect, like psql does.
+
+    psycopg is only imported once the connection string is asked for, so
+    that it is not imported before psql has started.
+    """
+
+    # per psql's bin/psql/startup.c
+    short_options: str = "aAbc:d:eEf:F:h:HlL:no:p:P:qR:sStT:U:v:VwWxXz0?1"
+    long_options: list[str] = [
+        "echo-all", "no-align", "echo-errors", "command=", "dbname=",
+        "echo-queries", "echo-hidden", "file=", "field-separator=", "host=",
+        "html", "list", "log-file=", "no-readline", "single-transaction",
+        "output=", "port=", "pset=", "quiet", "record-separator=",
+        "single-step", "single-line", "tuples-only", "table-attr=",
+        "username=", "set=", "variable=", "version", "no-password",
+        "password", "expanded", "no-psqlrc", "field-separator-zero",
+        "record-separator-zero", "csv",
+    ]
+    # keyword = value pair of a connection string, value optionally quoted
+    conninfo_pair: re.Pattern = \
+        re.compile(r"(\w+)\s*=\s*('(?:[^'\\]|\\.)*'|(?:[^\s'\\]|\\.)*)")
+
+    # options that make psql exit without an interactive session
+    noninteractive_options: list[str] = [
+        "-c", "--command", "-f", "--file", "-l", "--list", "-V", "--version",
+        "-?",
+    ]
 
     def __init__(
         self,
-        psql_args: str
+        psql_args: list[str]
     ):
-        """Use psql child process with exact same command-line arguments \
-        to initialize connection info."""
-        self.pg_tuple: Optional[Tuple[str, str, str, str, str]] = None
-        match_psql_conninfo: ParserElement = (
-            self.tok_pre_database + self.tok_database +
-            self.tok_pre_user + self.tok_user +
-            self.tok_pre_host + self.tok_host +
-            self.tok_pre_port + self.tok_port +
-            self.tok_end
-        )
-        pexpect_conninfo = pexpect.spawn("psql -c \"\\conninfo\" " + psql_args)
-        pexpect_conninfo.expect(pexpect.EOF)
-        conninfo_str = bytes.decode(pexpect_conninfo.before)
-        try:
-            conninfo_res = \
-                match_psql_conninfo.parse_string(conninfo_str).as_list()
-        except ParseException:
+        """Parse connection options from psql command-line arguments.
+
+        :param psql_args: are psql command-line arguments, without `psql`.
+        """
+        self.interactive: bool = False
+        self.params: dict[str, str] = {}
+        # database name that may be a connection string
+        self.dbname: Optional[str] = None
+
+        # --help takes an optional argument, which getopt cannot parse
+        if any(arg.startswith("--help") for arg in psql_args):
             return
-        self.pg_host = conninfo_res[5]
-        self.pg_port = conninfo_res[7]
-        self.pg_user = conninfo_res[3]
-        self.pg_pass = ""
-        self.pg_name = conninfo_res[1]
-        self.pg_tuple = (
-            self.pg_host,
-            self.pg_port,
-            self.pg_user,
-            self.pg_pass,
-            self.pg_name
+        try:
+            options, positional = getopt.gnu_getopt(
+                psql_args, self.short_options, self.long_options
+            )
+        except getopt.GetoptError:
+            return  # psql reports the error itself
+
+        params: dict[str, str] = self.params
+        dbname: Optional[str] = None
+        for option, value in options:
+            if option in self.noninteractive_options:
+                return
+            if option in ("-h", "--host"):
+                params["host"] = value
+            elif option in ("-p", "--port"):
+                params["port"] = value
+            elif option in ("-U", "--username"):
+                params["user"] = value
+            elif option in ("-d", "--dbname"):
+                dbname = value
+
+        # psql [OPTION]... [DBNAME [USERNAME]]
+        if dbname is None and len(positional) > 0:
+            dbname = positional.pop(0)
+        if "user" not in params and len(positional) > 0:
+            params["user"] = positional.pop(0)
+
+        self.dbname = dbname
+        self.interactive = True
+
+    @staticmethod
+    def _is_conninfo(dbname: str) -> bool:
+        """Check if database name is a connection string or URI, like \
+        libpq's `recognized_connection_string`."""
+        return "=" in dbname or dbname.startswith(
+            ("postgresql://", "postgres://")
         )
-        pass
+
+    def known_params(self) -> dict[str, str]:
+        """Get connection parameters given on command-line, without \
+        importing psycopg, e.g for picking configuration sections before \
+        psql starts.
+
+        :returns: parameters like `get`, where connection strings are \
+        parsed without libpq. Defaults are left out.
+        """
+        params: dict[str, str] = dict(self.params)
+        if self.dbname is None:
+            return params
+        if not self._is_conninfo(self.dbname):
+            params["dbname"] = self.dbname
+        elif "=" in self.dbname and "://" not in self.dbname:
+            for key, value in self.conninfo_pair.findall(self.dbname):
+                if value.startswith("'"):
+                    value = value[1:-1]
+                params[key] = re.sub(r"\\(.)", r"\1", value)
+        else:
+            uri = urlsplit(self.dbname)
+            userinfo, _, hostport = uri.netloc.rpartition("@")
+            host, port = (hostport, "") \
+                if hostport.endswith("]") or ":" not in hostport \
+                else hostport.rsplit(":", 1)
+            if userinfo != "":
+                params["user"] = unquote(userinfo.partition(":")[0])
+            if host != "":
+                params["host"] = unquote(host.strip("[]"))
+            if port != "":
+                params["port"] = port
+            if uri.path.lstrip("/") != "":
+                params["dbname"] = unquote(uri.path.lstrip("/"))
+            params.update(parse_qsl(uri.query))
+        return params
 
     def get(
             self
-    ) -> Optional[Tuple[str, str, str, str, str]]:
-        """Get 5-tuple that has the PostgreSQL host, port, user, pass, and db \
-        name.
+    ) -> Optional[str]:
+        """Get libpq connection string for the database psql connects to.
 
-        :returns: (hostname, port, user, password, database name) \
-        5-tuple or None.
+        :returns: connection string, or None if arguments do not start an \
+        interactive psql session (e.g `--help`).
         """
-        return self.pg_tuple
+        if not self.interactive:
+            return None
+
+        from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+        params: dict[str, str] = dict(self.params)
+        if self.dbname is not None:
+            if self._is_conninfo(self.dbname):
+                # connection string overrides other options, as in psql
+                params.update(conninfo_to_dict(self.dbname))
+            else:
+                params["dbname"] = self.dbname
+        return make_conninfo("", **params)
@@ -2,13 +2,14 @@
 # Licensed under MIT.
 """Parse psql output."""
 
-from functools import reduce
+import json
+import logging
+import re
 from string import printable
 from typing import Optional
 
 from pyparsing import (
     CaselessLiteral,
-    Char,
     Combine,
     Literal,
     Opt,
@@ -23,21 +24,20 @@ from pyparsing import (
     nums
 )
 
-# Turn on memoization optimization
-ParserElement.enablePackrat(None)
-
-# default whitespace rules complicate things needlessly, remove them:
-ParserElement.setDefaultWhitespaceChars("")
+_log: logging.Logger = logging.getLogger("pg4n.parser")
 
 
 class PsqlParser:
     """Parses psql output for syntactic analysis."""
 
-    # Turn on verbose output to psqlparser.log file in working directory
-    debug: bool = False
-
     # Parsing functions common to more than 1 parsing functions are listed here
 
+    # Default whitespace rules complicate things needlessly, so they are
+    # removed with leave_whitespace() from every grammar. Packrat
+    # memoization is not turned on: its cache is shared by every pyparsing
+    # user in the process, and these grammars do not backtrack enough to
+    # benefit from it.
+
     prompt_chars: str = identbodychars
     stmt_end: str = ";"
     # Naively, SQL statement body can contain all printable characters
@@ -65,7 +65,7 @@ class PsqlParser:
             + (Literal('#') | Literal('>'))
             + Opt(Literal('*') | Literal('!') | Literal('?'), "")
             + (Literal('=') | Literal('^'))
-    )
+    ).leave_whitespace()
 
     # %/%R%x%# per postgres bin/psql/settings.h
     # prompt2 per bin/psql/prompt.c:
@@ -85,6 +85,11 @@ class PsqlParser:
          "-!>", "*!>", "\'!>", "\"!>", "$!>", "(!>",
          "-?#", "*?#", "\'?#", "\"?#", "$?#", "(?#",
          "-?>", "*?>", "\'?>", "\"?>", "$?>", "(?>"]
+    _multiline_prompts: tuple[str, ...] = \
+        tuple(prompt_end + " " for prompt_end in multiline_prompt_ends)
+    _multiline_prompt_alternatives: str = "(?:" + "|".join(
+        map(re.escape, sorted(multiline_prompt_ends, key=len, reverse=True))
+    ) + ")"
     # ParserElement for these would look this:
     #    tok_multiline_prompt_end: ParserElement = \
     #        Combine(
@@ -93,9 +98,105 @@ class PsqlParser:
     #            Opt(Literal('*') | Literal('!') | Literal('?'), "") +
     #            (Literal('#') | Literal('>')))
 
+    # Same as "%/" followed by tok_rev_prompt_end, unreversed
+    _prompt: re.Pattern = re.compile(
+        r"(?P<db_name>\w+)[=^][*!?]?[#>]\s*"
+    )
+    # $tag$ opening a dollar-quoted string constant
+    _dollar_quote: re.Pattern = re.compile(r"\$([A-Za-z_][A-Za-z_0-9]*)?\$")
+    # meta-commands that send the query buffer to the server
+    _send_meta_command: re.Pattern = \
+        re.compile(r"\\(g|gx|gset|gexec|gdesc|watch)\b")
+    # meta-commands that run a script file, and the file name argument
+    _include_meta_command: re.Pattern = re.compile(
+        r"\\(?:i|include|ir|include_relative)\s+('(?:[^']|'')*'|\S+)\s*$"
+    )
+
+    # pg4n's own commands, which psql rejects as invalid after running them
+    _control_command: re.Pattern = re.compile(r"\\pg4n(?:\s+(.*))?$")
+    _invalid_control_command: re.Pattern = re.compile(
+        r"(?:psql: error: )?invalid command \\pg4n\r\n"
+        r"|Try \\\? for help\.\r\n"
+    )
+
+    # EXPLAIN of a SELECT, with old-style or parenthesized options
+    _explain_stmt: re.Pattern = re.compile(
+        r"\s*EXPLAIN\s+(?:\([^)]*\)\s*|(?:ANALY[SZ]E\s+)?(?:VERBOSE\s+)?)"
+        r"(?P<stmt>SELECT\b.*)",
+        flags=re.IGNORECASE | re.DOTALL
+    )
+    # header of EXPLAIN results in aligned format, and a row count footer
+    _query_plan_header: re.Pattern = re.compile(
+        r"^ *QUERY PLAN *\n-+\n", flags=re.MULTILINE
+    )
+    _rows_footer: re.Pattern = re.compile(r"^\(\d+ rows?\)", flags=re.MULTILINE)
+
+    # psql's message after "\c", per do_connect in bin/psql/command.c;
+    # spaces are optional, as they are lost where the screen wraps lines
+    _connection_change: re.Pattern = re.compile(
+        r'You ?are ?now ?connected ?to ?database ?"(?P<dbname>[^"]*)"'
+        r' ?as ?user ?"(?P<user>[^"]*)"'
+        r'(?: ?via ?socket ?in ?"(?P<socket>[^"]*)"'
+        r'| ?on ?address ?"(?P<hostaddr>[^"]*)"'
+        r'| ?on ?host ?"(?P<host>[^"]*)"(?: ?\(address ?"[^"]*"\))?)?'
+        r'(?: ?at ?port ?"(?P<port>[^"]*)")?\.'
+    )
+    # database name in a fresh prompt, after bracketed paste mode switch
+    _prompt_db_name: re.Pattern = re.compile(
+        r"(?:\x1b\[\?2004h)?(?P<db_name>\w+)[=^][*!?]?[#>] ?$"
+    )
+
+    # psql's "\timing on" output, and footer of aligned results
+    _query_stat: re.Pattern = re.compile(
+        r"^(?:Time: (?P<ms>\d+\.\d+) ms|\((?P<rows>\d+) rows?\))",
+        flags=re.MULTILINE
+    )
+
     def __init__(self):
-        """Plain constructor for PsqlParser."""
-        pass
+        """Build grammars once, as they do not change between calls."""
+        # Based on exploratory testing,
+        # magic strings (related at least to ctrl-R use) are
+        # "\r\n\x1b[?2004l\r", "\r\n\r\r\n" and "\x08\r\n".
+        self._match_rev_magical_returns: ParserElement = (
+            Literal("\r\n\x1b[?2004l\r"[::-1])
+            | Literal("\r\n\r\r\n"[::-1])
+            | Literal("\x08\r\n"[::-1])
+        ).leave_whitespace()
+
+        self._match_rev_prompt_and_then_rest: ParserElement = (
+            self.tok_rev_prompt_end
+            + Word(self.prompt_chars)
+            + (StringEnd()         # output may stop at end of db name,
+               | (  # or continue \x1b[?..
+                   Literal("?[\x1b")  # in this case control code parameter
+                   + ...              # has already been parsed as prompt_chars
+                   + StringEnd()
+               )
+            )
+        ).leave_whitespace()
+
+        self._match_select_stmt: ParserElement = (
+            ZeroOrMore(White())
+            + CaselessLiteral("SELECT")
+        ).leave_whitespace()
+
+        self._match_version_stmt: ParserElement = (
+            Literal("psql (PostgreSQL) ")
+            + Combine(
+                Word(nums)
+                + '.'
+                + Word(nums)
+            )
+        ).leave_whitespace()
+
+    def _log_parse_failure(self, e: ParseException) -> None:
+        """Log why parsing failed, if parser failures are being logged.
+
+        :param e: is the exception raised by pyparsing.
+        """
+        # explaining is expensive, so it is only done when needed
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug("%s", e.explain())
 
     def output_has_magical_return(self, psql: str) -> bool:
         """Check for weird Return presses.
@@ -106,26 +207,14 @@ class PsqlParser:
         # cheaper and easier to reverse & start from the end
         psql_rev: str = psql[::-1]  # slicing is fastest operation for reverse
 
-        # Based on exploratory testing,
-        # magic strings (related at least to ctrl-R use) are
-        # "\r\n\x1b[?2004l\r", "\r\n\r\r\n" and "\x08\r\n".
-        match_rev_magical_returns: ParserElement = (
-            Literal("\r\n\x1b[?2004l\r"[::-1])
-            | Literal("\r\n\r\r\n"[::-1])
-            | Literal("\x08\r\n"[::-1])
-        )
-
         has_magical_return: bool = False
         magical_return_res: Optional[ParseResults] = None
 
         try:
             magical_return_res = \
-                match_rev_magical_returns.parse_string(psql_rev)
+                self._match_rev_magical_returns.parse_string(psql_rev)
         except ParseException as e:
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
+            self._log_parse_failure(e)
 
         if magical_return_res:
             has_magical_return = True
@@ -142,21 +231,25 @@ class PsqlParser:
         has_new_prompt: bool = False
         prompt_res: Optional[ParseResults] = None
 
-        match_rev_prompt_end: ParserElement = self.tok_rev_prompt_end
-
         try:
-            prompt_res = match_rev_prompt_end.parse_string(psql_rev)
+            prompt_res = self.tok_rev_prompt_end.parse_string(psql_rev)
         except ParseException as e:
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
+            self._log_parse_failure(e)
 
         if prompt_res:
             has_new_prompt = True
 
         return has_new_prompt
 
+    def output_has_continuation_prompt(self, psql: str) -> bool:
+        """Detect when psql waits for rest of a statement by checking for a \
+        continuation prompt (e.g `-> `).
+
+        :param psql: Raw console output that includes terminal control codes.
+        :returns: if output ends in a continuation prompt.
+        """
+        return psql.endswith(self._multiline_prompts)
+
     def parse_new_prompt_and_rest(self, psql: str) -> list[str]:
         """Parse for a fresh prompt and everything preceding it into 2-length \
         list, facilitating easy message injection.
@@ -171,26 +264,11 @@ class PsqlParser:
         results: list[str] = []
         prompt_res: Optional[ParseResults] = None
 
-        match_rev_prompt_and_then_rest: ParserElement = (
-            self.tok_rev_prompt_end 
-            + Word(self.prompt_chars)
-            + (StringEnd()         # output may stop at end of db name,
-               | (  # or continue \x1b[?.. 
-                   Literal("?[\x1b")  # in this case control code parameter
-                   + ...              # has already been parsed as prompt_chars
-                   + StringEnd()
-               )
-            )
-        )
-
         try:
-            prompt_res = match_rev_prompt_and_then_rest.parse_string(psql_rev)
+            prompt_res = \
+                self._match_rev_prompt_and_then_rest.parse_string(psql_rev)
         except ParseException as e:
-            print(e.explain())
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
+            self._log_parse_failure(e)
 
         if prompt_res:
             res_list = prompt_res.as_list()
@@ -210,58 +288,17 @@ class PsqlParser:
     def parse_last_stmt(self, psql: str) -> str:
         """Parse for last SQL query statement in a string.
 
+        Only the lines after the last prompt are looked at, so the cost does
+        not depend on how much output there is above the statement.
+
         :param psql: screenscraped psql string with only whitespace \
         after most recent query.
         :returns: parsed SQL query as plain string.
         """
-        # cheaper and easier to reverse & start from the end
-        psql_rev = psql[::-1]
-
-        # Match statement that might have \r\n or whitespace at the end.
-        # Parse prompt text at the end, so multiline queries can be cleaned
-        # properly.
-        tok_stmt_end: ParserElement = Char(';')
-
-        match_rev_any_sql_stmt: ParserElement = (
-            ZeroOrMore(White())
-            + tok_stmt_end
-            + ...
-            + self.tok_rev_prompt_end
-        )
-
-        match_rev_last_stmt: ParserElement = (
-            ZeroOrMore(Char("\n") | Char("\r") | White())
-            + match_rev_any_sql_stmt
-            + Word(self.prompt_chars)
-        )
-
-        results: list[str] = []
-        stmt_res: Optional[ParseResults] = None
-        db_name: str = ""
-
-        try:
-            stmt_res = match_rev_last_stmt.parse_string(psql_rev)
-        except ParseException as e:
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
-
-        # If parsing was successful, pick interesting parts.
-        if stmt_res is not None:
-            stmt_res_list = stmt_res.as_list()
-            length: int = len(stmt_res_list)
-
-            results = [
-                stmt_res_list[length - 3],
-                stmt_res_list[length - 4]
-            ]
-            db_name = stmt_res_list[length - 1][::-1]
-
-        # reverse back, concatenate, and remove \n's
-        unreversed_flattened_res: str = reduce(
-            lambda x, y: x + y[::-1], results, ""
-        )
+        window: Optional[tuple[str, str]] = self._last_stmts_window(psql)
+        if window is None:
+            return ""
+        (stmts, db_name) = window
 
         # Replacing \n's has some edge cases where wrapper transparency
         # breaks, because both of these work right in straight psql. See:
@@ -273,33 +310,377 @@ class PsqlParser:
         # should convert \n -> " " to avoid "SELECT* FROM ..".
         #
         # Replacing \n's with " " seems to have less edge cases.
-        no_newlines_res = unreversed_flattened_res.replace('\n', ' ')
+        no_newlines_res: str = stmts.replace("\n", " ")
 
-        # Is the statement a SELECT statement?
-        match_select_stmt: ParserElement = (
-            ZeroOrMore(White())
-            + CaselessLiteral("SELECT")
+        # If it is SELECT, remove multiline delimiters and then statement is
+        # ready for analysis.
+        if self.is_analyzable_stmt(no_newlines_res):
+            multiline_prompt: re.Pattern = re.compile(
+                re.escape(db_name) + self._multiline_prompt_alternatives
+            )
+            stmt: str = multiline_prompt.sub("", no_newlines_res)
+            _log.info("screen-scraped statement %r", stmt)
+            return stmt
+        else:
+            return ""
+
+    def parse_last_stmts(self, psql: str) -> list[str]:
+        """Parse for all SQL SELECT statements (and EXPLAINs of them) \
+        submitted at the last prompt, e.g when a script is pasted at once.
+
+        :param psql: screenscraped psql string with only whitespace \
+        after most recent statements.
+        :returns: parsed SQL SELECT statements as plain strings, with line \
+        breaks and continuation prompts removed like in `parse_last_stmt`.
+        """
+        window: Optional[tuple[str, str]] = self._last_stmts_window(psql)
+        if window is None:
+            return []
+        (stmts, db_name) = window
+
+        # line breaks are kept until statements are split, as they end
+        # '--' comments
+        multiline_prompt: re.Pattern = re.compile(
+            re.escape(db_name) + self._multiline_prompt_alternatives
+        )
+        statements, _ = \
+            self.split_statements(multiline_prompt.sub("", stmts))
+        selects: list[str] = [
+            stmt.replace("\n", " ") for stmt in statements
+            if self.is_analyzable_stmt(stmt)
+        ]
+        _log.info("screen-scraped statements %r", selects)
+        return selects
+
+    def _last_stmts_window(self, psql: str) -> Optional[tuple[str, str]]:
+        """Find what has been submitted at the last prompt.
+
+        :param psql: screenscraped psql string with only whitespace \
+        after most recent statements.
+        :returns: text from the prompt to the last ';', and database name \
+        in the prompt, or None if output does not end in a statement.
+        """
+        # Statement might have \r\n or whitespace at the end
+        end: int = len(psql)
+        while end > 0 and psql[end - 1] in " \t\r\n":
+            end -= 1
+        if not psql.startswith(self.stmt_end, end - 1):
+            return None
+
+        prompt: Optional[re.Match] = self._find_last_prompt(psql, end)
+        if prompt is None:
+            _log.debug("no prompt before statement")
+            return None
+        return (psql[prompt.end():end], prompt.group("db_name"))
+
+    def _find_last_prompt(self, psql: str, end: int) -> Optional[re.Match]:
+        """Find the last line with a fresh prompt (e.g `pgdb=> `), walking \
+        lines backwards.
+
+        :param psql: screen-scraped psql output.
+        :param end: is where search ends.
+        :returns: prompt match, or None if there is no prompt before `end`.
+        """
+        line_end: int = end
+        while True:
+            line_start: int = psql.rfind("\n", 0, line_end) + 1
+            prompt: Optional[re.Match] = \
+                self._prompt.search(psql, line_start, line_end)
+            if prompt is not None or line_start == 0:
+                return prompt
+            line_end = line_start - 1
+
+    def parse_last_meta_command(self, psql: str) -> str:
+        """Parse for a meta-command submitted at the last prompt.
+
+        :param psql: screenscraped psql string with only whitespace \
+        after most recent meta-command.
+        :returns: the meta-command line, or "" if the last prompt was not \
+        followed by a meta-command.
+        """
+        end: int = len(psql)
+        while end > 0 and psql[end - 1] in " \t\r\n":
+            end -= 1
+        prompt: Optional[re.Match] = self._find_last_prompt(psql, end)
+        if prompt is None:
+            return ""
+        # a meta-command is a single line, which may be wrapped on screen
+        meta_command: str = psql[prompt.end():end].replace("\n", "")
+        return meta_command if meta_command.startswith("\\") else ""
+
+    def parse_include(self, meta_command: str) -> str:
+        """Parse for the script file a meta-command runs, e.g \
+        `\\i migration.sql` or `\\ir 'my script.sql'`.
+
+        :param meta_command: a single meta-command line.
+        :returns: file name as given, or "" if meta-command does not run a \
+        script file.
+        """
+        match: Optional[re.Match] = \
+            self._include_meta_command.match(meta_command.strip())
+        if match is None:
+            return ""
+        file_name: str = match.group(1)
+        if file_name.startswith("'") and file_name.endswith("'") \
+                and len(file_name) > 1:
+            file_name = file_name[1:-1].replace("''", "'")
+        return file_name
+
+    def parse_control_command(self, meta_command: str) -> Optional[list[str]]:
+        """Parse for a pg4n command, e.g `\\pg4n mode plan-only`.
+
+        :param meta_command: a single meta-command line.
+        :returns: words after `\\pg4n`, or None if meta-command is not a \
+        pg4n command.
+        """
+        match: Optional[re.Match] = \
+            self._control_command.match(meta_command.strip())
+        if match is None:
+            return None
+        return (match.group(1) or "").split()
+
+    def strip_invalid_control_command(self, psql: str) -> str:
+        """Remove psql's complaint about `\\pg4n` being an invalid \
+        command.
+
+        :param psql: is psql output.
+        :returns: output without the complaint.
+        """
+        return self._invalid_control_command.sub("", psql)
+
+    def parse_connection_change(
+        self,
+        psql: str
+    ) -> Optional[dict[str, str]]:
+        """Parse for the connection psql reports having switched to after \
+        `\\c` at the last prompt.
+
+        :param psql: screenscraped psql string, from the prompt `\\c` was \
+        submitted at, up to the next prompt.
+        :returns: libpq connection parameters of the new connection (e.g \
+        `{"dbname": "otherdb", "user": "postgres"}`), or None if psql did \
+        not report switching.
+        """
+        prompt: Optional[re.Match] = self._find_last_prompt(psql, len(psql))
+        after_prompt: str = \
+            psql[prompt.end() if prompt is not None else 0:]
+        if "connected" not in after_prompt:
+            return None
+        # the message may be wrapped on screen
+        match: Optional[re.Match] = self._connection_change.search(
+            after_prompt.replace("\r", "").replace("\n", "")
         )
+        if match is None:
+            return None
+        params: dict[str, str] = \
+            {"dbname": match.group("dbname"), "user": match.group("user")}
+        for param, group in (("host", "socket"), ("host", "host"),
+                             ("hostaddr", "hostaddr"), ("port", "port")):
+            if match.group(group) is not None:
+                params[param] = match.group(group)
+        return params
+
+    def parse_prompt_db_name(self, psql: str) -> str:
+        """Parse for the database name in a fresh prompt (`%/` of psql's \
+        default prompt).
+
+        :param psql: Raw console output that includes terminal control codes.
+        :returns: the database name, or "" if output does not end in a \
+        fresh prompt.
+        """
+        split_prompt: list[str] = self.parse_new_prompt_and_rest(psql)
+        if split_prompt == []:
+            return ""
+        match: Optional[re.Match] = \
+            self._prompt_db_name.search(split_prompt[1])
+        return match.group("db_name") if match is not None else ""
+
+    def parse_query_stats(
+        self,
+        psql: str
+    ) -> list[tuple[Optional[float], Optional[int]]]:
+        """Parse for runtimes (`Time: 1.234 ms`) and row counts \
+        (`(3 rows)`) of statements run at the last prompt.
+
+        :param psql: screenscraped psql string, from the prompt statements \
+        were submitted at, up to the next prompt.
+        :returns: (runtime in milliseconds, row count) for each statement, \
+        with None for what psql did not print. Without `\\timing on`, only \
+        statements with a row count are known.
+        """
+        prompt: Optional[re.Match] = self._find_last_prompt(psql, len(psql))
+        stats: list[tuple[Optional[float], Optional[int]]] = []
+        rows: Optional[int] = None
+        for match in self._query_stat.finditer(
+                psql, prompt.end() if prompt is not None else 0
+        ):
+            if match.group("rows") is not None:
+                if rows is not None:  # previous statement had no runtime
+                    stats.append((None, rows))
+                rows = int(match.group("rows"))
+            else:
+                stats.append((float(match.group("ms")), rows))
+                rows = None
+        if rows is not None:
+            stats.append((None, rows))
+        return stats
+
+    def is_select_stmt(self, stmt: str) -> bool:
+        """Check if statement is an SQL SELECT statement.
+
+        :param stmt: a single SQL statement.
+        :returns: if statement starts with SELECT.
+        """
         is_select: bool = False
         try:
             is_select = \
-                match_select_stmt.parse_string(no_newlines_res) is not []
+                self._match_select_stmt.parse_string(stmt) is not []
         except ParseException as e:
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
+            self._log_parse_failure(e)
 
-        # If it is SELECT, remove multiline delimiters and then statement is
-        # ready for analysis.
-        if is_select:
-            demultilined_res: str = no_newlines_res
-            for multiline_prompt_end in self.multiline_prompt_ends:
-                prompt = db_name + multiline_prompt_end
-                demultilined_res = demultilined_res.replace(prompt, "")
-            return demultilined_res
-        else:
-            return ""
+        return is_select
+
+    def is_analyzable_stmt(self, stmt: str) -> bool:
+        """Check if statement is an SQL SELECT statement, or an EXPLAIN of \
+        one.
+
+        :param stmt: a single SQL statement.
+        :returns: if statement can be analyzed.
+        """
+        return self.is_select_stmt(stmt) or self.parse_explain_stmt(stmt) != ""
+
+    def parse_explain_stmt(self, stmt: str) -> str:
+        """Parse for the SELECT statement an EXPLAIN explains, e.g \
+        `EXPLAIN ANALYZE SELECT 1;` or `EXPLAIN (FORMAT JSON) SELECT 1;`.
+
+        :param stmt: a single SQL statement.
+        :returns: the SELECT statement, or "" if statement is not an \
+        EXPLAIN of a SELECT.
+        """
+        match: Optional[re.Match] = self._explain_stmt.match(stmt)
+        return match.group("stmt") if match is not None else ""
+
+    def parse_explain_plan(self, psql: str) -> Optional[dict]:
+        """Parse for the plan psql has printed for `EXPLAIN (FORMAT JSON)` \
+        at the last prompt.
+
+        Only aligned output (psql's default) can be parsed, and only if the
+        plan lines were not wrapped by the terminal.
+
+        :param psql: screenscraped psql string, from the prompt EXPLAIN was \
+        submitted at, up to the next prompt.
+        :returns: the plan as an element of EXPLAIN's JSON output, or None \
+        if there is no JSON plan.
+        """
+        psql = psql.replace("\r\n", "\n")
+        prompt: Optional[re.Match] = self._find_last_prompt(psql, len(psql))
+        header: Optional[re.Match] = self._query_plan_header.search(
+            psql, prompt.end() if prompt is not None else 0
+        )
+        if header is None:
+            return None
+        footer: Optional[re.Match] = \
+            self._rows_footer.search(psql, header.end())
+        if footer is None:
+            return None
+
+        # continued lines end in "+", and every line starts with a space
+        lines: list[str] = []
+        for line in psql[header.end():footer.start()].splitlines():
+            line = line.rstrip()
+            if line.endswith("+"):
+                line = line[:-1].rstrip()
+            lines.append(line[1:] if line.startswith(" ") else line)
+        try:
+            plan = json.loads("\n".join(lines))
+        except ValueError:
+            return None
+        if not isinstance(plan, list) or plan == [] or \
+                not isinstance(plan[0], dict) or "Plan" not in plan[0]:
+            return None
+        return plan[0]
+
+    def split_statements(self, sql: str) -> tuple[list[str], str]:
+        """Split psql input into complete statements the way psql's own \
+        lexer decides when to send a query.
+
+        A statement ends at ';' outside of quotes, comments and parentheses,
+        or at a \\g-family meta-command. Other meta-commands are dropped
+        from the statement text, as psql executes them on the side.
+
+        :param sql: psql input, possibly spanning several lines.
+        :returns: a list of complete statements (with their ';'), and the \
+        incomplete rest psql would still hold in its query buffer.
+        """
+        statements: list[str] = []
+        parts: list[str] = []  # pieces of the statement being built
+        start: int = 0  # start of current piece
+        paren_depth: int = 0
+        i: int = 0
+        n: int = len(sql)
+
+        def skip_to(end: int) -> int:
+            return n if end == -1 else end
+
+        while i < n:
+            c = sql[i]
+            if c == "-" and sql.startswith("--", i):
+                i = skip_to(sql.find("\n", i))
+            elif c == "/" and sql.startswith("/*", i):
+                # block comments nest in PostgreSQL
+                depth = 1
+                i += 2
+                while i < n and depth > 0:
+                    if sql.startswith("/*", i):
+                        depth += 1
+                        i += 2
+                    elif sql.startswith("*/", i):
+                        depth -= 1
+                        i += 2
+                    else:
+                        i += 1
+            elif c == "'":
+                escapes = i > 0 and sql[i - 1] in "eE" and \
+                    (i < 2 or sql[i - 2] not in self.prompt_chars)
+                i += 1
+                while i < n and sql[i] != "'":
+                    i += 2 if escapes and sql[i] == "\\" else 1
+                i += 1
+            elif c == '"':
+                i = skip_to(sql.find('"', i + 1)) + 1
+            elif c == "$" and \
+                    (i == 0 or sql[i - 1] not in self.prompt_chars) and \
+                    (m := self._dollar_quote.match(sql, i)):
+                i = skip_to(sql.find(m.group(), m.end())) + len(m.group())
+            elif c == "(":
+                paren_depth += 1
+                i += 1
+            elif c == ")":
+                paren_depth = max(paren_depth - 1, 0)
+                i += 1
+            elif c == ";" and paren_depth == 0:
+                parts.append(sql[start:i + 1])
+                stmt = "".join(parts).strip()
+                if stmt != ";":
+                    statements.append(stmt)
+                parts = []
+                start = i = i + 1
+            elif c == "\\":
+                # meta-command runs to the end of line
+                eol = skip_to(sql.find("\n", i))
+                parts.append(sql[start:i])
+                if self._send_meta_command.match(sql, i):
+                    stmt = "".join(parts).strip()
+                    if stmt != "":
+                        statements.append(stmt)
+                    parts = []
+                    paren_depth = 0
+                start = i = eol
+            else:
+                i += 1
+
+        parts.append(sql[start:])
+        return statements, "".join(parts).strip()
 
     def parse_psql_version(self, psql: str) -> str:
         """Parse for psql version and return version number.
@@ -307,24 +688,13 @@ class PsqlParser:
         :param psql: psql --version output
         :returns: version string (e.g "14.5")
         """
-        match_version_stmt: ParserElement = (
-            Literal("psql (PostgreSQL) ")
-            + Combine(
-                Word(nums)
-                + '.'
-                + Word(nums)
-            )
-        )
         stmt_res: Optional[ParseResults] = None
         result: str = ""
 
         try:
-            stmt_res = match_version_stmt.parse_string(psql)
+            stmt_res = self._match_version_stmt.parse_string(psql)
         except ParseException as e:
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
+            self._log_parse_failure(e)
 
         if stmt_res:
             result = stmt_res.as_list()[1]
@@ -332,39 +702,31 @@ class PsqlParser:
         return result
 
     def parse_syntax_error(self, psql: str) -> str:
-        """Parse for syntax error output.
+        """Parse for syntax error output of the latest statement.
+
+        If output ends in a fresh prompt, the error is looked for in between
+        it and the prompt before it, so that errors still on screen from
+        earlier statements are not reported again.
 
         :param psql: screen-scraped psql output.
         :returns: syntax error message from 'ERROR:' to last '^'.
         """
-        psql_rev = psql[::-1]
-
-        tok_marker_caret: ParserElement = Literal("^")
-        tok_rev_error: ParserElement = Literal(":RORRE")
-        match_error_statement: ParserElement = (
-            ...
-            + tok_marker_caret
-            + ...
-            + tok_rev_error
-        )
-
-        results: list[str] = []
-        stmt_res: Optional[ParseResults] = None
+        window_start: int = 0
+        window_end: int = len(psql)
+        prompt: Optional[re.Match] = self._find_last_prompt(psql, window_end)
+        if prompt is not None and psql[prompt.end():].strip() == "":
+            window_end = prompt.start()
+            prompt = self._find_last_prompt(psql, window_end)
+        if prompt is not None:
+            window_start = prompt.end()
+
+        caret: int = psql.rfind("^", window_start, window_end)
+        if caret == -1:
+            return ""
+        error: int = psql.rfind("ERROR:", window_start, caret)
+        if error == -1:
+            return ""
 
-        try:
-            stmt_res = match_error_statement.parse_string(psql_rev)
-        except ParseException as e:
-            if self.debug:
-                f = open("psqlparser.log", "a")
-                f.write(str(e.explain()) + "\n")
-                f.close()
-
-        if stmt_res is not None:
-            stmt_res_list = stmt_res.as_list()
-            results = [stmt_res_list[3],
-                       stmt_res_list[2],
-                       stmt_res_list[1]]
-        unreversed_flattened_res: str = \
-            reduce(lambda x, y: x + y[::-1], results, "")
-
-        return unreversed_flattened_res
+        syntax_error: str = psql[error:caret + 1]
+        _log.info("screen-scraped syntax error %r", syntax_error)
+        return syntax_error
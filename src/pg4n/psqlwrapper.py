@@ -6,32 +6,102 @@ Uses pexpect in combination with pyte for interfacing and screen-scraping
 respectively.
 """
 
+import json
+import logging
+import os
+import shlex
+import shutil
+import signal
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import deepcopy
 from shutil import get_terminal_size
-from typing import Callable, List
+from typing import Callable, List, Optional
 
 import pexpect
-from pyte import Stream, Screen
+from pyte import Stream
 
+from .autoexplain import AutoExplain
+from .config_values import ConfigValues
+from .costgate import CostEstimate, CostGate
+from .debuglog import DebugLog
+from .inputcapture import InputCapture
 from .psqlparser import PsqlParser
+from .querylog import QueryLog
+from .querystats import QueryRun, QueryStats, fingerprint
+from .scrollbackscreen import ScrollbackScreen
+from .sessionrecord import SessionRecorder
+
+_stream_log: logging.Logger = logging.getLogger("pg4n.stream")
+_screen_log: logging.Logger = logging.getLogger("pg4n.screen")
 
 
 class PsqlWrapper:
     """Handles terminal interfacing with psql, using the parameter parser \
     to pick up relevant SQL statements and syntax errors for hook functions."""
 
-    # debug creates pyte.screen (current screenscraping context) and
-    # psqlwrapper.log (capturing terminal stream) in working directory
-    debug: bool = False
-
     supported_psql_versions: list[str] = ["14.5"]
+    # file name in pg4n's cache directory
+    psql_version_cache: str = "psql_version.json"
+
+    # "screen" scrapes submitted queries from the emulated terminal screen,
+    # "input" follows user's keystrokes (falling back to screen-scraping
+    # when keystrokes cannot be followed, e.g with ctrl-R), and "querylog"
+    # reads psql's own query log (falling back to screen-scraping if user
+    # has given psql a log file of their own).
+    capture_modes: list[str] = ["screen", "input", "querylog"]
+
+    # Lines scrolled off screen are kept from the start of current statement,
+    # so queries taller than the terminal can be screen-scraped.
+    default_scrollback_lines: int = 1000
+
+    # Pagers and editors switch to the alternate screen, and their output is
+    # passed through without parsing until they switch back.
+    alt_screen_enter: tuple[bytes, ...] = \
+        (b"\x1b[?1049h", b"\x1b[?1047h", b"\x1b[?47h")
+    alt_screen_exit: tuple[bytes, ...] = \
+        (b"\x1b[?1049l", b"\x1b[?1047l", b"\x1b[?47l")
+
+    # Query results are passed through without parsing until a prompt comes
+    # in. Only the end of each chunk is checked for a prompt, and only the
+    # end of results is kept for screen-scraping (e.g for syntax errors).
+    prompt_scan_len: int = 256
+    results_tail_len: int = 8192
+
+    # Scripts run with \i and friends are analyzed while psql runs them,
+    # unless they are larger than this many characters.
+    include_max_len: int = 1 << 24
+
+    # A query is analyzed speculatively once user has typed a complete
+    # SELECT and paused typing for this many seconds.
+    speculation_delay: float = 0.3
+
+    # Queries repeated in this session are not analyzed again if they ran
+    # faster than this, and results with more rows are pointed out.
+    default_fast_query_ms: int = 100
+    default_large_result_rows: int = 100000
 
     def __init__(
         self,
         psql_args: bytes,
         hook_semantic_f: Callable[[str], str],
         hook_syntax_f: Callable[[str], str],
-        parser: PsqlParser
+        parser: PsqlParser,
+        config_values: Optional[ConfigValues] = None,
+        dimensions: Optional[tuple[int, int]] = None,
+        hook_semantic_batch_f: Optional[Callable[[list[str]], str]] = None,
+        hook_speculate_f: Optional[Callable[[str], None]] = None,
+        hook_estimate_f:
+            Optional[Callable[[str, int], Optional[CostEstimate]]] = None,
+        hook_command_f: Optional[Callable[[list[str]], str]] = None,
+        hook_semantic_planned_f: Optional[
+            Callable[[list[str], list[Optional[dict]]], str]
+        ] = None,
+        hook_switch_database_f:
+            Optional[Callable[[dict[str, str]], None]] = None,
+        hook_semantic_submit_f:
+            Optional[Callable[[list[str]], Future]] = None
     ):
         """Build wrapper for selected database.
 
@@ -44,22 +114,135 @@ class PsqlWrapper:
         messages are passed to, and from which corresponding warning messages \
         are received.
         :param parser: A parser that implements the required parsing functions.
+        :param config_values: are the options read from configuration files.
+        :param dimensions: are the terminal columns and lines, by default \
+        those of the current terminal.
+        :param hook_semantic_batch_f: is a callback to which several SQL \
+        queries submitted at once are passed to, and from which a summary of \
+        their warning messages is received. If not given, only the last of \
+        them is passed to `hook_semantic_f`.
+        :param hook_speculate_f: is a callback to which an SQL query is \
+        passed while user is still typing it, so that its analysis can be \
+        prepared before it is submitted.
+        :param hook_estimate_f: is a callback to which an SQL query and a \
+        time budget in milliseconds are passed when user hits Return, and \
+        from which a cost estimate is received, or None if the query could \
+        not be estimated in time. It is only used if a cost gate is \
+        configured, see `CostGate`.
+        :param hook_command_f: is a callback to which the words of a \
+        `\\pg4n` command are passed, and from which output of the command \
+        is received in return.
+        :param hook_semantic_planned_f: is a callback to which SQL queries \
+        psql has run or explained are passed together with their plans \
+        (None if not known), and from which a message is received. It is \
+        used in auto-explain analysis mode, and for EXPLAIN statements user \
+        has typed, which are not analyzed without it.
+        :param hook_switch_database_f: is a callback to which connection \
+        parameters are passed when psql switches to another database, e.g \
+        with `\\c otherdb`.
+        :param hook_semantic_submit_f: is a callback to which the SQL \
+        queries of a script psql runs are passed, and from which a future of \
+        the summary of their warning messages is received, so that they are \
+        analyzed concurrently without waiting for them. If not given, \
+        `hook_semantic_batch_f` is used.
         """
         self.psql_args: bytes = psql_args
         self.semantic_analyze: Callable[[str], str] = hook_semantic_f
+        self.semantic_analyze_batch: \
+            Optional[Callable[[list[str]], str]] = hook_semantic_batch_f
+        self.semantic_analyze_planned: Optional[
+            Callable[[list[str], list[Optional[dict]]], str]
+        ] = hook_semantic_planned_f
+        self.semantic_submit: Optional[Callable[[list[str]], Future]] = \
+            hook_semantic_submit_f
         self.syntax_analyze: Callable[[str], str] = hook_syntax_f
         self.parser: PsqlParser = parser
+        self.config_values: ConfigValues = config_values or {}
+        self.speculate: Optional[Callable[[str], None]] = \
+            hook_speculate_f \
+            if self.config_values.get("SpeculativeAnalysis", True) else None
+
+        # one of capture_modes
+        self.capture_mode: str = \
+            self.config_values.get("CaptureMode", "screen")
+
+        # Keystrokes are always followed, as it is cheap
+        self.input_capture: InputCapture = InputCapture(parser)
+        # Query log and debug log are created when psql is started
+        self.query_log: Optional[QueryLog] = None
+        self.debug_log: Optional[DebugLog] = None
+        self.recorder: Optional[SessionRecorder] = None
+        # pg4n's own output, e.g cost gate questions, only goes to the
+        # emulated screen when there is no terminal, i.e on replay
+        self.write_to_terminal: bool = True
+        self._screen_snapshot_requested: bool = False
 
         # shutil.get_terminal_size()
-        (self.cols, self.rows) = get_terminal_size()
+        (self.cols, self.rows) = dimensions or get_terminal_size()
 
         # pyte.Screen, pyte.Stream
-        self.pyte_screen: Screen = Screen(self.cols, self.rows)
+        self.pyte_screen: ScrollbackScreen = ScrollbackScreen(
+            self.cols,
+            self.rows,
+            self.config_values.get(
+                "ScrollbackLines", self.default_scrollback_lines
+            )
+        )
         self.pyte_screen_output_sink: Stream = Stream(self.pyte_screen)
+        # (columns, lines) the screen is resized to before next output
+        self._pending_size: Optional[tuple[int, int]] = None
+
+        # Output phases that are passed through without parsing
+        self.alt_screen: bool = False
+        self._alt_screen_carry: bytes = b""
+        self.in_results: bool = False
+        self.results_tail: bytes = b""
+        # if results_tail has lost the start of results
+        self._results_cut: bool = False
+        # if results may end in a continuation prompt, i.e psql's query
+        # buffer was left with an incomplete statement
+        self._results_may_continue: bool = False
 
         # Semantic analysis is always done when user presses Return
         # and resulting message is saved here until when new prompt comes in
         self.pg4n_message: str = ""
+        # analyses of scripts psql has run, reported in order once done, and
+        # the thread scripts are split into statements on
+        self._preflights: list[Future] = []
+        self._preflight_executor: Optional[ThreadPoolExecutor] = None
+        # Return is held for confirmation when a query is estimated to be
+        # too expensive
+        self.estimate: \
+            Optional[Callable[[str, int], Optional[CostEstimate]]] = \
+            hook_estimate_f
+        self.cost_gate: Optional[CostGate] = \
+            CostGate.from_config(self.config_values)
+        self._held_keys: Optional[bytes] = None
+        # query held for confirmation, and then confirmed, which is not
+        # screen-scraped as the question is on screen after it
+        self._gated_stmt: str = ""
+        self._confirmed_stmt: str = ""
+        # psql rejects \pg4n commands, which is hidden from user
+        self.run_command: Optional[Callable[[list[str]], str]] = \
+            hook_command_f
+        self._hide_invalid_command: bool = False
+
+        # runtimes and row counts psql prints, and queries they belong to
+        self.query_stats: QueryStats = QueryStats()
+        self._last_analyzed: Optional[tuple[list[str], str]] = None
+        # fires once user pauses typing a complete query
+        self._speculation_timer: Optional[threading.Timer] = None
+        # In auto-explain mode, queries are analyzed once psql has run them
+        # and auto_explain has logged their plans, see `AutoExplain`.
+        self.auto_explain: Optional[AutoExplain] = None
+        self._harvesting: bool = False
+        # if psqlrc has been checked for having set up auto_explain
+        self._auto_explain_checked: bool = False
+        self._pending_sql_queries: list[str] = []
+        # analysis follows psql to databases it switches to
+        self.switch_database: \
+            Optional[Callable[[dict[str, str]], None]] = hook_switch_database_f
+        self._db_name: str = ""
 
     def start(
         self
@@ -69,33 +252,88 @@ class PsqlWrapper:
 
         Control is only returned after psql process exits.
         """
+        if "DebugLogFile" in self.config_values:
+            self.debug_log = DebugLog(
+                self.config_values["DebugLogFile"],
+                {
+                    category: self.config_values[option]
+                    for category, option in [
+                        ("stream", "DebugLogStream"),
+                        ("screen", "DebugLogScreen"),
+                        ("parser", "DebugLogParser"),
+                    ]
+                    if option in self.config_values
+                }
+            )
+            # kill -USR1 <pid> logs what pg4n currently sees on screen
+            signal.signal(signal.SIGUSR1, self._request_screen_snapshot)
+
         version_msg = self._check_psql_version()
         if version_msg != "":
             print(version_msg)
 
+        psql_cmd: str = "psql " + bytes.decode(self.psql_args)
+        if self.capture_mode == "querylog" and \
+                not QueryLog.is_in_use(bytes.decode(self.psql_args)):
+            self.query_log = QueryLog()
+            psql_cmd += self.query_log.psql_args()
+
+        psql_env: Optional[dict[str, str]] = None
+        if self.config_values.get("AnalysisMode") == "auto-explain" and \
+                self.semantic_analyze_planned is not None:
+            self.auto_explain = AutoExplain(self._psql_version())
+            psql_env = self.auto_explain.psql_env()
+
         c = pexpect.spawn(
-            "psql " + bytes.decode(self.psql_args),
+            psql_cmd,
             encoding="utf-8",
-            dimensions=(self.rows, self.cols)
+            dimensions=(self.rows, self.cols),
+            env=psql_env
         )
+        self.psql_process: pexpect.spawn = c
+        signal.signal(signal.SIGWINCH, self._on_terminal_resize)
+
+        output_filter: Callable[[bytes], bytes] = self._intercept
+        if "SessionRecordFile" in self.config_values:
+            self.recorder = SessionRecorder(
+                self.config_values["SessionRecordFile"],
+                self.cols,
+                self.rows,
+                self.capture_mode
+            )
+            output_filter = self._record_and_intercept
 
-        c.interact(input_filter=lambda x: x, output_filter=self._intercept)
+        try:
+            c.interact(input_filter=self._input, output_filter=output_filter)
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+            if self.query_log is not None:
+                self.query_log.close()
+            if self.debug_log is not None:
+                self.debug_log.close()
+            if self.auto_explain is not None:
+                self.auto_explain.close()
+            if self._speculation_timer is not None:
+                self._speculation_timer.cancel()
+            if self._preflight_executor is not None:
+                self._preflight_executor.shutdown(
+                    wait=False, cancel_futures=True
+                )
+            if self.config_values.get("SlowQueryReport", True):
+                report: str = self.query_stats.report()
+                if report != "":
+                    print(report)
 
     def _check_psql_version(self) -> str:
-        """Check PostgreSQL version via psql child process and match \
-        against versions pg4n is tested with.
+        """Check psql version and match against versions pg4n is tested with.
 
         :returns: an empty string if current version has been tested, \
         otherwise a warning message.
         """
-        version_info = pexpect.spawn(
-            "psql " + bytes.decode(self.psql_args) + " --version"
-        )
-        version_info.expect(pexpect.EOF)
-        version_info_str: str = bytes.decode(version_info.before)
-        version: str = self.parser.parse_psql_version(version_info_str)
+        version: str = self._psql_version()
 
-        # command-line arguments prevent interactive sessions (e.g pg4n --help)
+        # psql could not be run, which psql reports itself on session start
         if version == "":
             return ""
 
@@ -109,6 +347,174 @@ class PsqlWrapper:
                 + "."
             )
 
+    def _psql_version(self) -> str:
+        """Get psql version, only running `psql --version` if psql binary has \
+        changed since last time.
+
+        Versions are cached in `$XDG_CACHE_HOME/pg4n` (or `$HOME/.cache/pg4n`)
+        by psql binary path and modification time.
+
+        :returns: version string (e.g "14.5"), or an empty string if psql \
+        was not found.
+        """
+        psql_path: Optional[str] = shutil.which("psql")
+        if psql_path is None:
+            return ""
+        psql_path = os.path.realpath(psql_path)
+        psql_mtime_ns: int = os.stat(psql_path).st_mtime_ns
+
+        cache_dir: str = os.path.join(
+            os.getenv("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"),
+            "pg4n"
+        )
+        cache_path: str = os.path.join(cache_dir, self.psql_version_cache)
+        try:
+            with open(cache_path, "r") as cache_file:
+                cached: dict = json.load(cache_file)
+            if cached["path"] == psql_path and \
+                    cached["mtime_ns"] == psql_mtime_ns:
+                return cached["version"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # no cache yet, or it is broken
+
+        version_info: bytes = \
+            pexpect.run(shlex.quote(psql_path) + " --version")
+        version: str = \
+            self.parser.parse_psql_version(bytes.decode(version_info))
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_path, "w") as cache_file:
+                json.dump({"path": psql_path,
+                           "mtime_ns": psql_mtime_ns,
+                           "version": version}, cache_file)
+        except OSError:
+            pass  # version is just checked again next time
+        return version
+
+    def _input(
+        self,
+        keys: bytes
+    ) -> bytes:
+        """Feed user's keystrokes to input capture.
+
+        :param keys: input read from user's terminal.
+        :returns: input to be forwarded to psql.
+        """
+        _stream_log.debug("input %r", keys)
+        if self._held_keys is not None:
+            self._record_input(keys)
+            return self._confirm(keys)
+        if keys == b"\r" and (question := self._gate_query()) != "":
+            self.hold(keys, question)
+            return b""
+        self._record_input(keys)
+        self.input_capture.feed_input(keys)
+        if self.speculate is not None:
+            self._schedule_speculation()
+        return keys
+
+    def _record_input(self, keys: bytes) -> None:
+        if self.recorder is not None:
+            self.recorder.record_input(keys)
+
+    def _gate_query(self) -> str:
+        """Check if query user is submitting is estimated to be too \
+        expensive.
+
+        :returns: question asking user to confirm running the query, or "" \
+        if Return is let through.
+        """
+        if self.cost_gate is None or self.estimate is None:
+            return ""
+        typed: str = self.input_capture.typed_stmt()
+        if typed == "" or not self.parser.is_select_stmt(typed):
+            return ""
+
+        # queries that cannot be estimated in time are let through
+        estimate: Optional[CostEstimate] = \
+            self.estimate(typed, self.cost_gate.budget_ms)
+        if estimate is None:
+            return ""
+        reasons: str = self.cost_gate.check(estimate)
+        if reasons == "":
+            return ""
+
+        _stream_log.info("holding Return: %s", reasons)
+        return f"\r\nQuery is estimated to take {reasons}. " \
+            "Run it anyway? [y/N] "
+
+    def hold(self, keys: bytes, question: str) -> None:
+        """Hold keystrokes submitting typed query until user answers a \
+        question.
+
+        :param keys: are forwarded to psql if user confirms.
+        :param question: is written to user's terminal.
+        """
+        if self.recorder is not None:
+            self.recorder.record_hold(question)
+        self._held_keys = keys
+        self._gated_stmt = self.input_capture.typed_stmt()
+        self._write_terminal(question)
+
+    def _confirm(self, keys: bytes) -> bytes:
+        """Forward held Return to psql if user confirms, and otherwise have \
+        readline redraw the query for editing.
+
+        :param keys: is user's answer.
+        :returns: input to be forwarded to psql.
+        """
+        held: bytes = self._held_keys
+        self._held_keys = None
+        if keys[:1] in (b"y", b"Y"):
+            self._write_terminal("y")
+            self._confirmed_stmt = self._gated_stmt
+            self.input_capture.feed_input(held)
+            return held
+
+        self._write_terminal("\r\n")
+        # M-1 C-l: readline refreshes the line without clearing the screen
+        return b"\x1b1\x0c"
+
+    def _write_terminal(self, text: str) -> None:
+        """Write pg4n's own output to user's terminal, keeping the emulated \
+        screen in sync.
+
+        :param text: is written as-is.
+        """
+        self.pyte_screen_output_sink.feed(text)
+        if self.write_to_terminal:
+            os.write(sys.stdout.fileno(), text.encode("utf-8"))
+
+    def _schedule_speculation(self) -> None:
+        """Restart the wait for user to pause typing, if they have typed a \
+        complete SELECT query."""
+        if self._speculation_timer is not None:
+            self._speculation_timer.cancel()
+            self._speculation_timer = None
+
+        typed: str = self.input_capture.typed_stmt()
+        if typed == "" or not self.parser.is_select_stmt(typed):
+            return
+        self._speculation_timer = threading.Timer(
+            self.speculation_delay, self.speculate, [typed]
+        )
+        self._speculation_timer.daemon = True
+        self._speculation_timer.start()
+
+    def _record_and_intercept(
+        self,
+        output: bytes
+    ) -> bytes:
+        """Record output as psql wrote it, and then intercept it.
+
+        :param output: output seen on terminal screen.
+        :returns: output with injected semantic error messages.
+        """
+        self.recorder.record_output(output)
+        return self._intercept(output)
+
     def _intercept(
         self,
         output: bytes
@@ -119,22 +525,147 @@ class PsqlWrapper:
         :param output: output seen on terminal screen.
         :returns: output with injected semantic error messages.
         """
+        _stream_log.debug("output %r", output)
+
+        if self.auto_explain is not None:
+            output = self._harvest_plans(output)
+
+        # psql redraws for the new size, so screen must be resized before
+        if self._pending_size is not None:
+            (self.cols, self.rows) = self._pending_size
+            self._pending_size = None
+            self.pyte_screen.resize(self.rows, self.cols)
+
+        # Pager output cannot contain queries
+        if self.alt_screen:
+            exit_pos: int = self._find_alt_screen_exit(output)
+            if exit_pos == -1:
+                return output
+            self.alt_screen = False
+            return output[:exit_pos] + self._intercept(output[exit_pos:])
+
+        enter_pos: int = min(
+            (pos for pos in map(output.find, self.alt_screen_enter)
+             if pos != -1),
+            default=-1
+        )
+        if enter_pos != -1:
+            head: bytes = \
+                self._intercept(output[:enter_pos]) if enter_pos > 0 else b""
+            self.alt_screen = True
+            self._alt_screen_carry = b""
+            return head + self._intercept(output[enter_pos:])
+
+        # Query results cannot contain queries either
+        if self.in_results:
+            output_end: str = bytes.decode(
+                output[-self.prompt_scan_len:], "utf-8", "replace"
+            )
+            if not self.parser.output_has_new_prompt(output_end) and not (
+                self._results_may_continue and
+                self.parser.output_has_continuation_prompt(output_end)
+            ):
+                self._results_cut |= len(self.results_tail) + len(output) \
+                    > self.results_tail_len
+                self.results_tail = (
+                    self.results_tail + output[-self.results_tail_len:]
+                )[-self.results_tail_len:]
+                if self.query_log is not None:
+                    self.query_log.limit_size()  # psql logs results too
+                return output
+
+            # Results are over: only the end of them is on screen anyway
+            self.in_results = False
+            if self.results_tail != b"":
+                self.pyte_screen.clear_scrollback()
+                if self._results_cut:
+                    # terminal has scrolled, so cursor is on the bottom row
+                    self.pyte_screen.cursor_position(self.rows, 1)
+                self.pyte_screen_output_sink.feed(
+                    bytes.decode(self.results_tail, "utf-8", "replace")
+                )
+                self.results_tail = b""
+                self._results_cut = False
+
         new_output: bytes = self._check_and_act_on_repl_output(output)
 
         self.pyte_screen_output_sink.feed(bytes.decode(new_output))
 
-        if self.debug:
-            f = open("pyte.screen", "w")
-            f.write(
-                '\n'.join(line.rstrip() for line in self.pyte_screen.display)
-            )
-            f.close()
-            g = open("psqlwrapper.log", "a")
-            g.write(str(new_output) + '\n')
-            g.close()
+        if self._screen_snapshot_requested:
+            self._screen_snapshot_requested = False
+            _screen_log.info("snapshot:\n%s", self.pyte_screen.contents())
 
         return new_output
 
+    def _harvest_plans(self, output: bytes) -> bytes:
+        """Cut plans auto_explain logs out of output, from when user hits \
+        Return until psql prompts again.
+
+        :param output: output seen on terminal screen.
+        :returns: output without the plans.
+        """
+        if not self._harvesting:
+            if len(output) <= 1 or not self._user_hit_return(output):
+                return self.auto_explain.flush() + output
+            self._harvesting = True
+
+        output = self.auto_explain.feed(output)
+        output_end: str = bytes.decode(
+            output[-self.prompt_scan_len:], "utf-8", "replace"
+        )
+        if self.parser.output_has_new_prompt(output_end) or \
+                self.parser.output_has_continuation_prompt(output_end):
+            self._harvesting = False
+            output += self.auto_explain.flush()
+        return output
+
+    def resize(self, cols: int, rows: int) -> None:
+        """Resize emulated screen in place before next output is intercepted.
+
+        :param cols: is the new terminal width.
+        :param rows: is the new terminal height.
+        """
+        self._pending_size = (cols, rows)
+
+    def _on_terminal_resize(self, signum: int, frame) -> None:
+        """Pass terminal size on to psql and the emulated screen on SIGWINCH.
+
+        :param signum: is the signal number, SIGWINCH.
+        :param frame: is the interrupted stack frame.
+        """
+        (cols, rows) = get_terminal_size()
+        self.psql_process.setwinsize(rows, cols)
+        if self.recorder is not None:
+            self.recorder.record_resize(cols, rows)
+        self.resize(cols, rows)
+
+    def _request_screen_snapshot(self, signum: int, frame) -> None:
+        """Log screen contents after handling next output.
+
+        :param signum: is the signal number, SIGUSR1.
+        :param frame: is the interrupted stack frame.
+        """
+        self._screen_snapshot_requested = True
+
+    def _find_alt_screen_exit(self, output: bytes) -> int:
+        """Find where output switches back from alternate screen.
+
+        :param output: output seen on terminal screen.
+        :returns: position of the switch, or -1 if there is none.
+        """
+        # the switch may be split between outputs
+        carry: bytes = self._alt_screen_carry
+        window: bytes = carry + output
+        self._alt_screen_carry = window[-8:]
+        pos: int = min(
+            (pos for pos in map(window.find, self.alt_screen_exit)
+             if pos != -1),
+            default=-1
+        )
+        if pos == -1:
+            return -1
+        return max(pos - len(carry), 0)
+
     def _check_and_act_on_repl_output(
         self,
         latest_output: bytes
@@ -148,6 +679,8 @@ class PsqlWrapper:
         :returns: output with injected semantic error messages.
         """
         new_output: bytes = ""
+        self.input_capture.feed_output(bytes.decode(latest_output))
+
         # for optimization reasons, check output only if len() > 1, so most
         # keyboard input does not trigger parsing
         # (Return is always at least 2 length)
@@ -157,20 +690,103 @@ class PsqlWrapper:
         # User hit Return: parse for potential SQL query, analyze, and
         # save a potential warning to be included in before next fresh prompt.
         if self._user_hit_return(latest_output):
-            # get terminal screen contents
-            screen: str = \
-                '\n'.join(line.rstrip() for line in self.pyte_screen.display)
+            _stream_log.info("Return pressed")
+            submitted: Optional[list[str]] = \
+                self.input_capture.pop_submitted()
+            parsed_sql_queries: list[str] = self._capture_stmts(submitted)
+            script: str = self._capture_include(submitted)
+            # until next prompt, output is results of the queries or script
+            self.in_results = parsed_sql_queries != [] or script != ""
+            self._results_may_continue = \
+                self.input_capture.query_buffer != "" or \
+                not self.input_capture.buffer_reliable
+            if self.query_log is not None:
+                # queries are analyzed once psql has logged them, or as
+                # captured here if the log grows too large to be read
+                self._pending_sql_queries = parsed_sql_queries
+            elif parsed_sql_queries != []:
+                if self.auto_explain is not None or any(
+                        self.parser.parse_explain_stmt(q) != ""
+                        for q in parsed_sql_queries
+                ):
+                    # plans are logged or printed as psql runs the queries
+                    self._pending_sql_queries = parsed_sql_queries
+                else:
+                    # feed queries to semantic analysis hook function
+                    # and save resulting message
+                    self.pg4n_message = \
+                        self._analyze_submitted(parsed_sql_queries)
+            if script != "":
+                self._start_preflight(script)
+            control_args: Optional[list[str]] = \
+                self._capture_control_command(submitted)
+            if control_args is not None:
+                self.pg4n_message = self.run_command(control_args)
+                self._hide_invalid_command = True
 
-            parsed_sql_query: str = self.parser.parse_last_stmt(screen)
-            if parsed_sql_query != "":
-                # feed query to semantic analysis hook function
-                # and save resulting message
-                self.pg4n_message = self.semantic_analyze(parsed_sql_query)
+        if self._hide_invalid_command:
+            latest_output = bytes(
+                self.parser.strip_invalid_control_command(
+                    bytes.decode(latest_output, "utf-8", "replace")
+                ),
+                "utf-8"
+            )
 
         # If there is a fresh prompt:
         if self.parser.output_has_new_prompt(
                 bytes.decode(latest_output)
         ):
+            _stream_log.info("fresh prompt")
+            self._hide_invalid_command = False
+            self.input_capture.on_new_prompt()
+            switched: bool = self.switch_database is not None and \
+                self._follow_database(latest_output)
+            # next statement starts at this prompt
+            self.pyte_screen.clear_scrollback()
+
+            # psql has logged the queries it has run, and auto_explain
+            # their plans, by now
+            harvested: Optional[list[dict]] = \
+                self.auto_explain.take_plans() \
+                if self.auto_explain is not None else None
+            if self.query_log is not None:
+                logged_sql_queries: Optional[list[str]] = \
+                    self._capture_logged_stmts()
+                if logged_sql_queries is None:
+                    logged_sql_queries = self._pending_sql_queries
+                self._pending_sql_queries = []
+                if logged_sql_queries != []:
+                    self.pg4n_message = self._analyze_submitted(
+                        logged_sql_queries, self._plans_of(
+                            logged_sql_queries, harvested, latest_output
+                        )
+                    )
+            elif self._pending_sql_queries != []:
+                self.pg4n_message = self._analyze_submitted(
+                    self._pending_sql_queries, self._plans_of(
+                        self._pending_sql_queries, harvested, latest_output
+                    )
+                )
+                self._pending_sql_queries = []
+
+            # psql has finished running scripts by now, but their analysis
+            # is not waited for, and is reported at a later prompt if need be
+            while self._preflights != [] and self._preflights[0].done():
+                script_message: str = self._preflights.pop(0).result()
+                self.pg4n_message = "\n\n".join(
+                    m for m in (self.pg4n_message, script_message) if m != ""
+                )
+
+            if self.auto_explain is not None:
+                self._check_auto_explain(latest_output, switched)
+
+            # psql has printed runtimes and row counts by now
+            if self._last_analyzed is not None:
+                stats_message: str = self._record_query_stats(latest_output)
+                self.pg4n_message = "\n\n".join(
+                    m for m in (self.pg4n_message, stats_message) if m != ""
+                )
+
             # If we have a semantic error message waiting
             if self.pg4n_message != "":
                 new_output = self._replace_prompt(latest_output)
@@ -188,19 +804,372 @@ class PsqlWrapper:
                 bytes.decode(latest_output)
             )
 
-            potential_future_contents: str = '\n'.join(
-                line.rstrip() for line in potential_future_screen.display
-            )
+            potential_future_contents: str = \
+                potential_future_screen.contents()
             syntax_error = \
                 self.parser.parse_syntax_error(potential_future_contents)
             if syntax_error != "":
                 self.pg4n_message = self.syntax_analyze(syntax_error)
-                new_output = self._replace_prompt(latest_output)
-                self.pg4n_message = ""
-                return new_output
+                if self.pg4n_message != "":
+                    new_output = self._replace_prompt(latest_output)
+                    self.pg4n_message = ""
+                    return new_output
 
         return latest_output
 
+    def _follow_database(self, latest_output: bytes) -> bool:
+        """Pass connection changes on to semantic analysis, as psql reports \
+        them after `\\c`, or as the database name in the prompt changes \
+        (e.g when psql is quiet).
+
+        :param latest_output: is output with a fresh prompt.
+        :returns: if connection changed.
+        """
+        params: Optional[dict[str, str]] = \
+            self.parser.parse_connection_change(
+                self._screen_until_prompt(latest_output)
+            )
+        db_name: str = self.parser.parse_prompt_db_name(
+            bytes.decode(latest_output, "utf-8", "replace")
+        )
+        if params is None and db_name not in ("", self._db_name) and \
+                self._db_name != "":
+            params = {"dbname": db_name}
+        if db_name != "":
+            self._db_name = db_name
+        if params is not None:
+            _stream_log.info("switched database: %r", params)
+            self.switch_database(params)
+        return params is not None
+
+    def _check_auto_explain(self, latest_output: bytes, switched: bool) -> None:
+        """Stop waiting for plans auto_explain will not log, i.e if psqlrc \
+        could not set it up, or psql has connected elsewhere since.
+
+        Queries are then analyzed like they would be without auto_explain,
+        i.e planned with EXPLAIN.
+        :param latest_output: is output with a fresh prompt.
+        :param switched: is if psql has just changed connections.
+        """
+        if not self._auto_explain_checked:
+            self._auto_explain_checked = True
+            # psqlrc has printed a notice of its own
+            if AutoExplain.setup_failed_notice in \
+                    self._screen_until_prompt(latest_output):
+                self._stop_auto_explain()
+                return
+        if switched:
+            self._stop_auto_explain()
+            self.pg4n_message = "\n\n".join(m for m in (
+                self.pg4n_message,
+                "pg4n: auto_explain is only set up on psql's first "
+                "connection, so queries are planned with EXPLAIN instead."
+            ) if m != "")
+
+    def _stop_auto_explain(self) -> None:
+        _stream_log.info("auto_explain not in use")
+        self.auto_explain.close()
+        self.auto_explain = None
+        self._harvesting = False
+
+    def _plans_of(
+        self,
+        sql_queries: list[str],
+        harvested: Optional[list[dict]],
+        latest_output: bytes
+    ) -> Optional[list[Optional[dict]]]:
+        """Get plans of queries psql has just run, as psql printed them for \
+        EXPLAIN, or as auto_explain logged them.
+
+        :param sql_queries: are the queries.
+        :param harvested: are plans auto_explain logged, if it is in use.
+        :param latest_output: is output with a fresh prompt.
+        :returns: the plans, or None if they are not known.
+        """
+        if all(self.parser.parse_explain_stmt(q) == "" for q in sql_queries):
+            return harvested
+        # printed plans can only be told apart per statement
+        if len(sql_queries) != 1:
+            return None
+        return [self.parser.parse_explain_plan(
+            self._screen_until_prompt(latest_output)
+        )]
+
+    def _screen_until_prompt(self, latest_output: bytes) -> str:
+        """Get screen contents with output up to a fresh prompt.
+
+        :param latest_output: is output with a fresh prompt.
+        :returns: screen contents followed by output before the prompt.
+        """
+        split_prompt: List[str] = self.parser.parse_new_prompt_and_rest(
+            bytes.decode(latest_output, "utf-8", "replace")
+        )
+        before_prompt: str = split_prompt[0] if split_prompt != [] else ""
+        return self.pyte_screen.contents() + before_prompt
+
+    def _analyze_submitted(
+        self,
+        sql_queries: list[str],
+        plans: Optional[list[Optional[dict]]] = None
+    ) -> str:
+        """Analyze queries user has submitted, unless the same query has \
+        already been analyzed and it ran fast.
+
+        :param sql_queries: are the SQL SELECT queries submitted together.
+        :param plans: are plans psql printed or auto_explain logged as psql \
+        ran the queries.
+        :returns: message from semantic analysis.
+        """
+        message: Optional[str] = None
+        if len(sql_queries) == 1:
+            repeat: Optional[QueryRun] = self.query_stats.fast_repeat(
+                sql_queries[0],
+                self.config_values.get(
+                    "FastQueryMs", self.default_fast_query_ms
+                )
+            )
+            if repeat is not None:
+                _stream_log.info("reusing analysis of fast query")
+                message = repeat.message
+        if message is None:
+            message = self._analyze(sql_queries, plans)
+        self._last_analyzed = (sql_queries, message)
+        return message
+
+    def _record_query_stats(self, latest_output: bytes) -> str:
+        """Record runtime and row count of the query analyzed last, from \
+        what psql has printed after it.
+
+        Runtimes and row counts can only be told apart per statement, so
+        they are recorded when a single statement was submitted.
+
+        :param latest_output: is output with a fresh prompt.
+        :returns: a message if query returned a very large result, or "".
+        """
+        (sql_queries, message) = self._last_analyzed
+        self._last_analyzed = None
+
+        stats: list[tuple[Optional[float], Optional[int]]] = \
+            self.parser.parse_query_stats(
+                self._screen_until_prompt(latest_output)
+            )
+        if len(sql_queries) != 1 or len(stats) != 1:
+            return ""
+
+        (runtime_ms, rows) = stats[0]
+        self.query_stats.record(QueryRun(
+            fingerprint(sql_queries[0]), sql_queries[0],
+            runtime_ms, rows, message
+        ))
+        large_rows: int = self.config_values.get(
+            "LargeResultRows", self.default_large_result_rows
+        )
+        if rows is not None and rows > large_rows:
+            return (
+                f"Query returned {rows:,} rows to psql. Consider adding "
+                "LIMIT, or aggregating on the server."
+            )
+        return ""
+
+    def _analyze(
+        self,
+        sql_queries: list[str],
+        plans: Optional[list[Optional[dict]]] = None
+    ) -> str:
+        """Pass queries to semantic analysis, several at once if possible.
+
+        EXPLAIN statements are analyzed by the SELECT they explain, with the
+        plan psql printed, or otherwise planned without executing them.
+
+        :param sql_queries: are the SQL SELECT queries (or EXPLAINs of \
+        them) submitted together.
+        :param plans: are plans psql printed or auto_explain logged as psql \
+        ran the queries. They are only used if there is one for each query, \
+        as otherwise it is not known which plan belongs to which query.
+        :returns: message from semantic analysis.
+        """
+        if plans is not None and len(plans) != len(sql_queries):
+            plans = None
+        explained: list[str] = \
+            [self.parser.parse_explain_stmt(q) for q in sql_queries]
+        if any(e != "" for e in explained):
+            # EXPLAIN ANALYZE has run the query already, and EXPLAIN must not
+            # run it at all
+            if self.semantic_analyze_planned is None:
+                return ""
+            return self.semantic_analyze_planned(
+                [e or q for e, q in zip(explained, sql_queries)],
+                plans or [None] * len(sql_queries)
+            )
+        if plans is not None and plans != []:
+            return self.semantic_analyze_planned(sql_queries, plans)
+        if len(sql_queries) == 1 or self.semantic_analyze_batch is None:
+            return self.semantic_analyze(sql_queries[-1])
+        return self.semantic_analyze_batch(sql_queries)
+
+    def _capture_stmts(self, submitted: Optional[list[str]]) -> list[str]:
+        """Get the SQL SELECT queries (and EXPLAINs of them) user just \
+        submitted.
+
+        :param submitted: is what input capture saw submitted, or None if \
+        it is not reliably known.
+        :returns: the queries, in submitted order.
+        """
+        confirmed: str = self._confirmed_stmt
+        self._confirmed_stmt = ""
+        if (self.capture_mode == "input" or self.query_log is not None) \
+                and submitted is not None:
+            return [s for s in submitted if self.parser.is_analyzable_stmt(s)]
+        if confirmed != "":
+            return [confirmed]
+
+        # get terminal screen contents, including the part of the statements
+        # that has scrolled off screen
+        screen: str = self.pyte_screen.contents()
+        _screen_log.debug("screen-scraping:\n%s", screen)
+        return self.parser.parse_last_stmts(screen)
+
+    def _capture_include(self, submitted: Optional[list[str]]) -> str:
+        """Get the script file user just ran with e.g `\\i migration.sql`.
+
+        :param submitted: is what input capture saw submitted, or None if \
+        it is not reliably known.
+        :returns: file name as given to psql, or "" if no script was run.
+        """
+        if self.query_log is not None:
+            return ""  # psql logs the statements of scripts too
+
+        if self.capture_mode == "input" and submitted is not None:
+            meta_commands: list[str] = \
+                [s for s in submitted if s.startswith("\\")]
+            return self.parser.parse_include(meta_commands[-1]) \
+                if meta_commands != [] else ""
+
+        return self.parser.parse_include(
+            self.parser.parse_last_meta_command(self.pyte_screen.contents())
+        )
+
+    def _capture_control_command(
+        self,
+        submitted: Optional[list[str]]
+    ) -> Optional[list[str]]:
+        """Get the `\\pg4n` command user just ran.
+
+        :param submitted: is what input capture saw submitted, or None if \
+        it is not reliably known.
+        :returns: words after `\\pg4n`, or None if no pg4n command was run.
+        """
+        if self.run_command is None:
+            return None
+
+        if (self.capture_mode == "input" or self.query_log is not None) \
+                and submitted is not None:
+            for meta_command in reversed(submitted):
+                control_args: Optional[list[str]] = \
+                    self.parser.parse_control_command(meta_command)
+                if control_args is not None:
+                    return control_args
+            return None
+
+        return self.parser.parse_control_command(
+            self.parser.parse_last_meta_command(self.pyte_screen.contents())
+        )
+
+    def _start_preflight(self, file_name: str) -> None:
+        """Start analyzing the SELECT statements of a script in the \
+        background, while psql runs the script.
+
+        :param file_name: is the script file as given to psql.
+        """
+        # psql resolves both \\i and \\ir relative to its working directory
+        # when they are not run from another script
+        try:
+            with open(os.path.expanduser(file_name), encoding="utf-8",
+                      errors="replace") as script:
+                sql: str = script.read(self.include_max_len + 1)
+        except OSError:
+            return  # psql reports the error itself
+        if len(sql) > self.include_max_len:
+            return
+
+        if self._preflight_executor is None:
+            self._preflight_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="pg4n-preflight"
+            )
+        summary: Future = Future()
+        self._preflights.append(summary)
+        self._preflight_executor.submit(
+            self._analyze_script, file_name, sql, summary
+        )
+
+    def _analyze_script(
+        self,
+        file_name: str,
+        sql: str,
+        summary: Future
+    ) -> None:
+        """Split a script into statements, and start analyzing its SELECT \
+        statements concurrently.
+
+        Meta-commands in the script are skipped, so scripts it includes in
+        turn are not analyzed.
+
+        :param file_name: is the script file as given to psql.
+        :param sql: is the contents of the script.
+        :param summary: is given message from semantic analysis, headed by \
+        the file name, or "" if there is nothing to report.
+        """
+        def report(message: str) -> None:
+            summary.set_result(
+                f"{file_name}:\n{message}" if message != "" else ""
+            )
+
+        try:
+            selects: list[str] = self._script_selects(file_name, sql)
+            if selects == []:
+                report("")
+            elif self.semantic_submit is not None:
+                self.semantic_submit(selects).add_done_callback(
+                    lambda analyses: report(
+                        "" if analyses.exception() else analyses.result()
+                    )
+                )
+            else:
+                report(self._analyze(selects))
+        except Exception:  # script is just not analyzed
+            if not summary.done():
+                report("")
+
+    def _script_selects(self, file_name: str, sql: str) -> list[str]:
+        """Get the SELECT statements of a script, in order."""
+        statements, rest = self.parser.split_statements(sql)
+        if rest != "":
+            statements.append(rest)  # psql sends it at end of script
+        selects: list[str] = \
+            [s for s in statements if self.parser.is_select_stmt(s)]
+        _stream_log.info(
+            "analyzing %d statements of script %r", len(selects), file_name
+        )
+        return selects
+
+    def _capture_logged_stmts(self) -> Optional[list[str]]:
+        """Get the SQL SELECT queries (and EXPLAINs of them) psql has \
+        logged since last prompt.
+
+        :returns: the queries, in logged order, or None if the log grew too \
+        large and was emptied.
+        """
+        logged: Optional[list[str]] = self.query_log.read_queries()
+        if logged is None:
+            _stream_log.info("query log overflowed, using screen capture")
+            return None
+        statements: list[str] = []
+        for query in logged:
+            # queries sent with \g have no terminating ';'
+            complete, rest = self.parser.split_statements(query)
+            statements.extend(complete + ([rest] if rest != "" else []))
+        return [s for s in statements if self.parser.is_analyzable_stmt(s)]
+
     def _replace_prompt(self, prompt: bytes) -> bytes:
         """Inject saved semantic error message into given prompt.
 
@@ -161,24 +161,16 @@ class QEPAnalysis:
 class QEPParser:
     """Performs analyses on given queries, returning resultant QEPAnalysis."""
 
-    def __init__(self, *args, conn=None, constraint_exclusion=True, **kwargs):
+    def __init__(self, *args, conn=None, constraint_exclusion=True,
+                 analyze=True, **kwargs):
         self._ref = bool(conn)
+        # without analyze, queries are only planned and not executed
+        self._analyze = analyze
         self._conn: Connection = conn or psycopg.connect(*args, **kwargs)
-        # use constraint_exclusion to avoid unnecessary index scans
-        if constraint_exclusion:
-            with self._conn.cursor() as cur:
-                try:
-                    cur.execute("set constraint_exclusion = on;")
-                    self._conn.commit()
-                except Exception as e:
-                    self._conn.rollback()
-        else:
-            with self._conn.cursor() as cur:
-                try:
-                    cur.execute("set constraint_exclusion = off;")
-                    self._conn.commit()
-                except Exception as e:
-                    self._conn.rollback()
+        # use constraint_exclusion to avoid unnecessary index scans. It is
+        # set for each query's transaction only, as connections may be
+        # pooled and shared with other analyses.
+        self._constraint_exclusion = "on" if constraint_exclusion else "off"
 
     def __del__(self):
         if not self._ref:
@@ -187,6 +179,8 @@ class QEPParser:
     def __call__(self, stmt: str, *args, **kwargs) -> QEPAnalysis:
         """
         Executes a query and returns the query execution plan as a dictionary.
+        Without analyze, the query is only planned, and the plan has no
+        actual times or row counts.
 
         Parameters:
             stmt: The query to execute.
@@ -196,10 +190,13 @@ class QEPParser:
         Returns:
             A dictionary representing the query execution plan.
         """
-        stmt = "explain (format json, analyze, verbose) " + \
-            stmt.strip().rstrip(';') + ";"
+        options = "format json, analyze, verbose" if self._analyze \
+            else "format json, verbose"
+        stmt = f"explain ({options}) " + stmt.strip().rstrip(';') + ";"
         try:
             with self._conn.cursor() as cur:
+                cur.execute("set local constraint_exclusion = "
+                            f"{self._constraint_exclusion};")
                 cur.execute(stmt, *args, **kwargs)
                 res = cur.fetchall()
                 self._conn.rollback()
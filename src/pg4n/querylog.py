@@ -0,0 +1,140 @@
+# Licensed under MIT.
+"""Capture queries from psql's own query log (`psql -L`).
+
+psql writes every query it sends to the server into its log file before
+sending it, so the log has the exact statement text, including
+multi-statement lines and statements run from `\\i` scripts. psql logs
+query results too, so the log is read in bounded chunks, and emptied if it
+grows too large.
+"""
+
+import os
+import shlex
+import shutil
+import tempfile
+from typing import Optional
+
+
+class QueryLog:
+    """Private psql query log file that is read and emptied at every prompt."""
+
+    # per psql's bin/psql/common.c
+    query_start: bytes = b"********* QUERY **********\n"
+    query_end: bytes = b"\n**************************\n\n"
+
+    # tmpfs keeps the log off the disk
+    tmpfs_dir: str = "/dev/shm"
+
+    # The log is emptied, dropping the queries in it, once it grows larger
+    # than this many bytes, as tmpfs is kept in memory.
+    max_len: int = 1 << 26
+    # log is read this many bytes at a time
+    read_len: int = 1 << 16
+
+    def __init__(self, directory: Optional[str] = None):
+        """Create an empty log file only readable by current user.
+
+        :param directory: is where the log is placed, by default on tmpfs \
+        if available.
+        """
+        if directory is None and os.path.isdir(self.tmpfs_dir):
+            directory = self.tmpfs_dir
+        self.dir: str = tempfile.mkdtemp(prefix="pg4n-", dir=directory)
+        self.path: str = os.path.join(self.dir, "query.log")
+        self._fd: int = os.open(
+            self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        # query text, or possible start of a query marker, left over from
+        # last read
+        self._pending: bytes = b""
+        self._in_query: bool = False
+        # if log has been emptied for growing too large since last read
+        self._overflowed: bool = False
+
+    @staticmethod
+    def is_in_use(psql_args: str) -> bool:
+        """Check if user has given psql a log file of their own.
+
+        :param psql_args: psql command-line arguments.
+        :returns: if arguments include `-L`/`--log-file`.
+        """
+        try:
+            args = shlex.split(psql_args)
+        except ValueError:
+            return False
+        return any(
+            arg.startswith("-L") or arg.startswith("--log-file")
+            for arg in args
+        )
+
+    def psql_args(self) -> str:
+        """Get psql command-line arguments that make psql write to this log.
+
+        :returns: arguments to be appended to psql command-line.
+        """
+        return " -L " + shlex.quote(self.path)
+
+    def limit_size(self) -> None:
+        """Empty the log if it has grown larger than `max_len`, e.g while \
+        psql logs large results.
+
+        psql opens the log in append mode, so it keeps logging from the
+        start of the emptied file.
+        """
+        if os.fstat(self._fd).st_size > self.max_len:
+            self._empty()
+            self._pending = b""
+            self._in_query = False
+            self._overflowed = True
+
+    def read_queries(self) -> Optional[list[str]]:
+        """Read queries psql has logged since last call, and empty the log.
+
+        psql opens the log in append mode, so emptying it is safe as long as
+        psql is not executing anything, i.e. a fresh prompt has been printed.
+        The log is read `read_len` bytes at a time, and only query text is
+        kept, so query results psql logs in between queries take no memory.
+
+        :returns: logged queries in the order psql sent them, or None if \
+        the log has been emptied for growing too large since last call.
+        """
+        self.limit_size()
+        if self._overflowed:
+            self._overflowed = False
+            self._empty()  # rest of what psql logged is cut short
+            return None
+
+        queries: list[str] = []
+        while chunk := os.read(self._fd, self.read_len):
+            self._pending += chunk
+            while True:
+                if not self._in_query:
+                    start: int = self._pending.find(self.query_start)
+                    if start == -1:
+                        # keep what may be the start of a marker cut short
+                        self._pending = \
+                            self._pending[-len(self.query_start) + 1:]
+                        break
+                    self._pending = \
+                        self._pending[start + len(self.query_start):]
+                    self._in_query = True
+                end: int = self._pending.find(self.query_end)
+                if end == -1:
+                    break
+                queries.append(
+                    bytes.decode(self._pending[:end], "utf-8", "replace")
+                )
+                self._pending = self._pending[end + len(self.query_end):]
+                self._in_query = False
+        self._empty()
+
+        return queries
+
+    def _empty(self) -> None:
+        os.ftruncate(self._fd, 0)
+        os.lseek(self._fd, 0, os.SEEK_SET)
+
+    def close(self) -> None:
+        """Remove log file."""
+        os.close(self._fd)
+        shutil.rmtree(self.dir, ignore_errors=True)
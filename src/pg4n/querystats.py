@@ -0,0 +1,100 @@
+# Licensed under MIT.
+"""Keep statistics of queries run in this session, as psql reports them \
+with `\\timing on` and in result footers (e.g `(3 rows)`)."""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+
+# string constants (including E'', $$ and $tag$ strings) and numbers
+_constant: re.Pattern = re.compile(
+    r"[eE]?'(?:[^']|'')*'"
+    r"|\$(?P<tag>[A-Za-z_][A-Za-z_0-9]*)?\$.*?\$(?P=tag)?\$"
+    r"|(?<![\w.$])\d+(?:\.\d*)?(?:[eE][+-]?\d+)?\b",
+    flags=re.DOTALL,
+)
+_whitespace: re.Pattern = re.compile(r"\s+")
+
+
+@dataclass(frozen=True)
+class QueryRun:
+    """A query psql has run."""
+
+    # query text with constants replaced, see `fingerprint`
+    fingerprint: str
+    text: str
+    runtime_ms: Optional[float]
+    rows: Optional[int]
+    # message semantic analysis gave for the query
+    message: str
+
+
+def fingerprint(sql_query: str) -> str:
+    """Get what a query looks like regardless of its constants and \
+    formatting, e.g `select * from orders where order_id = ?;`.
+
+    :param sql_query: is a single SQL statement.
+    :returns: the fingerprint.
+    """
+    return _whitespace.sub(" ", _constant.sub("?", sql_query)).strip().lower()
+
+
+class QueryStats:
+    """Ring buffer of the latest query runs."""
+
+    def __init__(self, size: int = 256):
+        """Build an empty buffer.
+
+        :param size: is how many runs are kept.
+        """
+        self.runs: deque[QueryRun] = deque(maxlen=size)
+
+    def record(self, run: QueryRun) -> None:
+        """Add a run, dropping the oldest if buffer is full."""
+        self.runs.append(run)
+
+    def fast_repeat(self, sql_query: str, fast_ms: float) -> Optional[QueryRun]:
+        """Find the latest run of exactly the same query, if it ran fast.
+
+        :param sql_query: is a single SQL statement.
+        :param fast_ms: is the longest runtime of a fast query.
+        :returns: the run, or None if query has not been run lately, or its \
+        runtime is not known or was not fast.
+        """
+        for run in reversed(self.runs):
+            if run.text == sql_query:
+                if run.runtime_ms is not None and run.runtime_ms <= fast_ms:
+                    return run
+                return None
+        return None
+
+    def report(self, count: int = 5) -> str:
+        """Get a report of the slowest queries, by their slowest run.
+
+        :param count: is how many queries are reported.
+        :returns: the report, or "" if no runtimes are known.
+        """
+        slowest: dict[str, list[QueryRun]] = {}
+        for run in self.runs:
+            if run.runtime_ms is not None:
+                slowest.setdefault(run.fingerprint, []).append(run)
+        if slowest == {}:
+            return ""
+
+        ranked = sorted(
+            slowest.values(),
+            key=lambda runs: max(run.runtime_ms for run in runs),
+            reverse=True,
+        )[:count]
+        lines: list[str] = ["Slowest queries this session:"]
+        for runs in ranked:
+            slowest_run: QueryRun = max(runs, key=lambda run: run.runtime_ms)
+            total_ms: float = sum(run.runtime_ms for run in runs)
+            lines.append(
+                f"{slowest_run.runtime_ms:10.1f} ms"
+                f"  ({len(runs)} runs, {total_ms:.1f} ms total)"
+                f"  {slowest_run.fingerprint}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,161 @@
+# Licensed under MIT.
+"""Replay a recorded session through `PsqlWrapper` without psql or a \
+terminal, to benchmark and regression-test output interception.
+
+Usage: `python -m pg4n.replay [--inject MESSAGE] [--repeat N] <recording>`
+"""
+
+import argparse
+import time
+from dataclasses import dataclass, field
+
+from .psqlparser import PsqlParser
+from .psqlwrapper import PsqlWrapper
+from .sessionrecord import (HOLD, INPUT, RESIZE, SessionReader,
+                            unpack_size)
+
+
+@dataclass
+class ReplayReport:
+    """What replaying a session through the wrapper did, and how fast."""
+
+    # nanoseconds spent in intercepting each output chunk
+    latencies_ns: list[int] = field(default_factory=list)
+    output_bytes: int = 0
+    input_bytes: int = 0
+    # statements the wrapper passed to semantic analysis
+    queries: list[str] = field(default_factory=list)
+    # messages the wrapper injected into output
+    injected: list[str] = field(default_factory=list)
+
+    def throughput_mb_s(self) -> float:
+        """Get intercepted output megabytes per second."""
+        total_ns: int = sum(self.latencies_ns)
+        return self.output_bytes / 1e6 / (total_ns / 1e9) if total_ns else 0.0
+
+    def latency_us(self, percentile: float) -> float:
+        """Get per-chunk interception latency at given percentile.
+
+        :param percentile: is between 0 and 100.
+        :returns: latency in microseconds.
+        """
+        if self.latencies_ns == []:
+            return 0.0
+        ordered: list[int] = sorted(self.latencies_ns)
+        index: int = min(
+            int(len(ordered) * percentile / 100), len(ordered) - 1
+        )
+        return ordered[index] / 1000
+
+
+def replay(path: str, inject: str = "") -> ReplayReport:
+    """Feed a recorded session to a wrapper in recorded order, capturing \
+    queries the way they were captured when recording.
+
+    Query logs are not recorded, so `querylog` capture replays like psql
+    could not be given a log, i.e as `screen` capture. Returns held at the
+    cost gate are held again, so answers are replayed as answers.
+
+    :param path: is the session recording.
+    :param inject: is returned by semantic analysis for every query, so \
+    that message injection is replayed too. By default nothing is injected.
+    :returns: report of the replay.
+    """
+    report = ReplayReport()
+
+    def analyze(query: str) -> str:
+        report.queries.append(query)
+        return inject
+
+    reader = SessionReader(path)
+    try:
+        psql = PsqlWrapper("",
+                           analyze,
+                           lambda syntax_error: "",
+                           PsqlParser(),
+                           {"CaptureMode": reader.capture_mode},
+                           dimensions=(reader.columns, reader.lines))
+        psql.write_to_terminal = False
+        for _, direction, chunk in reader.chunks():
+            if direction == RESIZE:
+                psql.resize(*unpack_size(chunk))
+                continue
+            if direction == HOLD:
+                psql.hold(b"\r", bytes.decode(chunk, "utf-8"))
+                continue
+            if direction == INPUT:
+                report.input_bytes += len(chunk)
+                psql._input(chunk)
+                continue
+
+            start_ns: int = time.perf_counter_ns()
+            new_output: bytes = psql._intercept(chunk)
+            report.latencies_ns.append(time.perf_counter_ns() - start_ns)
+            report.output_bytes += len(chunk)
+            if new_output != chunk:
+                report.injected.append(_injected_text(chunk, new_output))
+    finally:
+        reader.close()
+
+    return report
+
+
+def _injected_text(output: bytes, new_output: bytes) -> str:
+    """Get what was inserted into output, e.g a message before a prompt."""
+    prefix: int = 0
+    while prefix < len(output) and output[prefix] == new_output[prefix]:
+        prefix += 1
+    suffix: int = 0
+    while suffix < len(output) - prefix and \
+            output[-1 - suffix] == new_output[-1 - suffix]:
+        suffix += 1
+    return bytes.decode(
+        new_output[prefix:len(new_output) - suffix], "utf-8", "replace"
+    ).strip()
+
+
+def main() -> None:
+    """Replay a recording and print a report."""
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m pg4n.replay",
+        description="Replay a session recorded with SessionRecordFile.",
+    )
+    arg_parser.add_argument("recording")
+    arg_parser.add_argument(
+        "--inject", default="", metavar="MESSAGE",
+        help="message semantic analysis returns for every query",
+    )
+    arg_parser.add_argument(
+        "--repeat", type=int, default=1, metavar="N",
+        help="replay N times, reporting on all of them",
+    )
+    args = arg_parser.parse_args()
+
+    report = ReplayReport()
+    for _ in range(args.repeat):
+        run: ReplayReport = replay(args.recording, args.inject)
+        report.latencies_ns += run.latencies_ns
+        report.output_bytes += run.output_bytes
+        report.input_bytes += run.input_bytes
+        report.queries = run.queries
+        report.injected = run.injected
+
+    print(f"output chunks:  {len(report.latencies_ns)}")
+    print(f"output:         {report.output_bytes} bytes")
+    print(f"input:          {report.input_bytes} bytes")
+    print(f"throughput:     {report.throughput_mb_s():.2f} MB/s")
+    print("latency:        "
+          f"p50 {report.latency_us(50):.1f}us, "
+          f"p95 {report.latency_us(95):.1f}us, "
+          f"p99 {report.latency_us(99):.1f}us, "
+          f"max {report.latency_us(100):.1f}us")
+    print(f"queries:        {len(report.queries)}")
+    for query in report.queries:
+        print("  " + query)
+    print(f"injected:       {len(report.injected)}")
+    for message in report.injected:
+        print("  " + message)
+
+
+if __name__ == "__main__":
+    main()
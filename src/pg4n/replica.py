@@ -0,0 +1,113 @@
+# Licensed under MIT.
+"""Route analysis to a separate database, e.g a streaming replica or \
+a restored snapshot, so that pg4n's work stays off the primary.
+
+Analysis falls back to the primary while the replica can not be reached,
+or while it replays changes more than a configured lag behind.
+"""
+
+import threading
+import time
+from typing import Optional
+
+import psycopg
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+
+class Replica:
+    """Connection string of a replica, and whether analysis can use it."""
+
+    # Seconds since last replayed transaction, or 0 if everything received
+    # has been replayed (the primary may just be idle), or if the database
+    # is not a standby at all (e.g a restored snapshot).
+    lag_query: str = """
+SELECT CASE
+    WHEN NOT pg_catalog.pg_is_in_recovery()
+        OR pg_catalog.pg_last_wal_receive_lsn()
+            = pg_catalog.pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now()
+        - pg_catalog.pg_last_xact_replay_timestamp()), 0)
+END;
+"""
+
+    # lag is measured at most this often, on a connection being taken
+    check_interval_s: float = 5.0
+    # replica that could not be reached, or lagged, is tried again after
+    # this many seconds
+    retry_s: float = 30.0
+    # used unless connection string sets connect_timeout
+    connect_timeout_s: int = 2
+
+    def __init__(self, conninfo: str, max_lag_s: float):
+        """Start out assuming the replica is usable.
+
+        :param conninfo: is a libpq connection string of the replica.
+        :param max_lag_s: is how many seconds replica may lag behind.
+        """
+        if "connect_timeout" not in conninfo_to_dict(conninfo):
+            conninfo = make_conninfo(
+                conninfo, connect_timeout=self.connect_timeout_s
+            )
+        self.conninfo: str = conninfo
+        self.max_lag_s: float = max_lag_s
+        # last measured lag in seconds, if any
+        self.lag_s: Optional[float] = None
+        # why replica is not used, or None if it is
+        self.unusable_reason: Optional[str] = None
+        self._unusable_until: float = 0.0
+        self._checked: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    def usable(self) -> bool:
+        """Check if analysis should use the replica, as last known."""
+        with self._lock:
+            if self.unusable_reason is not None and \
+                    time.monotonic() >= self._unusable_until:
+                self.unusable_reason = None  # try again
+                self._checked = 0.0
+            return self.unusable_reason is None
+
+    def check(self, conn: psycopg.Connection, force: bool = False) -> bool:
+        """Measure lag on a replica connection, if it is due.
+
+        :param conn: is connected to the replica.
+        :param force: measures lag even if it was measured lately.
+        :returns: if replica is still usable.
+        """
+        with self._lock:
+            now: float = time.monotonic()
+            if not force and now - self._checked < self.check_interval_s:
+                return self.unusable_reason is None
+            self._checked = now
+        try:
+            with conn.cursor() as cur:
+                cur.execute(self.lag_query)
+                lag_s: float = float(cur.fetchone()[0])
+            conn.rollback()
+        except psycopg.Error:
+            self.set_unusable("unreachable")
+            return False
+        with self._lock:
+            self.lag_s = lag_s
+        if lag_s > self.max_lag_s:
+            self.set_unusable(f"lags {lag_s:.0f} s behind")
+            return False
+        return True
+
+    def set_unusable(self, reason: str) -> None:
+        """Stop using the replica for a while.
+
+        :param reason: is shown to user, e.g "unreachable".
+        """
+        with self._lock:
+            self.unusable_reason = reason
+            self._unusable_until = time.monotonic() + self.retry_s
+
+    def describe(self) -> str:
+        """Get whether replica is used and why, as a human-readable line."""
+        with self._lock:
+            if self.unusable_reason is not None:
+                return f"primary (replica {self.unusable_reason})"
+            if self.lag_s is None:
+                return "replica"
+            return f"replica (lag {self.lag_s:.1f} s)"
@@ -0,0 +1,91 @@
+# Licensed under MIT.
+"""Keep lines scrolled off the emulated terminal screen, so that queries \
+taller than the terminal can be screen-scraped in full."""
+
+from collections import deque
+from typing import Optional
+
+from pyte import Screen
+
+
+class ScrollbackScreen(Screen):
+    """A pyte `Screen` with a bounded scrollback ring buffer.
+
+    Unlike `pyte.HistoryScreen`, no paging is supported and no work is done
+    per event: lines are only kept as they scroll off the top, and rendered
+    when contents are asked for.
+    """
+
+    def __init__(self, columns: int, lines: int, scrollback: int):
+        """Build screen.
+
+        :param columns: screen width.
+        :param lines: screen height.
+        :param scrollback: is the maximum number of lines kept after they \
+        have scrolled off the screen.
+        """
+        self.scrollback: deque = deque(maxlen=scrollback)
+        super().__init__(columns, lines)
+
+    def index(self) -> None:
+        """Move cursor down one line, saving top line if screen scrolls."""
+        top, bottom = self.margins or (0, self.lines - 1)
+        # only full-screen scrolling moves lines out of sight
+        if self.cursor.y == bottom and top == 0 and \
+                self.scrollback.maxlen != 0:
+            self.scrollback.append(self.buffer[top])
+        super().index()
+
+    def resize(
+        self, lines: Optional[int] = None, columns: Optional[int] = None
+    ) -> None:
+        """Resize screen in place.
+
+        Unlike `pyte.Screen`, which clips lines at the top when the screen
+        gets shorter, lines are only scrolled off the top (into scrollback)
+        as far as needed to keep the cursor on screen, and the rest are
+        clipped at the bottom, as terminals do.
+
+        :param lines: number of lines in the new screen.
+        :param columns: number of columns in the new screen.
+        """
+        lines = lines or self.lines
+        if lines < self.lines:
+            scrolled: int = max(self.cursor.y + 1 - lines, 0)
+            if self.scrollback.maxlen != 0:
+                for y in range(scrolled):
+                    self.scrollback.append(self.buffer[y])
+            for y in range(self.lines):
+                if y < lines and y + scrolled < self.lines:
+                    self.buffer[y] = self.buffer[y + scrolled]
+                else:
+                    self.buffer.pop(y, None)
+            self.cursor.y -= scrolled
+            self.dirty.update(range(lines))
+            self.lines = lines
+            self.set_margins()
+        super().resize(lines, columns)
+
+    def reset(self) -> None:
+        """Reset screen, also forgetting scrollback."""
+        super().reset()
+        self.scrollback.clear()
+
+    def clear_scrollback(self) -> None:
+        """Forget lines that have scrolled off the screen."""
+        self.scrollback.clear()
+
+    def contents(self) -> str:
+        """Get scrollback and screen contents with trailing whitespace \
+        stripped from each line.
+
+        :returns: lines joined with '\\n'.
+        """
+        columns = range(self.columns)
+        scrolled: list[str] = [
+            "".join(line[x].data for x in columns).rstrip()
+            for line in self.scrollback
+        ]
+        return "\n".join(
+            scrolled + [line.rstrip() for line in self.display]
+        )
@@ -1,13 +1,31 @@
 # Written by Tatu Heikkilä, tatu.heikkila@tuni.fi
 # Licensed under MIT.
 """Handle semantic analysis modules."""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Optional, Type, Any
-import psycopg
+import sqlglot
+from psycopg import Connection
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
 from sqlglot import exp
 
+from .analysisstats import AnalysisStats
+from .catalogcache import CatalogCache
+from .config_profiles import for_database
 from .config_values import ConfigValues
+from .costgate import CostEstimate
+from .connectionpool import ConnectionPool
+from .controlcommands import ControlCommands
+from .identifierindex import IdentifierIndex
+from .loadthrottle import LoadThrottle
 from .sqlparser import SqlParser, Column
 from .qepparser import QEPAnalysis, QEPParser
+from .replica import Replica
+from .serveroverhead import ServerOverhead
+from .speculation import Speculation, Speculator
 
 # analysis modules
 from .cmp_domain_checker import CmpDomainChecker
@@ -18,27 +36,454 @@ from .strange_having_checker import StrangeHavingChecker
 from .subquery_order_by_checker import SubqueryOrderByChecker
 from .subquery_select_checker import SubquerySelectChecker
 from .sum_distinct_checker import SumDistinctChecker
+from .undefined_object_checker import UndefinedObjectChecker
+
+
+@dataclass
+class _Preparation:
+    """What speculative analysis of a statement has looked up in advance."""
+
+    parsed_sql: exp.Expression
+    catalog_cache: CatalogCache
+    # plan without actual times, if analysis mode was plan-only
+    qep_analysis: Optional[QEPAnalysis]
+
+
+@dataclass
+class _Database:
+    """Connections and cached work for a database user has connected to."""
+
+    pool: ConnectionPool
+    speculator: Speculator
+    identifiers: IdentifierIndex
+    # options for the database per configuration sections, copied, as
+    # analysis can be tuned at runtime
+    config_values: ConfigValues
+    # taken by each analysis run in the background, so at most
+    # AnalysisWorkers of them run at a time
+    slots: threading.BoundedSemaphore
+    # refresh of identifiers running in the background, if any
+    indexing: Optional[Future] = None
 
 
 class SemanticRouter:
     """Analyze given SQL queries via a plethora of analysis modules."""
 
+    # exercises sqlglot's tokenizer and the parser paths checkers need
+    warm_up_query: str = (
+        "SELECT a, SUM(DISTINCT b) FROM t WHERE a = 'x' AND b IN "
+        "(SELECT b FROM u ORDER BY b) GROUP BY a HAVING COUNT(*) > 1;"
+    )
+
+    # statements analyzed at the same time, each with its own connection,
+    # unless AnalysisWorkers is set
+    max_workers: int = 4
+    # statements are shortened to this length in summaries
+    summary_stmt_len: int = 60
+    # databases user has switched away from with \c keep their connections
+    # and prepared work, so that switching back costs nothing
+    max_databases: int = 8
+
+    # Identifiers suggested for undefined columns and relations are
+    # refreshed from the catalog when older than this many seconds.
+    identifier_max_age_s: float = 10.0
+
+    # seconds a replica configured with AnalysisDsn may lag behind
+    default_replica_max_lag_s: int = 30
+
+    # active backends and median analysis latency that make analysis
+    # cheaper, see `LoadThrottle`
+    default_throttle_backends: int = 32
+    default_throttle_latency_ms: int = 2000
+
+    # "full" executes queries with EXPLAIN ANALYZE, "plan-only" only plans
+    # them with EXPLAIN, and "ast-only" runs no EXPLAIN at all, skipping
+    # checks that need a plan. "auto-explain" uses plans auto_explain logged
+    # when psql ran the queries (see `AutoExplain`), and plans queries it
+    # has no plans for like "plan-only".
+    analysis_modes: list[str] = \
+        ["full", "plan-only", "ast-only", "auto-explain"]
+
+    # analysis modules in the order they are run, and last the one run on
+    # syntax errors instead of queries
+    checkers: list[Type[Any]] = [
+        CmpDomainChecker,
+        SubqueryOrderByChecker,
+        SubquerySelectChecker,
+        ImpliedExpressionChecker,
+        StrangeHavingChecker,
+        SumDistinctChecker,
+        EqWildcardChecker,
+        InconsistentExpressionChecker,
+        UndefinedObjectChecker,
+    ]
+
+    # size of the relations given as parallel arrays of schemas and names
+    seq_scan_size_query: str = (
+        "SELECT COALESCE(SUM(pg_relation_size("
+        "to_regclass(format('%%I.%%I', s, r)))), 0) "
+        "FROM unnest(%s::text[], %s::text[]) AS t(s, r);"
+    )
+
     def __init__(
         self,
-        pg_host: str,
-        pg_port: str,
-        pg_user: str,
-        pg_pass: str,
-        pg_name: str,
+        conninfo: str,
         config_values: Optional[ConfigValues]
     ):
-        """Initialize Postgres connection with given paramaters."""
-        self.pg_host: str = pg_host
-        self.pg_port: str = pg_port
-        self.pg_user: str = pg_user
-        self.pg_pass: str = pg_pass
-        self.pg_name: str = pg_name
-        self.config_values: Optional[ConfigValues] = config_values
+        """Initialize Postgres connection with given paramaters.
+
+        :param conninfo: is a libpq connection string, see `PsqlConnInfo`.
+        :param config_values: are the options read from configuration files.
+        """
+        # normalized, to recognize databases switched back to
+        self.conninfo: str = \
+            make_conninfo("", **conninfo_to_dict(conninfo))
+        # including sections for each database, see `config_profiles`
+        self.base_config_values: ConfigValues = config_values or {}
+        # database pg4n was started with, whose replica is AnalysisDsn
+        self.started_conninfo: str = self.conninfo
+        # pg4n's own work on the server, see `ServerOverhead`
+        self.overhead: ServerOverhead = ServerOverhead()
+        self.database: _Database = self._new_database(self.conninfo)
+        # databases switched away from, least recently used first
+        self._databases: OrderedDict[str, _Database] = OrderedDict()
+        self._switch_lock: threading.Lock = threading.Lock()
+        self._indexer: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pg4n-index"
+        )
+        # Statements analyzed together, as many at a time as any database
+        # allows. Analyses run in the background (see `_Database.slots`)
+        # have their own threads, so they never hold up analyses user waits
+        # for.
+        max_workers: int = max(
+            self._workers_for(values) for values in [
+                self.base_config_values,
+                *(profile["values"] for profile in
+                  self.base_config_values.get("Profiles", [])),
+            ]
+        )
+        self._batch_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pg4n-analyze"
+        )
+        self._background_executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pg4n-background"
+        )
+        self.stats: AnalysisStats = AnalysisStats()
+        # analysis gets cheaper while the server is under load
+        self.throttle: LoadThrottle = LoadThrottle(
+            self.config_values.get(
+                "ThrottleActiveBackends", self.default_throttle_backends
+            ),
+            self.config_values.get(
+                "ThrottleLatencyMs", self.default_throttle_latency_ms
+            ),
+            self._count_active_backends,
+        )
+        # add timings to every message
+        self.profile: bool = False
+        # estimates are waited for only so long, and may finish later
+        self._estimator: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pg4n-estimate"
+        )
+
+    @property
+    def config_values(self) -> ConfigValues:
+        """Options for the current database, see `config_profiles`."""
+        return self.database.config_values
+
+    @property
+    def analysis_mode(self) -> str:
+        """One of `analysis_modes`, for the current database."""
+        return self.config_values.get("AnalysisMode", "full")
+
+    @analysis_mode.setter
+    def analysis_mode(self, mode: str) -> None:
+        self.config_values["AnalysisMode"] = mode
+
+    @property
+    def workers(self) -> int:
+        """How many statements are analyzed at the same time."""
+        return self._workers_for(self.config_values)
+
+    def _workers_for(self, config_values: ConfigValues) -> int:
+        return max(config_values.get("AnalysisWorkers", self.max_workers), 1)
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """Connections to the current database."""
+        return self.database.pool
+
+    @property
+    def speculator(self) -> Speculator:
+        """Analyses prepared on the current database."""
+        return self.database.speculator
+
+    def warm_up(self) -> None:
+        """Parse a query, so that the first analysis does not pay for \
+        sqlglot's lazy initialization of its PostgreSQL dialect, and start \
+        indexing identifiers of the database in the background."""
+        sqlglot.parse_one(self.warm_up_query, read="postgres")
+        # a large catalog must not delay loading, see run_syntax_analysis
+        if self.is_checker_enabled(UndefinedObjectChecker):
+            self._refresh_identifiers(self.database)
+
+    def speculate(
+        self,
+        sql_query: str
+    ) -> None:
+        """Start preparing analysis of a query user has not submitted yet, \
+        in the background. Returns right away.
+
+        The query is parsed, its tables' columns are looked up, and in
+        plan-only mode it is planned, but it is never executed.
+        :param sql_query: is a single well-formed query user is typing.
+        """
+        self.speculator.speculate(sql_query)
+
+    def switch_database(
+        self,
+        params: dict[str, str]
+    ) -> None:
+        """Route analysis to the database psql has switched to with `\\c`.
+
+        Connections and prepared work of the previous database are kept,
+        for `max_databases` databases at most.
+        :param params: are libpq connection parameters that differ from \
+        the current connection, e.g `{"dbname": "otherdb"}`.
+        """
+        conninfo: str = make_conninfo(self.conninfo, **params)
+        evicted: list[_Database] = []
+        with self._switch_lock:
+            if conninfo == self.conninfo:
+                return
+            self._databases[self.conninfo] = self.database
+            database: _Database = self._databases.pop(conninfo, None) \
+                or self._new_database(conninfo)
+            (self.conninfo, self.database) = (conninfo, database)
+            while len(self._databases) >= self.max_databases:
+                evicted.append(self._databases.popitem(last=False)[1])
+
+        for old in evicted:
+            old.speculator.close()
+            old.pool.close()
+        # first analysis does not wait for connecting, nor for indexing
+        if self.is_checker_enabled(UndefinedObjectChecker):
+            self._refresh_identifiers(database)
+        else:
+            threading.Thread(
+                target=database.pool.warm_up, name="pg4n-connect", daemon=True
+            ).start()
+
+    def _count_active_backends(self) -> int:
+        """Sample how many other sessions are running a statement."""
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(LoadThrottle.active_backends_query)
+                return int(cur.fetchone()[0])
+
+    def _new_database(self, conninfo: str) -> _Database:
+        """Build connections and caches for a database, without connecting."""
+        config_values: ConfigValues = \
+            for_database(self.base_config_values, conninfo_to_dict(conninfo))
+        pool = ConnectionPool(
+            conninfo,
+            max_idle=self._workers_for(config_values),
+            overhead=self.overhead,
+            replica=self._replica_for(conninfo, config_values),
+            statement_timeout_ms=config_values.get("AnalysisTimeoutMs")
+        )
+        return _Database(
+            pool,
+            Speculator(
+                lambda sql_query, speculation:
+                    self._prepare(sql_query, speculation, pool)
+            ),
+            IdentifierIndex(),
+            config_values,
+            threading.BoundedSemaphore(self._workers_for(config_values))
+        )
+
+    def _replica_for(
+        self,
+        conninfo: str,
+        config_values: ConfigValues
+    ) -> Optional[Replica]:
+        """Get the replica a database is analyzed on, if one is configured.
+
+        `AnalysisDsn` replicates the database pg4n was started with, so
+        other databases on the same server are analyzed on the replica's
+        database of the same name.
+        :param conninfo: is a normalized connection string of the database.
+        :param config_values: are the options for the database.
+        :returns: the replica, or None if there is none for the database.
+        """
+        if "AnalysisDsn" not in config_values:
+            return None
+        started: dict[str, Any] = conninfo_to_dict(self.started_conninfo)
+        params: dict[str, Any] = conninfo_to_dict(conninfo)
+        changed: dict[str, Any] = {
+            key: value for key, value in params.items()
+            if started.get(key) != value
+        }
+        if set(changed) - {"dbname"} or set(started) - set(params):
+            return None  # another server, or another user
+        return Replica(
+            make_conninfo(config_values["AnalysisDsn"], **changed),
+            config_values.get(
+                "AnalysisMaxLagS", self.default_replica_max_lag_s
+            )
+        )
+
+    def _refresh_identifiers(self, database: _Database) -> Future:
+        """Start refreshing identifiers of a database in the background, \
+        unless they are being refreshed already.
+
+        :returns: the refresh.
+        """
+        with self._switch_lock:
+            if database.indexing is None or database.indexing.done():
+                database.indexing = self._indexer.submit(
+                    self._index_identifiers, database
+                )
+            return database.indexing
+
+    def _index_identifiers(self, database: _Database) -> None:
+        with database.pool.connection() as conn:
+            database.identifiers.refresh(conn)
+
+    def run_syntax_analysis(
+        self,
+        syntax_error: str
+    ) -> str:
+        """Suggest identifiers user may have meant, when psql reports that \
+        a column or relation does not exist.
+
+        :param syntax_error: is psql's error message, see \
+        `PsqlParser.parse_syntax_error`.
+        :returns: an insightful message, or "" if there is nothing to \
+        suggest, including while identifiers are being indexed.
+        """
+        if not self.is_checker_enabled(UndefinedObjectChecker):
+            return ""
+        with self._switch_lock:
+            database: _Database = self.database
+        checker = UndefinedObjectChecker(syntax_error, database.identifiers)
+        if not checker.is_undefined_object():
+            return ""
+
+        # user may have just created or altered a relation
+        identifiers: IdentifierIndex = database.identifiers
+        if time.monotonic() - identifiers.refreshed > \
+                self.identifier_max_age_s:
+            self._refresh_identifiers(database)
+        # nothing is suggested until the index has been built once
+        if identifiers.refreshed == 0.0:
+            return ""
+        return checker.check() or ""
+
+    def _prepare(
+        self,
+        sql_query: str,
+        speculation: Speculation,
+        pool: ConnectionPool
+    ) -> Optional[_Preparation]:
+        """Look up what analyzing a query needs, stopping early if \
+        speculation is cancelled.
+
+        :param sql_query: is a single well-formed query.
+        :param speculation: tells if the result is still wanted.
+        :param pool: has connections to the database query is prepared on.
+        :returns: the preparation, or None if it was cancelled.
+        """
+        catalog_cache = CatalogCache()
+        parsed_sql: exp.Expression = \
+            sqlglot.parse_one(sql_query, read="postgres")
+        qep_analysis: Optional[QEPAnalysis] = None
+        with pool.connection() as conn:
+            speculation.set_canceller(conn.cancel)
+            try:
+                if speculation.cancelled():
+                    return None
+                SqlParser(conn, catalog_cache).get_query_columns(parsed_sql)
+                if speculation.cancelled():
+                    return None
+                if self.throttle.limit(self.analysis_mode) == "plan-only":
+                    qep_analysis = \
+                        QEPParser(conn=conn, analyze=False).parse(sql_query)
+            finally:
+                speculation.set_canceller(None)
+        if speculation.cancelled():
+            return None
+        return _Preparation(parsed_sql, catalog_cache, qep_analysis)
+
+    def estimate(
+        self,
+        sql_query: str,
+        budget_ms: int
+    ) -> Optional[CostEstimate]:
+        """Get planner's cost estimate for a query, without running it.
+
+        :param sql_query: is a single well-formed query.
+        :param budget_ms: is how long estimating may take.
+        :returns: the estimate, or None if query could not be planned \
+        within budget.
+        """
+        try:
+            return self._estimator.submit(
+                self._estimate, sql_query, budget_ms
+            ).result(timeout=budget_ms / 1000)
+        except Exception:  # including running out of time
+            return None
+
+    def _estimate(self, sql_query: str, budget_ms: int) -> CostEstimate:
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SET LOCAL statement_timeout = {int(budget_ms)};")
+                cur.execute("EXPLAIN (FORMAT JSON, VERBOSE) "
+                            + sql_query.strip().rstrip(";") + ";")
+                qep_analysis = QEPAnalysis(cur.fetchone()[0][0])
+                seq_scans = \
+                    qep_analysis.root.rfindval("Node Type", "Seq Scan")
+                cur.execute(self.seq_scan_size_query, (
+                    [node.get("Schema", "public") for node in seq_scans],
+                    [node["Relation Name"] for node in seq_scans],
+                ))
+                seq_scan_bytes: int = int(cur.fetchone()[0])
+        return CostEstimate(
+            qep_analysis.plan["Plan Rows"],
+            qep_analysis.plan["Total Cost"],
+            seq_scan_bytes,
+        )
+
+    @staticmethod
+    def checker_name(checker_class: Type[Any]) -> str:
+        """Get name of analysis module as in configuration, e.g `CmpDomain`."""
+        return checker_class.__name__.rstrip("Checker")
+
+    def is_checker_enabled(self, checker_class: Type[Any]) -> bool:
+        """Check if analysis module has not been turned off."""
+        return \
+            self.config_values.get(self.checker_name(checker_class)) is not False
+
+    def run_command(
+        self,
+        args: list[str]
+    ) -> str:
+        """Run a `\\pg4n` command typed into psql.
+
+        :param args: are the words after `\\pg4n`.
+        :returns: output of the command, see `ControlCommands`.
+        """
+        return ControlCommands(self).run(args)
+
+    def overhead_report(self) -> str:
+        """Get a report of pg4n's own work on the server this session.
+
+        :returns: the report, or "" if nothing has been run on the server.
+        """
+        if self.overhead.connections == 0:
+            return ""
+        return self.overhead.summary()
 
     def run_analysis(
         self,
@@ -54,115 +499,334 @@ class SemanticRouter:
         :returns: an insightful message that might include vt100-compatible \
         control codes and newlines (without carriage returns).
         """
+        return self._run_analysis(sql_query, None)
+
+    def run_planned_analyses(
+        self,
+        sql_queries: list[str],
+        plans: list[Optional[dict]]
+    ) -> str:
+        """Run analysis modules on queries psql has already run or \
+        explained, without executing them again.
+
+        Queries are analyzed with the given plans, and those without one
+        are planned with plan-only EXPLAIN, whatever the analysis mode.
+        :param sql_queries: are well-formed queries to run analytics on.
+        :param plans: are plans of the queries in the same order, each as \
+        in `EXPLAIN (FORMAT JSON)` output, or None if not known.
+        :returns: an insightful message, or a summary if there are several \
+        queries, see `run_analyses`.
+        """
+        mode: str = "auto-explain" if self.analysis_mode == "auto-explain" \
+            else "plan-only"
+
+        def run(
+            sql_query: str,
+            plan: Optional[dict],
+            catalog_cache: Optional[CatalogCache]
+        ) -> str:
+            return self._run_analysis(
+                sql_query, catalog_cache,
+                QEPAnalysis(plan) if plan is not None else None, mode
+            )
+
+        if len(sql_queries) == 1:
+            return run(sql_queries[0], plans[0], None)
+
+        catalog_cache = CatalogCache()
+        messages: list[str] = list(self._batch_executor.map(
+            lambda sql_query, plan: run(sql_query, plan, catalog_cache),
+            sql_queries, plans
+        ))
+        return self._summarize(sql_queries, messages)
+
+    def run_analyses(
+        self,
+        sql_queries: list[str]
+    ) -> str:
+        """Run analysis modules on several SQL queries concurrently, and get \
+        a summary of findings per query.
+
+        Queries share catalog lookups, so e.g table columns are only looked
+        up once.
+        :param sql_queries: are well-formed queries to run analytics on.
+        :returns: a summary of insightful messages, see `run_analysis`.
+        """
+        if len(sql_queries) == 1:
+            return self.run_analysis(sql_queries[0])
+        return self._submit(sql_queries, self._batch_executor, False).result()
+
+    def submit_analyses(
+        self,
+        sql_queries: list[str]
+    ) -> Future:
+        """Start running analysis modules on SQL queries concurrently in the \
+        background, without waiting for them to finish.
+
+        Analyses run in the background take turns per database, and never
+        hold up analyses of queries user is waiting for.
+        :param sql_queries: are well-formed queries to run analytics on.
+        :returns: a future of the summary, see `run_analyses`.
+        """
+        return self._submit(sql_queries, self._background_executor, True)
+
+    def _submit(
+        self,
+        sql_queries: list[str],
+        executor: ThreadPoolExecutor,
+        background: bool
+    ) -> Future:
+        summary: Future = Future()
+        if sql_queries == []:
+            summary.set_result("")
+            return summary
+
+        catalog_cache: Optional[CatalogCache] = \
+            CatalogCache() if len(sql_queries) > 1 else None
+        analyses: list[Future] = [
+            executor.submit(
+                self._run_analysis, sql_query, catalog_cache,
+                background=background
+            )
+            for sql_query in sql_queries
+        ]
+        pending: list[int] = [len(analyses)]
+        lock = threading.Lock()
+
+        def finished(_: Future) -> None:
+            with lock:
+                pending[0] -= 1
+                if pending[0] > 0:
+                    return
+            # analyses are cancelled when pg4n exits
+            messages: list[str] = [
+                "" if analysis.cancelled() or analysis.exception()
+                else analysis.result()
+                for analysis in analyses
+            ]
+            summary.set_result(
+                messages[0] if len(messages) == 1
+                else self._summarize(sql_queries, messages)
+            )
+
+        for analysis in analyses:
+            analysis.add_done_callback(finished)
+        return summary
+
+    def _summarize(self, sql_queries: list[str], messages: list[str]) -> str:
+        """Build a compact summary of findings, e.g \
+        `[3/40] SELECT * FROM orders WHERE order_total_eur = 0 AND order_...` \
+        followed by the message.
+
+        :param sql_queries: are the analyzed queries.
+        :param messages: are the messages from analyzing each query.
+        :returns: summary, or an empty string if there were no findings.
+        """
+        summary: list[str] = []
+        for i, (sql_query, message) in enumerate(zip(sql_queries, messages)):
+            if message == "":
+                continue
+            stmt: str = " ".join(sql_query.split())
+            if len(stmt) > self.summary_stmt_len:
+                stmt = stmt[:self.summary_stmt_len - 3] + "..."
+            summary.append(f"[{i + 1}/{len(sql_queries)}] {stmt}\n{message}")
+        return "\n\n".join(summary)
+
+    def _run_analysis(
+        self,
+        sql_query: str,
+        catalog_cache: Optional[CatalogCache],
+        qep_analysis: Optional[QEPAnalysis] = None,
+        mode: Optional[str] = None,
+        background: bool = False
+    ) -> str:
+        """Run analysis modules on a query with a pooled connection.
+
+        :param sql_query: is a single well-formed query to run analytics on.
+        :param catalog_cache: is shared with queries analyzed at the same \
+        time, if there are any.
+        :param qep_analysis: is the plan query was run with, if known.
+        :param mode: is one of `analysis_modes`, by default `analysis_mode`.
+        :param background: waits for a free `_Database.slots` first.
+        :returns: an insightful message, see `run_analysis`.
+        """
+        # server under load gets cheaper analyses
+        mode = self.throttle.limit(mode or self.analysis_mode)
+        # user may switch databases while query is being analyzed
+        with self._switch_lock:
+            database: _Database = self.database
+        (pool, speculator) = (database.pool, database.speculator)
+        # analyses run in the background wait for their turn here
+        if background:
+            database.slots.acquire()
+        checkpoints_ns: list[int] = [time.perf_counter_ns()]
+        message: str = ""
+        prepared: Optional[_Preparation] = None
         try:
-            with psycopg.connect(
-                "host=" + self.pg_host +
-                " port=" + self.pg_port +
-                " dbname=" + self.pg_name +
-                " user=" + self.pg_user +
-                " password=" + self.pg_pass
-            ) as conn:
-                sql_parser: SqlParser = \
-                    SqlParser(conn)
-                sanitized_sql: exp.Expression = \
-                    sql_parser.parse_one(sql_query)
-                qep_analysis: QEPAnalysis = \
-                    QEPParser(conn=conn).parse(sql_query)
-                analysis_result: Optional[str] = \
-                    None
-
-                columns: list[Column] = \
-                    sql_parser.get_query_columns(sanitized_sql)
-
-                def is_disabled_in_config(checker_class: Type[Any]) -> bool:
-                    if self.config_values is None:
-                        return False
-                    check_name = checker_class.__name__.rstrip("Checker")
-                    return self.config_values.get(check_name) is False
-
-                # Comparing different domains
-                if not is_disabled_in_config(CmpDomainChecker):
-                    analysis_result = CmpDomainChecker(
-                        sanitized_sql,
-                        columns
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-                # ORDER BY in subquery
-                if not is_disabled_in_config(SubqueryOrderByChecker):
-                    analysis_result = SubqueryOrderByChecker(
-                        sanitized_sql,
-                        qep_analysis
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-                # SELECT in subquery
-                if not is_disabled_in_config(SubquerySelectChecker):
-                    analysis_result = SubquerySelectChecker(
-                        sanitized_sql,
-                        sql_parser
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-                # Implied expression
-                if not is_disabled_in_config(ImpliedExpressionChecker):
-                    analysis_result = ImpliedExpressionChecker(
-                        sanitized_sql,
-                        sql_query,
-                        conn
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-                # Strange HAVING clause without GROUP BY
-                if not is_disabled_in_config(StrangeHavingChecker):
-                    analysis_result = StrangeHavingChecker(
-                        sanitized_sql,
-                        qep_analysis
-                    ).check()
-
-                if analysis_result is not None:
-                    return analysis_result
-
-                # SUM/AVG(DISTINCT)
-                if not is_disabled_in_config(SumDistinctChecker):
-                    analysis_result = SumDistinctChecker(
-                        sanitized_sql,
-                        qep_analysis
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-                # Wildcards without LIKE
-                if not is_disabled_in_config(EqWildcardChecker):
-                    analysis_result = EqWildcardChecker(
-                        sanitized_sql,
-                        qep_analysis
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-                # Inconsistent expression
-                if not is_disabled_in_config(InconsistentExpressionChecker):
-                    analysis_result = InconsistentExpressionChecker(
-                        sanitized_sql,
-                        qep_analysis
-                    ).check()
-
-                    if analysis_result is not None:
-                        return analysis_result
-
-            return ""  # No semantic errors found
+            # statements run count against the user query analyzed
+            with self.overhead.user_query():
+                # speculative analysis may have done some of the work already
+                prepared = speculator.take(sql_query)
+                with pool.connection() as conn:
+                    if prepared is not None and catalog_cache is None:
+                        catalog_cache = prepared.catalog_cache
+                    sql_parser: SqlParser = \
+                        SqlParser(conn, catalog_cache)
+                    sanitized_sql: exp.Expression = \
+                        prepared.parsed_sql if prepared is not None \
+                        else sql_parser.parse_one(sql_query)
+                    checkpoints_ns.append(time.perf_counter_ns())
+                    if qep_analysis is not None:
+                        pass  # psql has already run or explained the query
+                    elif prepared is not None and \
+                            prepared.qep_analysis is not None and \
+                            mode == "plan-only":
+                        qep_analysis = prepared.qep_analysis
+                    elif mode != "ast-only":
+                        qep_analysis = QEPParser(
+                            conn=conn, analyze=mode == "full"
+                        ).parse(sql_query)
+                    checkpoints_ns.append(time.perf_counter_ns())
+                    message = self._run_checkers(
+                        sql_query, sanitized_sql, sql_parser, qep_analysis,
+                        conn, mode
+                    )
+                    checkpoints_ns.append(time.perf_counter_ns())
 
         # SQL parser, QEP parser, or an analysis module exploded:
         except Exception:  # Matches only program errors (see flake8 rule E722)
-            return ""
+            message = ""
+        finally:
+            if background:
+                database.slots.release()
+
+        elapsed_ms: float = (time.perf_counter_ns() - checkpoints_ns[0]) / 1e6
+        self.stats.record(elapsed_ms, message != "", prepared is not None)
+        self.throttle.record(elapsed_ms)
+        if self.profile:
+            stages: str = ", ".join(
+                f"{stage} {(end - start) / 1e6:.1f} ms"
+                for stage, start, end in zip(
+                    ("parse", "plan", "checks"),
+                    checkpoints_ns, checkpoints_ns[1:]
+                )
+            )
+            profile: str = f"Analyzed in {elapsed_ms:.1f} ms ({mode}"
+            profile += f"; {stages}" if stages != "" else ""
+            profile += ", prepared while typing)" if prepared is not None \
+                else ")"
+            message = "\n".join(m for m in (message, profile) if m != "")
+        return message
+
+    def _run_checkers(
+        self,
+        sql_query: str,
+        sanitized_sql: exp.Expression,
+        sql_parser: SqlParser,
+        qep_analysis: Optional[QEPAnalysis],
+        conn: Connection,
+        mode: str
+    ) -> str:
+        """Run analysis modules in order until one of them finds an issue.
+
+        :param sql_query: is the query as submitted.
+        :param sanitized_sql: is the parsed query.
+        :param sql_parser: looks up the catalog for analysis modules.
+        :param qep_analysis: is the query plan, if analysis mode has one.
+        :param conn: is the connection analysis modules query with.
+        :param mode: is one of `analysis_modes`.
+        :returns: an insightful message, see `run_analysis`.
+        """
+        analysis_result: Optional[str] = \
+            None
+
+        columns: list[Column] = \
+            sql_parser.get_query_columns(sanitized_sql)
+
+        def is_disabled_in_config(checker_class: Type[Any]) -> bool:
+            return not self.is_checker_enabled(checker_class)
+
+        # Comparing different domains
+        if not is_disabled_in_config(CmpDomainChecker):
+            analysis_result = CmpDomainChecker(
+                sanitized_sql,
+                columns
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        # ORDER BY in subquery
+        if not is_disabled_in_config(SubqueryOrderByChecker):
+            analysis_result = SubqueryOrderByChecker(
+                sanitized_sql,
+                qep_analysis
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        # SELECT in subquery
+        if not is_disabled_in_config(SubquerySelectChecker):
+            analysis_result = SubquerySelectChecker(
+                sanitized_sql,
+                sql_parser
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        # Implied expression
+        if not is_disabled_in_config(ImpliedExpressionChecker) \
+                and mode != "ast-only":
+            analysis_result = ImpliedExpressionChecker(
+                sanitized_sql,
+                sql_query,
+                conn,
+                analyze=mode == "full"
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        # Strange HAVING clause without GROUP BY
+        if not is_disabled_in_config(StrangeHavingChecker):
+            analysis_result = StrangeHavingChecker(
+                sanitized_sql,
+                qep_analysis
+            ).check()
+
+        if analysis_result is not None:
+            return analysis_result
+
+        # SUM/AVG(DISTINCT)
+        if not is_disabled_in_config(SumDistinctChecker):
+            analysis_result = SumDistinctChecker(
+                sanitized_sql,
+                qep_analysis
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        # Wildcards without LIKE
+        if not is_disabled_in_config(EqWildcardChecker):
+            analysis_result = EqWildcardChecker(
+                sanitized_sql,
+                qep_analysis
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        # Inconsistent expression
+        if not is_disabled_in_config(InconsistentExpressionChecker):
+            analysis_result = InconsistentExpressionChecker(
+                sanitized_sql,
+                qep_analysis
+            ).check()
+
+            if analysis_result is not None:
+                return analysis_result
+
+        return ""  # No semantic errors found
@@ -0,0 +1,189 @@
+# Licensed under MIT.
+"""Account for the work pg4n's own queries cause on the server.
+
+Every connection pg4n opens is tagged with `application_name`, so its
+sessions can be told apart in e.g `pg_stat_activity`, and the statements
+run on them are counted per user query analyzed. Work done in the
+background, e.g while user is typing, is counted separately.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from typing import Any, Iterator, Optional
+
+import psycopg
+from psycopg.pq import TransactionStatus
+
+# shown in pg_stat_activity and server logs (%a) for pg4n's connections
+application_name: str = "pg4n"
+
+
+@dataclass
+class Tally:
+    """Work statements caused on the server."""
+
+    round_trips: int = 0
+    explains: int = 0
+    catalog_queries: int = 0
+    rows: int = 0
+    # from sending a statement until its result is in, so includes network
+    server_ms: float = 0.0
+
+    def add(self, other: "Tally") -> None:
+        """Add another tally to this one."""
+        for f in fields(self):
+            setattr(self, f.name,
+                    getattr(self, f.name) + getattr(other, f.name))
+
+    def maximize(self, other: "Tally") -> None:
+        """Keep the larger of each count of this and another tally."""
+        for f in fields(self):
+            setattr(self, f.name,
+                    max(getattr(self, f.name), getattr(other, f.name)))
+
+
+class ServerOverhead:
+    """Counters of statements run on pg4n's connections, from any thread."""
+
+    # statements reading these are counted as catalog queries
+    catalog_markers: tuple[str, ...] = ("pg_catalog.", "information_schema.")
+
+    def __init__(self):
+        """Start counting from zero."""
+        self._lock: threading.Lock = threading.Lock()
+        # tally of user query being analyzed on each thread, if any
+        self._current: threading.local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        """Start counting from zero."""
+        with self._lock:
+            self.user_queries: int = 0
+            self.connections: int = 0
+            self.total: Tally = Tally()
+            self.max: Tally = Tally()
+            self.background: Tally = Tally()
+
+    @contextmanager
+    def user_query(self) -> Iterator[Tally]:
+        """Count statements run on this thread as analysis of a user query.
+
+        :returns: a context manager giving the query's tally.
+        """
+        tally = Tally()
+        self._current.tally = tally
+        try:
+            yield tally
+        finally:
+            self._current.tally = None
+            with self._lock:
+                self.user_queries += 1
+                self.total.add(tally)
+                self.max.maximize(tally)
+
+    def record(self, statement: str, elapsed_ms: float, rows: int) -> None:
+        """Count a round trip to the server.
+
+        :param statement: is the statement run, or "" for e.g a rollback.
+        :param elapsed_ms: is how long its result took.
+        :param rows: is how many rows it returned or affected.
+        """
+        words: list[str] = statement.lstrip().split(None, 1)
+        is_explain: bool = words != [] and words[0].upper() == "EXPLAIN"
+        is_catalog: bool = not is_explain and \
+            any(marker in statement for marker in self.catalog_markers)
+
+        tally: Optional[Tally] = getattr(self._current, "tally", None)
+        with self._lock:
+            if tally is None:
+                tally = self.background
+            tally.round_trips += 1
+            tally.explains += is_explain
+            tally.catalog_queries += is_catalog
+            tally.rows += max(rows, 0)
+            tally.server_ms += elapsed_ms
+
+    def connect(self, conninfo: str, **params: str) -> psycopg.Connection:
+        """Open a connection whose statements are counted.
+
+        :param conninfo: is a libpq connection string.
+        :param params: are connection parameters overriding it, by default \
+        `application_name`.
+        :returns: the connection.
+        """
+        conn: AccountedConnection = AccountedConnection.connect(
+            conninfo,
+            cursor_factory=AccountedCursor,
+            **dict({"application_name": application_name}, **params),
+        )
+        conn.overhead = self
+        with self._lock:
+            self.connections += 1
+        return conn
+
+    def summary(self) -> str:
+        """Get the counters as human-readable lines."""
+        with self._lock:
+            n: int = self.user_queries
+
+            def row(label: str, attr: str, fmt: str) -> str:
+                total = getattr(self.total, attr)
+                mean = total / n if n else 0.0
+                return (
+                    f"{label:<16}{format(total, fmt):>10}"
+                    f"{format(mean, '.1f'):>10}"
+                    f"{format(getattr(self.max, attr), fmt):>10}"
+                    f"{format(getattr(self.background, attr), fmt):>12}"
+                )
+
+            return "\n".join([
+                f"Server work of pg4n ({application_name}), "
+                f"{n} queries analyzed, {self.connections} connections "
+                "opened:",
+                f"{'':<16}{'total':>10}{'per query':>10}{'max':>10}"
+                f"{'background':>12}",
+                row("round trips", "round_trips", "d"),
+                row("EXPLAINs", "explains", "d"),
+                row("catalog queries", "catalog_queries", "d"),
+                row("rows", "rows", "d"),
+                row("time (ms)", "server_ms", ".1f"),
+            ])
+
+
+class AccountedConnection(psycopg.Connection):
+    """Connection that counts its rollbacks as round trips."""
+
+    overhead: ServerOverhead
+
+    def rollback(self) -> None:
+        """Roll back, counting the round trip if there was a transaction."""
+        if self.pgconn.transaction_status == TransactionStatus.IDLE:
+            super().rollback()  # nothing is sent
+            return
+        start_ns: int = time.perf_counter_ns()
+        try:
+            super().rollback()
+        finally:
+            self.overhead.record(
+                "", (time.perf_counter_ns() - start_ns) / 1e6, 0
+            )
+
+
+class AccountedCursor(psycopg.Cursor):
+    """Cursor that counts the statements it executes."""
+
+    def execute(self, query: Any, *args: Any, **kwargs: Any) -> Any:
+        """Execute a statement, counting its round trip and rows."""
+        start_ns: int = time.perf_counter_ns()
+        try:
+            return super().execute(query, *args, **kwargs)
+        finally:
+            statement: str = query if isinstance(query, str) \
+                else query.as_string(self)
+            self.connection.overhead.record(
+                statement,
+                (time.perf_counter_ns() - start_ns) / 1e6,
+                self.rowcount,
+            )
@@ -0,0 +1,140 @@
+# Licensed under MIT.
+"""Record terminal sessions into a compact file for replaying them later.
+
+File format: `magic`, then a 4-byte big-endian length and a JSON header with
+the terminal geometry and capture mode, then chunks. Each chunk is an 8-byte
+timestamp in microseconds since recording started, a direction byte (`i` for
+user input, `o` for psql output, `r` for terminal resize, `h` for Return held
+at the cost gate) and a 4-byte length, followed by the chunk itself. A resize
+chunk is the new width and height as 2-byte big-endian numbers. A hold chunk
+is the question pg4n asked, and the Return it held is not recorded as input.
+"""
+
+import json
+import struct
+import time
+from typing import BinaryIO, Iterator
+
+magic: bytes = b"PG4NREC1"
+_header_len: struct.Struct = struct.Struct(">I")
+_chunk_header: struct.Struct = struct.Struct(">QcI")
+_size: struct.Struct = struct.Struct(">HH")
+
+INPUT: bytes = b"i"
+OUTPUT: bytes = b"o"
+RESIZE: bytes = b"r"
+HOLD: bytes = b"h"
+
+
+def unpack_size(chunk: bytes) -> tuple[int, int]:
+    """Get terminal size from a resize chunk.
+
+    :param chunk: is a chunk of direction `RESIZE`.
+    :returns: (columns, lines) tuple.
+    """
+    return _size.unpack(chunk)
+
+
+class SessionRecorder:
+    """Writes input and output chunks of a session as they pass through."""
+
+    def __init__(
+        self,
+        path: str,
+        columns: int,
+        lines: int,
+        capture_mode: str = "screen"
+    ):
+        """Start a new recording, overwriting `path`.
+
+        :param path: is the file to record to.
+        :param columns: is the terminal width.
+        :param lines: is the terminal height.
+        :param capture_mode: is how the wrapper captures queries, one of \
+        `PsqlWrapper.capture_modes`.
+        """
+        self._file: BinaryIO = open(path, "wb")
+        header: bytes = json.dumps(
+            {"columns": columns, "lines": lines, "capture_mode": capture_mode}
+        ).encode("utf-8")
+        self._file.write(magic + _header_len.pack(len(header)) + header)
+        self._start_ns: int = time.monotonic_ns()
+
+    def record_input(self, keys: bytes) -> None:
+        """Record keystrokes read from user's terminal.
+
+        :param keys: raw terminal input.
+        """
+        self._record(INPUT, keys)
+
+    def record_output(self, output: bytes) -> None:
+        """Record output read from psql, before it is intercepted.
+
+        :param output: raw psql output.
+        """
+        self._record(OUTPUT, output)
+
+    def record_resize(self, columns: int, lines: int) -> None:
+        """Record a change in terminal size.
+
+        :param columns: is the new terminal width.
+        :param lines: is the new terminal height.
+        """
+        self._record(RESIZE, _size.pack(columns, lines))
+
+    def record_hold(self, question: str) -> None:
+        """Record Return being held until user answers a question.
+
+        :param question: is what pg4n wrote to user's terminal.
+        """
+        self._record(HOLD, question.encode("utf-8"))
+
+    def _record(self, direction: bytes, chunk: bytes) -> None:
+        timestamp_us: int = (time.monotonic_ns() - self._start_ns) // 1000
+        self._file.write(
+            _chunk_header.pack(timestamp_us, direction, len(chunk)) + chunk
+        )
+
+    def close(self) -> None:
+        """Finish recording."""
+        self._file.close()
+
+
+class SessionReader:
+    """Reads a recorded session."""
+
+    def __init__(self, path: str):
+        """Open recording and read its header.
+
+        :param path: is the recorded file.
+        :raises ValueError: if file is not a session recording.
+        """
+        self._file: BinaryIO = open(path, "rb")
+        if self._file.read(len(magic)) != magic:
+            self._file.close()
+            raise ValueError(f"not a pg4n session recording: '{path}'")
+        (length,) = _header_len.unpack(self._file.read(_header_len.size))
+        header: dict = json.loads(self._file.read(length))
+        self.columns: int = header["columns"]
+        self.lines: int = header["lines"]
+        # recordings made before capture modes were recorded used screen
+        self.capture_mode: str = header.get("capture_mode", "screen")
+
+    def chunks(self) -> Iterator[tuple[int, bytes, bytes]]:
+        """Read chunks in recorded order.
+
+        :returns: an iterator of (timestamp in microseconds, direction, \
+        chunk) tuples. A chunk cut short by an interrupted recording ends \
+        the iteration.
+        """
+        while len(head := self._file.read(_chunk_header.size)) == \
+                _chunk_header.size:
+            timestamp_us, direction, length = _chunk_header.unpack(head)
+            chunk: bytes = self._file.read(length)
+            if len(chunk) < length:
+                return
+            yield timestamp_us, direction, chunk
+
+    def close(self) -> None:
+        """Close recording."""
+        self._file.close()
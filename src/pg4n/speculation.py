@@ -0,0 +1,179 @@
+# Licensed under MIT.
+"""Prepare analysis of a statement while the user is still typing it.
+
+Work is keyed by statement text, so that if the user submits exactly what
+was speculated on, its results are ready (or at least underway) by the time
+Return is pressed. Only the newest statement is worked on: older unfinished
+work is cancelled, and new work is started at most once per `interval`.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class Speculation:
+    """Speculative work on one statement, which can be cancelled while it \
+    is queued or running."""
+
+    def __init__(self, text: str):
+        """Build work that has not started yet.
+
+        :param text: is the statement.
+        """
+        self.text: str = text
+        self.created: float = time.monotonic()
+        self.future: Optional[Future] = None
+        # set when result is wanted right away, or not at all
+        self.hurry: threading.Event = threading.Event()
+        self._cancelled: threading.Event = threading.Event()
+        self._canceller: Optional[Callable[[], None]] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def cancelled(self) -> bool:
+        """Check if the work should stop, as its result is not wanted."""
+        return self._cancelled.is_set()
+
+    def set_canceller(self, canceller: Optional[Callable[[], None]]) -> None:
+        """Set how to interrupt the work that is running, e.g \
+        `psycopg.Connection.cancel`.
+
+        :param canceller: interrupts running work, or None once there is \
+        nothing to interrupt.
+        """
+        with self._lock:
+            self._canceller = canceller
+
+    def cancel(self) -> None:
+        """Stop the work, whether it is queued or running."""
+        self._cancelled.set()
+        self.hurry.set()
+        if self.future is not None:
+            self.future.cancel()
+        with self._lock:
+            if self._canceller is not None:
+                try:
+                    self._canceller()
+                except Exception:  # work stops on its own soon enough
+                    pass
+
+
+class Speculator:
+    """Runs speculative work on a background thread, caching results by \
+    statement text."""
+
+    def __init__(
+        self,
+        work: Callable[[str, Speculation], Any],
+        interval: float = 0.5,
+        max_entries: int = 32,
+        ttl: float = 30.0
+    ):
+        """Build an idle speculator.
+
+        :param work: prepares a statement, checking `Speculation.cancelled` \
+        between steps.
+        :param interval: is the least number of seconds between starting \
+        work on two statements.
+        :param max_entries: is how many results are kept at most.
+        :param ttl: is how many seconds results are kept, as they may go \
+        stale, e.g when a table is altered.
+        """
+        self.work: Callable[[str, Speculation], Any] = work
+        self.interval: float = interval
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self._entries: OrderedDict[str, Speculation] = OrderedDict()
+        self._latest: Optional[Speculation] = None
+        self._next_start: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="pg4n-speculation"
+        )
+
+    @staticmethod
+    def key(text: str) -> str:
+        """Get cache key of a statement, the same whether it was typed on \
+        several indented lines or screen-scraped onto one, i.e with runs of \
+        whitespace as single spaces."""
+        return " ".join(text.split())
+
+    def speculate(self, text: str) -> None:
+        """Start working on a statement, cancelling unfinished work on \
+        other statements. Returns right away.
+
+        :param text: is the statement.
+        """
+        key: str = self.key(text)
+        evicted: list[Speculation] = []
+        with self._lock:
+            if key in self._entries:
+                return
+            # work that has been taken is waited for, and is left running
+            latest: Optional[Speculation] = self._latest
+            if latest is not None and not latest.future.done() and \
+                    self._entries.get(self.key(latest.text)) is latest:
+                evicted.append(self._entries.pop(self.key(latest.text)))
+            speculation = Speculation(text)
+            self._entries[key] = speculation
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+            self._latest = speculation
+            speculation.future = \
+                self._executor.submit(self._run, speculation)
+        for old in evicted:
+            old.cancel()
+
+    def _run(self, speculation: Speculation) -> Any:
+        with self._lock:
+            delay: float = self._next_start - time.monotonic()
+        if delay > 0:
+            speculation.hurry.wait(delay)
+        if speculation.cancelled():
+            return None
+        with self._lock:
+            self._next_start = time.monotonic() + self.interval
+        return self.work(speculation.text, speculation)
+
+    def take(self, text: str) -> Optional[Any]:
+        """Get the result of work on a statement, waiting for the work to \
+        finish if needed. The result is removed from cache.
+
+        :param text: is the statement.
+        :returns: result of the work, or None if statement was not worked \
+        on, the work failed, or the result is too old.
+        """
+        with self._lock:
+            speculation: Optional[Speculation] = \
+                self._entries.pop(self.key(text), None)
+        if speculation is None:
+            return None
+        if time.monotonic() - speculation.created > self.ttl:
+            speculation.cancel()
+            return None
+
+        speculation.hurry.set()
+        try:
+            return speculation.future.result()
+        except Exception:  # including cancellation
+            return None
+
+    def __len__(self) -> int:
+        """Get the number of statements worked on or with results cached."""
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self) -> None:
+        """Cancel all work and forget all results."""
+        with self._lock:
+            speculations = list(self._entries.values())
+            self._entries.clear()
+        for speculation in speculations:
+            speculation.cancel()
+
+    def close(self) -> None:
+        """Cancel all work and stop the background thread."""
+        self.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
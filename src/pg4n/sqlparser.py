@@ -8,6 +8,8 @@ import sqlglot
 import sqlglot.expressions as exp
 from sqlglot.dialects.postgres import Postgres
 
+from .catalogcache import CatalogCache
+
 
 @dataclass(frozen=True)
 class PostgreSQLDataType:
@@ -27,9 +29,15 @@ class SqlParser:
     # Patches the postgres dialect to recognize bpchar
     Postgres.Tokenizer.KEYWORDS["BPCHAR"] = sqlglot.TokenType.CHAR
 
-    def __init__(self, db_connection: psycopg.Connection):
+    def __init__(
+        self,
+        db_connection: psycopg.Connection,
+        catalog_cache: Optional[CatalogCache] = None,
+    ):
         self.dialect: str = "postgres"
         self.db_connection: psycopg.Connection = db_connection
+        # shared with other parsers analyzing statements at the same time
+        self.catalog_cache: Optional[CatalogCache] = catalog_cache
 
     def parse(self, sql: str) -> list[sqlglot.exp.Expression]:
         """
@@ -130,7 +138,18 @@ class SqlParser:
 
     def _get_columns(self, table_name: str) -> list[Column]:
         """
-        Gets the columns from db 'db_name' table 'table_name'.
+        Gets the columns from db 'db_name' table 'table_name', from catalog
+        cache if there is one.
+        """
+        if self.catalog_cache is not None:
+            return self.catalog_cache.get(
+                "columns:" + table_name, lambda: self._load_columns(table_name)
+            )
+        return self._load_columns(table_name)
+
+    def _load_columns(self, table_name: str) -> list[Column]:
+        """
+        Loads the columns of table 'table_name' from database.
         """
         names = self._get_column_names(table_name)
         types = self._get_column_types(table_name, names)
@@ -0,0 +1,70 @@
+"""
+Test AutoExplain.
+"""
+
+from ..autoexplain import AutoExplain
+
+import os
+
+
+plan_notice: bytes = (
+    b'NOTICE:  duration: 0.020 ms  plan:\r\n'
+    b'{\r\n  "Query Text": "SELECT \'}\\" {\' FROM t;",\r\n'
+    b'  "Plan": {\r\n    "Node Type": "Seq Scan",\r\n'
+    b'    "Relation Name": "t"\r\n  }\r\n}\r\n'
+)
+
+
+def test_psqlrc(tmp_path, monkeypatch) -> None:
+    user_psqlrc = tmp_path / "it's.psqlrc"
+    user_psqlrc.write_text("\\set HISTSIZE 100\n")
+    (tmp_path / "it's.psqlrc-14").write_text("\\set HISTSIZE 200\n")
+    monkeypatch.setenv("PSQLRC", str(user_psqlrc))
+
+    auto_explain = AutoExplain("14.5", str(tmp_path))
+    env = auto_explain.psql_env()
+    with open(env["PSQLRC"]) as psqlrc:
+        lines = psqlrc.read().splitlines()
+    assert "LOAD 'auto_explain';" in lines
+    # failing setup is reported once, instead of with errors
+    assert "EXCEPTION WHEN OTHERS THEN NULL;" in lines
+    assert "\\echo '" + AutoExplain.setup_failed_notice + "'" in lines
+    assert lines[-1] == \
+        "\\i '" + str(tmp_path / "it''s.psqlrc-14") + "'"
+
+    auto_explain.close()
+    assert not os.path.exists(auto_explain.dir)
+
+
+def test_feed(tmp_path) -> None:
+    auto_explain = AutoExplain("14.5", str(tmp_path))
+    output = b' ?column? \r\n' + plan_notice + b'(1 row)\r\n\r\npgdb=# '
+    assert auto_explain.feed(output) == \
+        b' ?column? \r\n(1 row)\r\n\r\npgdb=# '
+    plans = auto_explain.take_plans()
+    assert plans[0]["Plan"]["Relation Name"] == "t"
+    assert auto_explain.take_plans() == []
+
+    # notices split anywhere are cut out all the same
+    for split in (3, 20, 50, len(plan_notice) - 1):
+        filtered = auto_explain.feed(b'x\r\n' + plan_notice[:split]) \
+            + auto_explain.feed(plan_notice[split:] + b'y')
+        assert filtered + auto_explain.flush() == b'x\r\ny'
+        assert len(auto_explain.take_plans()) == 1
+
+    # other notices are left alone
+    other = b'NOTICE:  table "t" does not exist, skipping\r\nDROP TABLE\r\n'
+    assert auto_explain.feed(other) == other
+    auto_explain.close()
+
+
+def test_take_plans(tmp_path) -> None:
+    auto_explain = AutoExplain("14.5", str(tmp_path))
+    auto_explain.feed(
+        b'NOTICE:  duration: 0.100 ms  plan:\r\n'
+        b'{"Plan": {"Node Type": "ModifyTable"}}\r\n'
+        + plan_notice
+    )
+    assert [plan["Plan"]["Node Type"]
+            for plan in auto_explain.take_plans()] == ["Seq Scan"]
+    auto_explain.close()
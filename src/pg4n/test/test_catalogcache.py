@@ -0,0 +1,38 @@
+"""Test CatalogCache."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ..catalogcache import CatalogCache
+
+
+def test_loads_once() -> None:
+    cache = CatalogCache()
+    loads: list[str] = []
+    loading = threading.Event()
+
+    def load() -> list[str]:
+        loads.append("orders")
+        loading.wait(1)
+        return ["order_id", "order_total_eur"]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(
+            lambda _: cache.get("orders", load), range(4)
+        ))
+        loading.set()
+    assert loads == ["orders"]
+    assert results == [["order_id", "order_total_eur"]] * 4
+
+
+def test_failed_load_is_not_cached() -> None:
+    cache = CatalogCache()
+
+    def fail() -> None:
+        raise ValueError("no such table")
+
+    with pytest.raises(ValueError):
+        cache.get("orderz", fail)
+    assert cache.get("orderz", lambda: []) == []
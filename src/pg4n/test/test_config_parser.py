@@ -26,6 +26,8 @@ SuBqUeRyOrDeRbY true
 SubquerySelect 0
 SubquerySelect 0
 #
+CaptureMode QueryLog
+StrangeHaving maybe
 """
 
     with TemporaryFile(buffering=0) as tmp_file:
@@ -44,10 +46,45 @@ SubquerySelect 0
             assert config_values["CmpDomain"] == False
             assert config_values["SubqueryOrderBy"] == True
             assert config_values["SubquerySelect"] == False
+            assert config_values["CaptureMode"] == "querylog"
+            assert "StrangeHaving" not in config_values
         except Exception as e:
             assert False, f"{e}"
 
 
+
+def test_parse_sections():
+    CONFIG = """AnalysisMode full
+
+[prod-*/*]
+AnalysisMode plan-only
+AnalysisWorkers 1
+CmpDomain false
+
+ [ */scratch ]
+AnalysisMode ast-only
+Profiles nothing
+"""
+
+    with TemporaryFile(buffering=0) as tmp_file:
+        tmp_file.write(bytes(CONFIG, "utf-8"))
+        tmp_file.seek(0)
+
+        config_values: Optional[ConfigValues] = ConfigParser(tmp_file).parse()
+        assert config_values is not None
+        assert config_values["AnalysisMode"] == "full"
+        assert config_values["Profiles"] == [
+            {
+                "pattern": "prod-*/*",
+                "values": {
+                    "AnalysisMode": "plan-only",
+                    "AnalysisWorkers": 1,
+                    "CmpDomain": False,
+                },
+            },
+            {"pattern": "*/scratch", "values": {"AnalysisMode": "ast-only"}},
+        ]
+
 # TODO: The actual test
 # def test_multiple_option_definition_warings():
 
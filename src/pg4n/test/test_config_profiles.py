@@ -0,0 +1,31 @@
+"""Test config_profiles."""
+
+from ..config_profiles import database_key, for_database
+from ..config_values import ConfigValues
+
+config_values: ConfigValues = {
+    "AnalysisMode": "full",
+    "CmpDomain": True,
+    "Profiles": [
+        {"pattern": "prod-*/*", "values": {"AnalysisMode": "plan-only"}},
+        {"pattern": "*/orders", "values": {"CmpDomain": False}},
+    ],
+}
+
+
+def test_database_key() -> None:
+    assert database_key({"host": "db", "dbname": "orders"}) == "db/orders"
+    assert database_key({"host": "db", "user": "u", "dbname": ""}) == "db/u"
+
+
+def test_for_database() -> None:
+    values = for_database(config_values, {"host": "dev", "dbname": "x"})
+    assert values["AnalysisMode"] == "full"
+    assert values["CmpDomain"]
+
+    values = for_database(config_values, {"host": "prod-1", "dbname": "orders"})
+    assert values["AnalysisMode"] == "plan-only"
+    assert not values["CmpDomain"]
+    # sections are kept, and options read are not changed
+    assert values["Profiles"] == config_values["Profiles"]
+    assert config_values["AnalysisMode"] == "full"
@@ -0,0 +1,72 @@
+"""Test ControlCommands."""
+
+from ..controlcommands import ControlCommands
+from ..semanticrouter import SemanticRouter
+
+
+def test_mode_and_profile() -> None:
+    router = SemanticRouter("", {"AnalysisMode": "full"})
+    commands = ControlCommands(router)
+
+    assert commands.run(["mode"]) == "Analysis mode is full."
+    assert commands.run(["mode", "plan-only"]) == \
+        "Analysis mode is now plan-only."
+    assert router.analysis_mode == "plan-only"
+    assert commands.run(["mode", "fast"]) == ControlCommands.usage
+    assert router.analysis_mode == "plan-only"
+
+    assert commands.run(["profile", "on"]) == "Profiling is on."
+    assert router.profile
+    assert commands.run([]) == ControlCommands.usage
+
+
+def test_checkers() -> None:
+    config_values = {"SumDistinct": False}
+    router = SemanticRouter("", config_values)
+    commands = ControlCommands(router)
+
+    listing: str = commands.run(["checkers"])
+    assert listing.splitlines()[0].split() == ["CmpDomain", "on"]
+    assert "SumDistinct                   off" in listing
+    commands.run(["checkers", "cmpdomain", "off"])
+    assert not router.is_checker_enabled(router.checkers[0])
+    # configuration read from files is not changed
+    assert config_values == {"SumDistinct": False}
+
+
+def test_stats_and_cache() -> None:
+    router = SemanticRouter("", None)
+    commands = ControlCommands(router)
+
+    router.stats.record(12.0, True, False)
+    router.stats.record(4.0, False, True)
+    assert commands.run(["stats"]) == (
+        "mode:        full\n"
+        "analyses:    2 (1 with findings, 1 prepared while typing)\n"
+        "time:        16.0 ms total, 8.0 ms mean, 12.0 ms max\n"
+        "prepared:    0 statements cached"
+    )
+    assert commands.run(["cache", "clear"]) == "Cache cleared."
+
+
+def test_overhead() -> None:
+    router = SemanticRouter("", None)
+    commands = ControlCommands(router)
+
+    with router.overhead.user_query():
+        router.overhead.record("EXPLAIN SELECT 1;", 1.0, 1)
+    assert "1 queries analyzed" in commands.run(["overhead"])
+    assert commands.run(["overhead", "reset"]) == "Overhead counters reset."
+    assert router.overhead.user_queries == 0
+    assert commands.run(["overhead", "now"]) == ControlCommands.usage
+
+
+def test_syntax_checkers() -> None:
+    router = SemanticRouter("", None)
+    commands = ControlCommands(router)
+
+    assert "UndefinedObject               on" in commands.run(["checkers"])
+    commands.run(["checkers", "UndefinedObject", "off"])
+    assert router.run_syntax_analysis(
+        'ERROR:  column "ordr_id" does not exist'
+    ) == ""
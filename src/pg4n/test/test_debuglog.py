@@ -0,0 +1,32 @@
+"""Test DebugLog."""
+
+import logging
+import os
+
+from ..debuglog import DebugLog
+
+
+def test_debug_log(tmp_path) -> None:
+    path: str = str(tmp_path / "pg4n.log")
+
+    # nothing is written unless logging is turned on
+    logging.getLogger("pg4n.parser").info("not logged")
+    debug_log = DebugLog(path, {"stream": "debug", "screen": "off"})
+    logging.getLogger("pg4n.stream").debug("output %r", b"\r\n")
+    logging.getLogger("pg4n.screen").info("snapshot")
+    logging.getLogger("pg4n.parser").info("captured")
+    logging.getLogger("pg4n.parser").debug("parse failure")
+    debug_log.close()
+    logging.getLogger("pg4n.parser").info("not logged either")
+
+    with open(path, encoding="utf-8") as f:
+        lines: list[str] = f.readlines()
+    assert len(lines) == 2
+    assert lines[0].endswith("pg4n.stream DEBUG output b'\\r\\n'\n")
+    assert lines[1].endswith("pg4n.parser INFO captured\n")
+
+
+def test_no_file_without_records(tmp_path) -> None:
+    path: str = str(tmp_path / "pg4n.log")
+    DebugLog(path, {"stream": "off"}).close()
+    assert not os.path.exists(path)
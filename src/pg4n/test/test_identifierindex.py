@@ -0,0 +1,67 @@
+"""Test IdentifierIndex and NameIndex."""
+
+import psycopg
+from psycopg import Connection
+from pytest_postgresql import factories
+
+from ..identifierindex import IdentifierIndex, NameIndex, edit_distance
+
+
+def test_edit_distance() -> None:
+    assert edit_distance("order_id", "order_id") == 0
+    assert edit_distance("ordr_id", "order_id") == 1
+    assert edit_distance("oredr_id", "order_id") == 1  # transposition
+    assert edit_distance("", "abc") == 3
+
+
+def test_name_index() -> None:
+    index = NameIndex()
+    for name in ("order_id", "orders", "customer_id", "order_total_eur"):
+        index.add(name)
+    assert index.similar("ordr_id") == ["order_id"]
+    assert index.similar("Order") == ["orders"]
+    assert index.similar("oredr_id") == ["order_id"]
+    assert index.similar("order_id") == []
+
+    # names shared by several tables are kept until all of them are gone
+    index.add("order_id")
+    index.remove("order_id")
+    assert "order_id" in index
+    index.remove("order_id")
+    assert "order_id" not in index
+    assert index.similar("ordr_id") == []
+    assert len(index) == 3
+
+
+def load_database(**kwargs):
+    conn: Connection = psycopg.connect(**kwargs)
+    with conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE orders (order_id INT, order_total_eur DECIMAL(6,2));
+        CREATE TABLE customers (customer_id INT, fname VARCHAR(50));
+        """)
+        conn.commit()
+
+
+factory = factories.postgresql_proc(
+    load=[load_database],
+)
+postgresql = factories.postgresql("factory")
+
+
+def test_refresh(postgresql: Connection) -> None:
+    identifiers = IdentifierIndex()
+    identifiers.refresh(postgresql)
+    assert identifiers.suggest_relations("public.ordrs") == ["orders"]
+    assert identifiers.suggest_columns("fnam") == ["fname"]
+    assert identifiers.suggest_columns("order_idd", "customers") == []
+
+    with postgresql.cursor() as cur:
+        cur.execute("ALTER TABLE customers RENAME fname TO first_name;")
+        cur.execute("DROP TABLE orders;")
+    postgresql.commit()
+    identifiers.refresh(postgresql)
+    assert identifiers.suggest_relations("ordrs") == []
+    assert identifiers.suggest_columns("first_nam", "customers") == \
+        ["first_name"]
+    assert "fname" not in identifiers.column_names
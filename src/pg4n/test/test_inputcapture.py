@@ -0,0 +1,100 @@
+"""Test InputCapture."""
+
+from ..inputcapture import InputCapture
+from ..psqlparser import PsqlParser
+
+
+def test_typing_and_editing() -> None:
+    c = InputCapture(PsqlParser())
+
+    c.feed_input(b"SELECT * FROM orderz;")
+    # fix typo: left, backspace, type 's'
+    c.feed_input(b"\x1b[D\x7fs")
+    c.feed_input(b"\r")
+    assert c.pop_submitted() == ["SELECT * FROM orders;"]
+
+    # ctrl-A, kill line with ctrl-K and yank it back after typing
+    c.feed_input(b"1 FROM orders;\x01\x0bSELECT \x19\r")
+    assert c.pop_submitted() == ["SELECT 1 FROM orders;"]
+
+    # ctrl-W removes last whitespace-delimited word
+    c.feed_input(b"SELECT * FROM orders WHERE\x17;\r")
+    assert c.pop_submitted() == ["SELECT * FROM orders ;"]
+
+
+def test_multiline_and_meta_commands() -> None:
+    c = InputCapture(PsqlParser())
+
+    c.feed_input(b"SELECT\r*\rFROM orders\r")
+    assert c.pop_submitted() == []
+    c.feed_input(b";\r")
+    assert c.pop_submitted() == ["SELECT\n*\nFROM orders\n;"]
+
+    c.feed_input(b"SELECT 1; SELECT 'a;b'; SELECT\r")
+    assert c.pop_submitted() == ["SELECT 1;", "SELECT 'a;b';"]
+    assert c.query_buffer == "SELECT"
+
+    c.feed_input(b"\\r\r")
+    assert c.pop_submitted() == ["\\r"]
+    assert c.query_buffer == ""
+
+    c.feed_input(b"SELECT 2 \\gx\r")
+    assert c.pop_submitted() == ["SELECT 2"]
+
+    # ctrl-C discards query buffer
+    c.feed_input(b"SELECT 3\r\x03SELECT 4;\r")
+    assert c.pop_submitted() == ["SELECT 4;"]
+
+
+def test_bracketed_paste() -> None:
+    c = InputCapture(PsqlParser())
+
+    c.feed_input(b"\x1b[200~SELECT *\r\nFROM orders;\x1b[201~")
+    assert c.pop_submitted() == []
+    c.feed_input(b"\r")
+    assert c.pop_submitted() == ["SELECT *\nFROM orders;"]
+
+
+def test_history_recall() -> None:
+    c = InputCapture(PsqlParser())
+
+    c.feed_input(b"SELECT * FROM orders;\r")
+    c.pop_submitted()
+
+    # arrow-up to previous query, and edit it
+    c.feed_input(b"\x1b[A")
+    c.feed_output("SELECT * FROM orders;")
+    c.feed_input(b"\x7f WHERE order_id = 1;\r")
+    assert c.pop_submitted() == ["SELECT * FROM orders WHERE order_id = 1;"]
+
+    # recall that is not echoed back as expected is not trusted
+    c.feed_input(b"\x1b[A\r")
+    c.feed_output("SELECT * FROM customers;")
+    assert c.pop_submitted() is None
+
+    # history beyond this session and ctrl-R are not followed
+    c.feed_input(b"\x1b[A\x1b[A\x1b[A\x1b[A\r")
+    assert c.pop_submitted() is None
+    c.feed_input(b"\x12orders\r")
+    assert c.pop_submitted() is None
+
+    # capture recovers once psql is known to have an empty query buffer
+    c.on_new_prompt()
+    c.feed_input(b"SELECT 1;\r")
+    assert c.pop_submitted() == ["SELECT 1;"]
+
+
+def test_typed_stmt() -> None:
+    c = InputCapture(PsqlParser())
+
+    c.feed_input(b"SELECT *\rFROM orders")
+    assert c.typed_stmt() == ""
+    c.feed_input(b";  ")
+    assert c.typed_stmt() == "SELECT *\nFROM orders;"
+    c.feed_input(b"\r")
+    assert c.typed_stmt() == ""
+
+    c.feed_input(b"SELECT 1; SELECT 'a;")
+    assert c.typed_stmt() == ""
+    c.feed_input(b"b';")
+    assert c.typed_stmt() == "SELECT 'a;b';"
@@ -0,0 +1,36 @@
+"""Test LazyRouter."""
+
+import os
+import subprocess
+import sys
+
+from ..lazyrouter import LazyRouter
+from ..psqlconninfo import PsqlConnInfo
+
+
+def test_main_does_not_import_analysis() -> None:
+    src_dir: str = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    imported = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, pg4n.main; "
+         "print(' '.join(m for m in ('sqlglot', 'psycopg') "
+         "if m in sys.modules))"],
+        cwd=src_dir, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert imported == ""
+
+
+def test_run_analysis_waits_for_router() -> None:
+    router = LazyRouter(PsqlConnInfo(["host=/nonexistent dbname=pgdb"]), None)
+    # analysis that cannot connect finds nothing to say
+    assert router.run_analysis("SELECT 1;") == ""
+    assert router._router is not None
+
+
+def test_submit_analyses_before_router() -> None:
+    router = LazyRouter(PsqlConnInfo(["host=/nonexistent dbname=pgdb"]), None)
+    summary = router.submit_analyses(["SELECT 1;", "SELECT 2;"])
+    # started once router is loaded, finding nothing to say
+    assert summary.result(timeout=30) == ""
@@ -0,0 +1,34 @@
+"""Test LoadThrottle."""
+
+from ..loadthrottle import LoadThrottle
+
+
+def test_degrade_and_recover() -> None:
+    throttle = LoadThrottle(10, 1000, lambda: 0)
+    throttle.sample_interval_s = 3600.0
+    throttle._sampled = float("inf")  # no sampling in the background
+    assert throttle.limit("full") == "full"
+
+    throttle.update(15)
+    assert throttle.limit("full") == "plan-only"
+    assert throttle.limit("auto-explain") == "auto-explain"
+    throttle.update(25)
+    assert throttle.limit("full") == "ast-only"
+    assert throttle.describe() == "throttled to ast-only (25 active backends)"
+
+    # level is held for a while even if load drops
+    throttle.update(0)
+    assert throttle.limit("plan-only") == "ast-only"
+    throttle.hold_s = 0.0
+    throttle.update(8)  # not low enough to recover to full
+    assert throttle.limit("full") == "plan-only"
+    throttle.update(4)
+    assert throttle.limit("full") == "full"
+
+
+def test_latency() -> None:
+    throttle = LoadThrottle(0, 1000, lambda: 0)
+    for latency_ms in (1500.0, 1500.0, 100.0):
+        throttle.record(latency_ms)
+    assert throttle.limit("full") == "plan-only"
+    assert LoadThrottle(0, 0, lambda: 0).limit("full") == "full"
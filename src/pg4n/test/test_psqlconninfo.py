@@ -0,0 +1,55 @@
+"""Test PsqlConnInfo."""
+
+from psycopg.conninfo import conninfo_to_dict
+
+from ..psqlconninfo import PsqlConnInfo
+
+
+def conninfo(args: list[str]) -> dict:
+    conn_info = PsqlConnInfo(args).get()
+    assert conn_info is not None
+    return conninfo_to_dict(conn_info)
+
+
+def test_connection_options() -> None:
+    assert conninfo(["-h", "localhost", "-p", "5433", "-U", "bob", "pgdb"]) \
+        == {"host": "localhost", "port": "5433", "user": "bob",
+            "dbname": "pgdb"}
+    assert conninfo(["--host=db.example.com", "--port", "5432",
+                     "-X", "pgdb", "bob"]) == \
+        {"host": "db.example.com", "port": "5432", "user": "bob",
+         "dbname": "pgdb"}
+    # options may come after database name, like in psql
+    assert conninfo(["pgdb", "-U", "bob", "-v", "ON_ERROR_STOP=1"]) == \
+        {"user": "bob", "dbname": "pgdb"}
+    # the rest is left to libpq defaults and environment
+    assert conninfo([]) == {}
+
+
+def test_connection_strings() -> None:
+    assert conninfo(["-h", "localhost",
+                     "dbname=pgdb host=db.example.com"]) == \
+        {"host": "db.example.com", "dbname": "pgdb"}
+    assert conninfo(["-d", "postgresql://bob@db.example.com:5433/pgdb"]) == \
+        {"host": "db.example.com", "port": "5433", "user": "bob",
+         "dbname": "pgdb"}
+    assert conninfo(["service=pgdb"]) == {"service": "pgdb"}
+
+
+def test_known_params() -> None:
+    # parsed like libpq would, without importing it
+    for args in [["-h", "localhost", "-U", "bob", "pgdb"],
+                 ["-h", "localhost", "dbname=pgdb host=db.example.com"],
+                 ["dbname = 'my db' host=db\\ 1 user='bo\\'b'"],
+                 ["-d", "postgresql://bob@db.example.com:5433/pgdb"],
+                 ["postgresql://%2Fvar%2Frun%2Fpostgresql/pgdb?user=bob"],
+                 ["postgresql://[::1]/pgdb"],
+                 ["service=pgdb"], []]:
+        assert PsqlConnInfo(args).known_params() == conninfo(args)
+
+
+def test_noninteractive_options() -> None:
+    for args in [["--help"], ["--help=commands"], ["-?"], ["-V"],
+                 ["--version"], ["-l"], ["-c", "SELECT 1", "pgdb"],
+                 ["pgdb", "-f", "script.sql"], ["--no-such-option"]]:
+        assert PsqlConnInfo(args).get() is None
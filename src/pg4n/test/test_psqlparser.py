@@ -73,3 +73,140 @@ def test_parse_last_stmt() -> None:
         "psql (14.5)\nType \"help\" for help.\n\npgdb=# SELECT * FROM\npgdb-# orders;"
     assert p.parse_last_stmt(case_multiline_query) == \
         "SELECT * FROM  orders;"
+
+    # only lines after the last prompt belong to the statement
+    case_output_looks_like_prompt = \
+        "pgdb=# SELECT 'a=> b';\n ?column? \n----------\n a=> b\n(1 row)\n\npgdb=# SELECT f(x=>1)\npgdb-# FROM orders;"
+    assert p.parse_last_stmt(case_output_looks_like_prompt) == \
+        "SELECT f(x=>1)  FROM orders;"
+
+
+def test_parse_last_stmts() -> None:
+    p = PsqlParser()
+
+    case_pasted_script = \
+        "pgdb=# SELECT 1;\n ?column? \n----------\n        1\n(1 row)\n\npgdb=# SELECT * FROM orders; -- all orders;\nINSERT INTO orders VALUES (6, 6, 6);\nSELECT *\nFROM orders WHERE order_id = 6;\n"
+    assert p.parse_last_stmts(case_pasted_script) == \
+        ["SELECT * FROM orders;", "SELECT * FROM orders WHERE order_id = 6;"]
+
+    case_multiline_query = \
+        "pgdb=# SELECT * FROM\npgdb-# orders; SELECT 2;"
+    assert p.parse_last_stmts(case_multiline_query) == \
+        ["SELECT * FROM  orders;", "SELECT 2;"]
+
+    assert p.parse_last_stmts("pgdb=# INSERT INTO orders VALUES (1);") == []
+
+
+def test_parse_syntax_error() -> None:
+    p = PsqlParser()
+
+    case_syntax_error = \
+        "pgdb=# SELEC * FROM orders;\nERROR:  syntax error at or near \"SELEC\"\nLINE 1: SELEC * FROM orders;\n        ^\npgdb=# "
+    assert p.parse_syntax_error(case_syntax_error) == \
+        "ERROR:  syntax error at or near \"SELEC\"\nLINE 1: SELEC * FROM orders;\n        ^"
+
+    # error of an earlier statement is still on screen
+    case_stale_error = \
+        case_syntax_error + "SELECT 1;\n ?column? \n----------\n        1\n(1 row)\n\npgdb=# "
+    assert p.parse_syntax_error(case_stale_error) == ""
+
+
+def test_grammars_do_not_change_pyparsing_defaults() -> None:
+    from pyparsing import ParserElement
+
+    PsqlParser()
+    assert ParserElement.DEFAULT_WHITE_CHARS == " \n\t\r"
+    assert not ParserElement._packratEnabled
+
+
+def test_parse_include() -> None:
+    p = PsqlParser()
+
+    assert p.parse_include("\\i migration.sql") == "migration.sql"
+    assert p.parse_include("\\include_relative ../up.sql ") == "../up.sql"
+    assert p.parse_include("\\ir 'my ''new'' script.sql'") == \
+        "my 'new' script.sql"
+    assert p.parse_include("\\if :flag") == ""
+    assert p.parse_include("\\i") == ""
+
+    case_meta_command = \
+        "pgdb=# SELECT 1;\n ?column? \n----------\n        1\n(1 row)\n\npgdb=# \\i migration.sql\n\n"
+    assert p.parse_last_meta_command(case_meta_command) == \
+        "\\i migration.sql"
+    assert p.parse_last_meta_command("pgdb=# SELECT 1;\n") == ""
+
+
+def test_parse_query_stats() -> None:
+    p = PsqlParser()
+
+    case_timing = \
+        "pgdb=# SELECT 1; INSERT INTO orders VALUES (6, 6, 6);\n ?column? \n----------\n        1\n(1 row)\n\nTime: 0.345 ms\nINSERT 0 1\nTime: 1012.500 ms (00:01.013)\n"
+    assert p.parse_query_stats(case_timing) == [(0.345, 1), (1012.5, None)]
+
+    case_no_timing = \
+        "pgdb=# SELECT 1;\n(1 row)\n\npgdb=# SELECT * FROM orders;\n order_id \n----------\n(0 rows)\n\n"
+    assert p.parse_query_stats(case_no_timing) == [(None, 0)]
+
+
+def test_parse_explain() -> None:
+    p = PsqlParser()
+
+    assert p.parse_explain_stmt("EXPLAIN ANALYZE SELECT 1;") == "SELECT 1;"
+    assert p.parse_explain_stmt(
+        "explain (analyze, format json)\nselect 1;") == "select 1;"
+    assert p.parse_explain_stmt("EXPLAIN VERBOSE SELECT 1;") == "SELECT 1;"
+    assert p.parse_explain_stmt("EXPLAIN ANALYZE DELETE FROM orders;") == ""
+    assert p.parse_explain_stmt("SELECT 1;") == ""
+    assert p.parse_last_stmts("pgdb=# EXPLAIN SELECT 1; DELETE FROM t;") == \
+        ["EXPLAIN SELECT 1;"]
+
+    case_json_plan = (
+        "pgdb=# EXPLAIN (FORMAT JSON) SELECT 1;\r\n"
+        "       QUERY PLAN        \r\n"
+        "-------------------------\r\n"
+        " [                      +\r\n"
+        "   {                    +\r\n"
+        "     \"Plan\": {          +\r\n"
+        "       \"Node Type\": \"Result\"+\r\n"
+        "     }                  +\r\n"
+        "   }                    +\r\n"
+        " ]\r\n"
+        "(1 row)\r\n\r\n"
+    )
+    assert p.parse_explain_plan(case_json_plan) == \
+        {"Plan": {"Node Type": "Result"}}
+
+    case_text_plan = (
+        "pgdb=# EXPLAIN SELECT 1;\n"
+        "                QUERY PLAN                \n"
+        "------------------------------------------\n"
+        " Result  (cost=0.00..0.01 rows=1 width=4)\n"
+        "(1 row)\n\n"
+    )
+    assert p.parse_explain_plan(case_text_plan) is None
+
+
+def test_parse_connection_change() -> None:
+    p = PsqlParser()
+
+    case_same_server = (
+        'pgdb=# \\c otherdb\n'
+        'You are now connected to database "otherdb" as user "postgres".\n'
+    )
+    assert p.parse_connection_change(case_same_server) == \
+        {"dbname": "otherdb", "user": "postgres"}
+
+    # message is wrapped on screen, losing the space at the wrap
+    case_wrapped = (
+        'pgdb=# \\c otherdb postgres localhost\n'
+        'You are now connected to database "otherdb" as user "postgres" on\n'
+        'host "localhost" (address "::1") at port "5432".\n'
+    )
+    assert p.parse_connection_change(case_wrapped) == \
+        {"dbname": "otherdb", "user": "postgres", "host": "localhost",
+         "port": "5432"}
+
+    assert p.parse_connection_change(
+        case_same_server + 'otherdb=# SELECT 1;\n') is None
+    assert p.parse_prompt_db_name('(1 row)\r\n\x1b[?2004hotherdb=# ') == \
+        "otherdb"
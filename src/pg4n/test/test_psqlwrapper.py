@@ -4,7 +4,13 @@ Test PsqlWrapper, and secondarily PsqlParser.
 
 from ..psqlwrapper import PsqlWrapper
 from ..psqlparser import PsqlParser
+from ..costgate import CostEstimate
+from ..autoexplain import AutoExplain
+from ..querylog import QueryLog
 
+import os
+import threading
+from concurrent.futures import Future
 from shutil import get_terminal_size
 
 
@@ -107,3 +113,586 @@ b'         207.60 |           9\x1b[m\r\n       21 |          471.12 |         1
     assert psql._intercept(b'\x1b[?2004htest_db=# ') == \
         b'\r\nTest\r\n\r\n\x1b[?2004htest_db=# '
     
+
+
+def test_input_capture() -> None:
+    queries: list[str] = []
+
+    def analyze(query: str) -> str:
+        queries.append(query)
+        return "Test"
+
+    psql = PsqlWrapper("",
+                       analyze,
+                       lambda x: "",
+                       PsqlParser(),
+                       {"CaptureMode": "input"})
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+
+    # query typed as two lines, with a typo fixed in between
+    psql._input(b'SELECT * FROM orderz')
+    psql._intercept(b'SELECT * FROM orderz')
+    psql._input(b'\x7fs\r')
+    psql._intercept(b'\x08s\r\n\x1b[?2004l\r\x1b[?2004hpgdb-# ')
+    psql._input(b'WHERE order_total_eur = 100;\r')
+    psql._intercept(b'WHERE order_total_eur = 100;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert queries == \
+        ["SELECT * FROM orders\nWHERE order_total_eur = 100;"]
+    assert psql._intercept(b'\x1b[?2004hpgdb=# ') == \
+        b'\r\nTest\r\n\r\n\x1b[?2004hpgdb=# '
+
+
+def test_query_taller_than_screen() -> None:
+    queries: list[str] = []
+
+    def analyze(query: str) -> str:
+        queries.append(query)
+        return "Test"
+
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser())
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+
+    # multiline query with more lines than the screen has
+    psql._intercept(b'SELECT')
+    lines: int = psql.rows * 2
+    for i in range(lines):
+        psql._intercept(b'\r\n\x1b[?2004l\r\x1b[?2004hpgdb-# ')
+        psql._intercept(bytes(f'{i} AS c{i},', 'utf-8'))
+    psql._intercept(b'\r\n\x1b[?2004l\r\x1b[?2004hpgdb-# ')
+    psql._intercept(b'0 AS last;')
+    psql._intercept(b'\r\n')
+
+    assert queries == \
+        ['SELECT  ' + '  '.join(f'{i} AS c{i},' for i in range(lines))
+         + '  0 AS last;']
+
+    # scrollback is limited, and only kept from the start of the statement
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser(),
+                       {"ScrollbackLines": 2})
+    for i in range(lines):
+        psql._intercept(b'\r\n')
+    assert len(psql.pyte_screen.scrollback) == 2
+    psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert len(psql.pyte_screen.scrollback) == 0
+
+
+def test_results_passthrough() -> None:
+    psql: PsqlWrapper = new_psqlwrapper()
+
+    psql._intercept(b'SELECT * FROM orders WHERE order_total_eur = 100;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert psql.in_results
+
+    # large results are passed through as is, and only their end is kept
+    row: bytes = b'       21 |          471.12 |         179\r\n'
+    results: bytes = row * 1000
+    assert psql._intercept(results) == results
+    assert len(psql.results_tail) == psql.results_tail_len
+
+    assert psql._intercept(b'(21000 rows)\r\n\r\n\x1b[?2004hpgdb=# ') == \
+        b'(21000 rows)\r\n\r\n\r\nTest\r\n\r\n\x1b[?2004hpgdb=# '
+    assert not psql.in_results
+    assert psql.results_tail == b''
+    # results are on the emulated screen where they are on the terminal
+    assert psql.pyte_screen.cursor.y == psql.rows - 1
+    assert psql.pyte_screen.display[-1].startswith("pgdb=# ")
+    assert "(21000 rows)" in [line.rstrip() for line in
+                              psql.pyte_screen.display]
+
+    # results that happen to end like a continuation prompt go on
+    psql._intercept(b'SELECT \'->\';')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    psql._intercept(b' ?column? \r\n----------\r\n -> ')
+    assert psql.in_results
+    psql._intercept(b'\r\n(1 row)\r\n\r\n\x1b[?2004hpgdb=# ')
+    assert not psql.in_results
+    assert [line.rstrip() for line in psql.pyte_screen.display[-10:]] == \
+        ["pgdb=# SELECT '->';", " ?column?", "----------", " ->",
+         "(1 row)", "", "", "Test", "", "pgdb=#"]
+
+    # unless psql's query buffer was left with an incomplete statement
+    continued = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                            {"CaptureMode": "input"})
+    continued._intercept(b'\x1b[?2004hpgdb=# ')
+    continued._input(b'SELECT 1; SELECT')
+    continued._intercept(b'SELECT 1; SELECT')
+    continued._input(b'\r')
+    continued._intercept(b'\r\n\x1b[?2004l\r')
+    assert continued.in_results
+    continued._intercept(b' ?column? \r\n----------\r\n        1\r\n'
+                         b'(1 row)\r\n\r\n\x1b[?2004hpgdb-# ')
+    assert not continued.in_results
+
+    # switch back from pager's alternate screen split between outputs
+    psql._intercept(b'SELECT 1;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    psql._intercept(b'\x1b[?1049h\x1b[22;0;0t\x1b[?1h\x1b=\r ?column? ')
+    assert psql.alt_screen
+    assert psql._intercept(b'\r\x1b[K\x1b>\x1b[r\x1b[?10') == \
+        b'\r\x1b[K\x1b>\x1b[r\x1b[?10'
+    psql._intercept(b'49l')
+    assert not psql.alt_screen
+    assert psql._intercept(b'\x1b[?2004hpgdb=# ') == \
+        b'\r\nTest\r\n\r\n\x1b[?2004hpgdb=# '
+
+
+def test_psql_version_cache(tmp_path, monkeypatch) -> None:
+    # stand-in psql that only knows --version
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    psql_bin = bin_dir / "psql"
+    psql_bin.write_text("#!/bin/sh\necho 'psql (PostgreSQL) 14.5'\n")
+    psql_bin.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    psql: PsqlWrapper = new_psqlwrapper()
+    assert psql._psql_version() == "14.5"
+    assert (tmp_path / "cache" / "pg4n" / psql.psql_version_cache).exists()
+
+    # unchanged binary is not run again
+    stat = os.stat(psql_bin)
+    psql_bin.write_text("#!/bin/sh\necho 'psql (PostgreSQL) 15.1'\n")
+    os.utime(psql_bin, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert psql._psql_version() == "14.5"
+
+    os.utime(psql_bin, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert psql._psql_version() == "15.1"
+    assert psql._check_psql_version() != ""
+
+
+def test_resize() -> None:
+    queries: list[str] = []
+
+    def analyze(query: str) -> str:
+        queries.append(query)
+        return ""
+
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser(),
+                       dimensions=(80, 24))
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    for i in range(10):
+        psql._intercept(b'SELECT 1;\r\n\x1b[?2004l\r')
+        psql._intercept(b' ?column? \r\n----------\r\n        1\r\n(1 row)'
+                        b'\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'SELECT * FROM orders')
+
+    # shorter screen scrolls lines above the cursor off, keeping the query
+    psql.resize(100, 5)
+    psql._intercept(b' WHERE order_total_eur = 100;')
+    assert (psql.pyte_screen.columns, psql.pyte_screen.lines) == (100, 5)
+    assert psql.pyte_screen.cursor.y == 4
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert queries[-1] == \
+        "SELECT * FROM orders WHERE order_total_eur = 100;"
+
+
+def test_multiple_statements() -> None:
+    batches: list[list[str]] = []
+
+    def analyze_batch(queries: list[str]) -> str:
+        batches.append(queries)
+        return "Test"
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       hook_semantic_batch_f=analyze_batch)
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'SELECT 1; INSERT INTO orders VALUES (6, 6, 6);'
+                    b' SELECT 2;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert batches == [["SELECT 1;", "SELECT 2;"]]
+
+
+def test_include_preflight(tmp_path) -> None:
+    script = tmp_path / "migration.sql"
+    script.write_text(
+        "-- migration\n"
+        "CREATE TABLE t (a int);\n"
+        "\\echo copying\n"
+        "SELECT a\n  FROM t;\n"
+        "SELECT 2;\n"
+    )
+    batches: list[list[str]] = []
+
+    def analyze_batch(queries: list[str]) -> str:
+        batches.append(queries)
+        return "Test"
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       hook_semantic_batch_f=analyze_batch)
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(bytes(f"\\i {script}", "utf-8"))
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    # script output is passed through, and summary injected before prompt
+    assert psql._intercept(b'CREATE TABLE\r\ncopying\r\n') == \
+        b'CREATE TABLE\r\ncopying\r\n'
+    psql._preflights[0].result(timeout=5)
+    output = psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert batches == [["SELECT a\n  FROM t;", "SELECT 2;"]]
+    assert bytes(f"{script}:\r\nTest\r\n\r\n", "utf-8") in output
+
+    # missing scripts are left for psql to report
+    psql._intercept(b'\\i missing.sql')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert psql._intercept(b'\x1b[?2004hpgdb=# ') == b'\x1b[?2004hpgdb=# '
+    assert len(batches) == 1
+
+
+def test_include_preflight_does_not_delay_prompt(tmp_path) -> None:
+    script = tmp_path / "report.sql"
+    script.write_text("SELECT 1;\nSELECT 2;\n")
+    analyses: Future = Future()
+    submitted: list[list[str]] = []
+
+    def submit(queries: list[str]) -> Future:
+        submitted.append(queries)
+        return analyses
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       hook_semantic_submit_f=submit)
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(bytes(f"\\i {script}", "utf-8"))
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    # prompt is shown while analysis has not finished
+    assert psql._intercept(b'\x1b[?2004hpgdb=# ') == b'\x1b[?2004hpgdb=# '
+    analyses.set_result("Test")
+    psql._preflights[0].result(timeout=5)
+    assert submitted == [["SELECT 1;", "SELECT 2;"]]
+
+    # and it is reported at the next prompt
+    psql._intercept(b'SELECT 3;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    output = psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert bytes(f"{script}:\r\nTest\r\n\r\n", "utf-8") in output
+    assert psql._preflights == []
+
+
+def test_query_log_overflow() -> None:
+    analyzed: list[str] = []
+
+    def analyze(query: str) -> str:
+        analyzed.append(query)
+        return ""
+
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser(),
+                       {"CaptureMode": "querylog"})
+    psql.query_log = QueryLog()
+    psql.query_log.max_len = 1000
+    try:
+        psql._intercept(
+            b'psql (14.5)\r\nType "help" for help.\r\n\r\n'
+            b'\x1b[?2004hpgdb=# ')
+        # query recalled from history is not known from keystrokes
+        psql._input(b'\x1b[A')
+        psql._intercept(b'SELECT * FROM big;')
+        psql._input(b'\r')
+        psql._intercept(b'\r\n\x1b[?2004l\r')
+        # nothing is analyzed before psql has logged the query
+        assert analyzed == []
+        with open(psql.query_log.path, "ab") as f:
+            f.write(b"********* QUERY **********\n"
+                    b"SELECT * FROM big;\n"
+                    b"**************************\n\n" + b"x\n" * 1000)
+        psql._intercept(b' x \r\n---\r\n x\r\n' * 100)
+        assert os.path.getsize(psql.query_log.path) == 0
+
+        # query is analyzed as captured from screen instead
+        psql._intercept(b'(1000 rows)\r\n\r\n\x1b[?2004hpgdb=# ')
+        assert analyzed == ["SELECT * FROM big;"]
+    finally:
+        psql.query_log.close()
+
+
+def test_speculation() -> None:
+    speculated: list[str] = []
+    typing_paused = threading.Event()
+
+    def speculate(query: str) -> None:
+        speculated.append(query)
+        typing_paused.set()
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       hook_speculate_f=speculate)
+    psql.speculation_delay = 0.05
+    psql._input(b"INSERT INTO orders VALUES (6, 6, 6);")
+    assert psql._speculation_timer is None
+    psql._input(b"\r")
+    psql._input(b"SELECT * FROM orderz;")
+    # keystrokes restart the wait
+    psql._input(b"\x1b[D\x7fs")
+    assert typing_paused.wait(1)
+    assert speculated == ["SELECT * FROM orders;"]
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       {"SpeculativeAnalysis": False},
+                       hook_speculate_f=speculate)
+    psql._input(b"SELECT 1;")
+    assert psql._speculation_timer is None
+
+
+def test_cost_gate(capfd) -> None:
+    estimated: list[str] = []
+
+    def estimate(query: str, budget_ms: int) -> CostEstimate:
+        estimated.append(query)
+        return CostEstimate(rows=2e9, cost=4e7, seq_scan_bytes=3 << 40)
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       {"CostGateRows": 1000000, "CostGateCost": 10 ** 9},
+                       hook_estimate_f=estimate)
+    psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert psql._input(b"SELECT * FROM events;") == b"SELECT * FROM events;"
+    # Return is held until user confirms
+    assert psql._input(b"\r") == b""
+    assert estimated == ["SELECT * FROM events;"]
+    assert "Query is estimated to take 2,000,000,000 rows. " \
+        "Run it anyway? [y/N] " in capfd.readouterr().out
+    assert psql._input(b"y") == b"\r"
+    assert psql.input_capture.pop_submitted() == ["SELECT * FROM events;"]
+
+    # declining has readline redraw the query, which stays in line buffer
+    psql._input(b"SELECT * FROM events;")
+    assert psql._input(b"\r") == b""
+    assert psql._input(b"\r") == b"\x1b1\x0c"
+    assert psql.input_capture.typed_stmt() == "SELECT * FROM events;"
+
+    # non-SELECTs, and queries under thresholds are not held
+    psql._input(b"\x15DELETE FROM events;")
+    assert psql._input(b"\r") == b"\r"
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       {"CostGateSeqScanMB": 4 << 20},
+                       hook_estimate_f=estimate)
+    psql._input(b"SELECT * FROM events;")
+    assert psql._input(b"\r") == b"\r"
+
+
+def test_cost_gate_screen_capture(capfd) -> None:
+    analyzed: list[str] = []
+
+    def analyze(query: str) -> str:
+        analyzed.append(query)
+        return ""
+
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser(),
+                       {"CostGateRows": 1000000},
+                       hook_estimate_f=lambda query, budget_ms: CostEstimate(
+                           rows=2e9, cost=4e7, seq_scan_bytes=0))
+    psql._intercept(b'\x1b[?2004hpgdb=# ')
+    psql._input(b"SELECT * FROM events;")
+    psql._intercept(b"SELECT * FROM events;")
+    assert psql._input(b"\r") == b""
+    assert psql._input(b"y") == b"\r"
+    # question is on screen after the query, which is analyzed still
+    assert "[y/N] y" in psql.pyte_screen.contents()
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert analyzed == ["SELECT * FROM events;"]
+
+
+def test_control_command() -> None:
+    commands: list[list[str]] = []
+
+    def run_command(args: list[str]) -> str:
+        commands.append(args)
+        return "Analysis mode is now plan-only."
+
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       hook_command_f=run_command)
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'\\pg4n mode plan-only')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert commands == [["mode", "plan-only"]]
+    # psql's complaint is replaced with command output
+    assert psql._intercept(
+        b'invalid command \\pg4n\r\nTry \\? for help.\r\n'
+    ) == b''
+    assert psql._intercept(b'\x1b[?2004hpgdb=# ') == \
+        b'\r\nAnalysis mode is now plan-only.\r\n\r\n\x1b[?2004hpgdb=# '
+
+    # other invalid commands are left alone
+    psql._intercept(b'\\pg4x')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert psql._intercept(
+        b'invalid command \\pg4x\r\nTry \\? for help.\r\n'
+    ) == b'invalid command \\pg4x\r\nTry \\? for help.\r\n'
+    assert commands == [["mode", "plan-only"]]
+
+
+def test_query_stats() -> None:
+    analyzed: list[str] = []
+
+    def analyze(query: str) -> str:
+        analyzed.append(query)
+        return ""
+
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser(),
+                       {"LargeResultRows": 1000})
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    for _ in range(2):
+        psql._intercept(b'SELECT * FROM events;')
+        psql._intercept(b'\r\n\x1b[?2004l\r')
+        psql._intercept(b' id \r\n----\r\n  1\r\n(1 row)\r\n\r\n')
+        psql._intercept(b'Time: 0.512 ms\r\n\x1b[?2004hpgdb=# ')
+    # fast query is analyzed only once
+    assert analyzed == ["SELECT * FROM events;"]
+    assert psql.query_stats.runs[-1].runtime_ms == 0.512
+
+    psql._intercept(b'SELECT * FROM big_events;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    psql._intercept(b' id \r\n----\r\n  1\r\n')
+    output = psql._intercept(
+        b'(5000000 rows)\r\n\r\nTime: 4012.000 ms (00:04.012)\r\n'
+        b'\x1b[?2004hpgdb=# ')
+    assert b'Query returned 5,000,000 rows to psql.' in output
+    assert psql.query_stats.report().startswith(
+        "Slowest queries this session:\n    4012.0 ms"
+    )
+
+
+def test_auto_explain(tmp_path) -> None:
+    analyzed: list[tuple[list[str], list[dict]]] = []
+
+    def analyze_planned(queries: list[str], plans: list[dict]) -> str:
+        analyzed.append((queries, plans))
+        return "Planned"
+
+    psql = PsqlWrapper("", lambda x: "Unplanned", lambda x: "", PsqlParser(),
+                       hook_semantic_planned_f=analyze_planned)
+    psql.auto_explain = AutoExplain("14.5", str(tmp_path))
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'SELECT 1;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    # query is analyzed only after psql has run it
+    assert analyzed == []
+    output = psql._intercept(
+        b' ?column? \r\n----------\r\n        1\r\n(1 row)\r\n\r\n'
+        b'NOTICE:  duration: 0.010 ms  plan:\r\n'
+        b'{\r\n  "Plan": {\r\n    "Node Type": "Result"\r\n  }\r\n}\r\n'
+        b'\x1b[?2004hpgdb=# '
+    )
+    assert b'NOTICE' not in output
+    assert b'Planned' in output
+    assert analyzed == [(["SELECT 1;"], [{"Plan": {"Node Type": "Result"}}])]
+    psql.auto_explain.close()
+
+
+def test_auto_explain_not_set_up(tmp_path) -> None:
+    unplanned: list[str] = []
+
+    def analyze(query: str) -> str:
+        unplanned.append(query)
+        return ""
+
+    psql = PsqlWrapper("", analyze, lambda x: "", PsqlParser(),
+                       hook_semantic_planned_f=lambda queries, plans: "",
+                       hook_switch_database_f=lambda params: None)
+    psql.auto_explain = AutoExplain("14.5", str(tmp_path))
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n'
+        + AutoExplain.setup_failed_notice.encode("utf-8")
+        + b'\r\n\x1b[?2004hpgdb=# ')
+    # plans are not waited for
+    assert psql.auto_explain is None
+    psql._intercept(b'SELECT 1;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert unplanned == ["SELECT 1;"]
+
+    # other connections do not have auto_explain loaded
+    psql.auto_explain = AutoExplain("14.5", str(tmp_path))
+    psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert psql.auto_explain is not None
+    psql._intercept(b'\\c otherdb')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    output = psql._intercept(
+        b'You are now connected to database "otherdb" as user '
+        b'"postgres".\r\n\x1b[?2004hotherdb=# ')
+    assert psql.auto_explain is None
+    assert b"auto_explain is only set up on psql's first connection" \
+        in output
+
+
+def test_explain() -> None:
+    analyzed: list[tuple[list[str], list]] = []
+
+    def analyze_planned(queries: list[str], plans: list) -> str:
+        analyzed.append((queries, plans))
+        return "Planned"
+
+    psql = PsqlWrapper("", lambda x: "Executed", lambda x: "", PsqlParser(),
+                       hook_semantic_planned_f=analyze_planned)
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'EXPLAIN (ANALYZE, FORMAT JSON) SELECT 1;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    assert analyzed == []
+    psql._intercept(
+        b'     QUERY PLAN      \r\n---------------------\r\n'
+        b' [                  +\r\n   {"Plan": {"Node Type": "Result"}}+\r\n'
+        b' ]\r\n(1 row)\r\n\r\n')
+    output = psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert b'Planned' in output
+    assert analyzed == [(["SELECT 1;"], [{"Plan": {"Node Type": "Result"}}])]
+
+    # text plans are not parsed, and the query is planned again instead
+    psql._intercept(b'EXPLAIN SELECT 2;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    psql._intercept(
+        b'  QUERY PLAN  \r\n--------------\r\n Result\r\n(1 row)\r\n\r\n'
+        b'\x1b[?2004hpgdb=# ')
+    assert analyzed[-1] == (["SELECT 2;"], [None])
+
+
+def test_switch_database() -> None:
+    switches: list[dict[str, str]] = []
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       hook_switch_database_f=switches.append)
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'\\c otherdb')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    psql._intercept(b'You are now connected to database "otherdb" as user '
+                    b'"postgres".\r\n\x1b[?2004hotherdb=# ')
+    assert switches == [{"dbname": "otherdb", "user": "postgres"}]
+
+    # quiet psql does not report switching, but the prompt changes
+    psql._intercept(b'\\c pgdb')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    psql._intercept(b'\x1b[?2004hpgdb=# ')
+    assert switches[-1] == {"dbname": "pgdb"}
+    assert len(switches) == 2
+
+
+def test_syntax_error() -> None:
+    syntax_errors: list[str] = []
+
+    def analyze_syntax(syntax_error: str) -> str:
+        syntax_errors.append(syntax_error)
+        return "Did you mean" if "ordr_id" in syntax_error else ""
+
+    psql = PsqlWrapper("", lambda x: "", analyze_syntax, PsqlParser())
+    psql._intercept(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    psql._intercept(b'SELECT ordr_id FROM orders;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    output = psql._intercept(
+        b'ERROR:  column "ordr_id" does not exist\r\n'
+        b'LINE 1: SELECT ordr_id FROM orders;\r\n'
+        b'               ^\r\n\x1b[?2004hpgdb=# ')
+    assert syntax_errors[-1].startswith('ERROR:  column "ordr_id"')
+    assert b'Did you mean' in output
+
+    # nothing is injected when there is nothing to say
+    psql._intercept(b'SELEC 1;')
+    psql._intercept(b'\r\n\x1b[?2004l\r')
+    error = (b'ERROR:  syntax error at or near "SELEC"\r\n'
+             b'LINE 1: SELEC 1;\r\n        ^\r\n\x1b[?2004hpgdb=# ')
+    assert psql._intercept(error) == error
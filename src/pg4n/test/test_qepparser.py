@@ -184,3 +184,17 @@ def test_gep_rfind(parser: qepparser.QEPParser):
     assert len(qep.root.rfindval("Node Type", "Bitmap Heap Scan")) == 1
     assert len(qep.root.rfindval("Node Type", "BitmapOr")) == 2
     assert len(qep.root.rfindval("Node Type", "Bitmap Index Scan")) == 4
+
+
+def test_settings_do_not_outlive_query(postgresql: Connection):
+    """Test that the connection is left with its own settings, as it may \
+    be pooled."""
+
+    with postgresql.cursor() as cur:
+        cur.execute("show constraint_exclusion")
+        default = cur.fetchone()[0]
+    parser = qepparser.QEPParser(conn=postgresql, constraint_exclusion=False)
+    parser("select * from stories where id = 1")
+    with postgresql.cursor() as cur:
+        cur.execute("show constraint_exclusion")
+        assert cur.fetchone()[0] == default
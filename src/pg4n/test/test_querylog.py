@@ -0,0 +1,103 @@
+"""Test QueryLog."""
+
+import os
+import tracemalloc
+
+from ..querylog import QueryLog
+
+
+def psql_log(query_log: QueryLog, text: bytes) -> None:
+    # psql opens its log file in append mode
+    with open(query_log.path, "ab") as f:
+        f.write(text)
+
+
+def test_read_queries() -> None:
+    query_log = QueryLog()
+    try:
+        assert query_log.read_queries() == []
+
+        psql_log(query_log,
+                 b"********* QUERY **********\n"
+                 b"SELECT * FROM orders;\n"
+                 b"**************************\n\n"
+                 b" order_id | order_total_eur | customer_id \n"
+                 b"----------+-----------------+-------------\n"
+                 b"(0 rows)\n\n"
+                 b"********* QUERY **********\n"
+                 b"SELECT 1; SELECT\n2;\n"
+                 b"**************************\n\n")
+        assert query_log.read_queries() == \
+            ["SELECT * FROM orders;", "SELECT 1; SELECT\n2;"]
+
+        # log is emptied after reading
+        assert os.path.getsize(query_log.path) == 0
+        assert query_log.read_queries() == []
+
+        # incomplete query is kept until rest of it has been written
+        psql_log(query_log, b"********* QUERY **********\nSELECT 2;")
+        assert query_log.read_queries() == []
+        psql_log(query_log, b"\n**************************\n\n")
+        assert query_log.read_queries() == ["SELECT 2;"]
+    finally:
+        query_log.close()
+    assert not os.path.exists(query_log.dir)
+
+
+def test_read_large_results() -> None:
+    query_log = QueryLog()
+    try:
+        row: bytes = b"  1 | " + b"x" * 100 + b"\n"
+        psql_log(query_log,
+                 b"********* QUERY **********\n"
+                 b"SELECT * FROM big;\n"
+                 b"**************************\n\n")
+        with open(query_log.path, "ab") as f:
+            for _ in range(200):
+                f.write(row * 1000)  # 20 MB of results
+        psql_log(query_log,
+                 b"********* QUERY **********\n"
+                 b"SELECT 1;\n"
+                 b"**************************\n\n")
+
+        tracemalloc.start()
+        try:
+            queries = query_log.read_queries()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert queries == ["SELECT * FROM big;", "SELECT 1;"]
+        # results are not kept in memory
+        assert peak < 4 * query_log.read_len
+    finally:
+        query_log.close()
+
+
+def test_overflow() -> None:
+    query_log = QueryLog()
+    query_log.max_len = 1000
+    try:
+        psql_log(query_log,
+                 b"********* QUERY **********\n"
+                 b"SELECT * FROM big;\n"
+                 b"**************************\n\n" + b"x\n" * 1000)
+        query_log.limit_size()
+        assert os.path.getsize(query_log.path) == 0
+        psql_log(query_log, b"(1000 rows)\n\n")
+        # queries logged before log was emptied are lost
+        assert query_log.read_queries() is None
+        assert os.path.getsize(query_log.path) == 0
+
+        psql_log(query_log,
+                 b"********* QUERY **********\n"
+                 b"SELECT 1;\n"
+                 b"**************************\n\n")
+        assert query_log.read_queries() == ["SELECT 1;"]
+    finally:
+        query_log.close()
+
+
+def test_is_in_use() -> None:
+    assert not QueryLog.is_in_use("-h localhost pgdb")
+    assert QueryLog.is_in_use("-L my.log pgdb")
+    assert QueryLog.is_in_use("--log-file=my.log pgdb")
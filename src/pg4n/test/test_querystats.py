@@ -0,0 +1,42 @@
+"""Test QueryStats."""
+
+from ..querystats import QueryRun, QueryStats, fingerprint
+
+
+def test_fingerprint() -> None:
+    assert fingerprint(
+        "SELECT *\n  FROM orders2 WHERE customer = 'O''Hara' AND "
+        "total > 1.5e3 AND note = $$x$$ AND id IN (1, 2);"
+    ) == "select * from orders2 where customer = ? and total > ? " \
+        "and note = ? and id in (?, ?);"
+
+
+def run(text: str, runtime_ms: float, message: str = "") -> QueryRun:
+    return QueryRun(fingerprint(text), text, runtime_ms, 1, message)
+
+
+def test_fast_repeat() -> None:
+    stats = QueryStats(size=3)
+    stats.record(run("SELECT 1;", 0.5, "Warning"))
+    stats.record(run("SELECT 2;", 500.0))
+    assert stats.fast_repeat("SELECT 1;", 100).message == "Warning"
+    assert stats.fast_repeat("SELECT 2;", 100) is None
+    assert stats.fast_repeat("SELECT 3;", 100) is None
+
+    # only the latest runs are kept
+    stats.record(run("SELECT 3;", 0.5))
+    stats.record(run("SELECT 4;", 0.5))
+    assert stats.fast_repeat("SELECT 1;", 100) is None
+
+
+def test_report() -> None:
+    stats = QueryStats()
+    assert stats.report() == ""
+    stats.record(run("SELECT * FROM orders WHERE id = 1;", 20.0))
+    stats.record(run("SELECT * FROM orders WHERE id = 2;", 30.0))
+    stats.record(run("SELECT 1;", 0.5))
+    assert stats.report(count=1) == (
+        "Slowest queries this session:\n"
+        "      30.0 ms  (2 runs, 50.0 ms total)"
+        "  select * from orders where id = ?;"
+    )
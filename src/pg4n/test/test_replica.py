@@ -0,0 +1,35 @@
+"""Test Replica."""
+
+from psycopg import Connection
+from pytest_postgresql import factories
+
+from ..replica import Replica
+
+
+def test_unusable() -> None:
+    replica = Replica("host=replica dbname=pgdb", 30)
+    assert "connect_timeout=2" in replica.conninfo
+    assert replica.usable()
+    assert replica.describe() == "replica"
+
+    replica.set_unusable("unreachable")
+    assert not replica.usable()
+    assert replica.describe() == "primary (replica unreachable)"
+    # tried again after a while
+    replica._unusable_until = 0.0
+    assert replica.usable()
+
+    assert "connect_timeout=10" in \
+        Replica("host=replica connect_timeout=10", 30).conninfo
+
+
+factory = factories.postgresql_proc()
+postgresql = factories.postgresql("factory")
+
+
+def test_check(postgresql: Connection) -> None:
+    # a database that is not a standby does not lag
+    replica = Replica("", 0)
+    assert replica.check(postgresql)
+    assert replica.lag_s == 0.0
+    assert replica.describe() == "replica (lag 0.0 s)"
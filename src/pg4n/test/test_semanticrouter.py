@@ -0,0 +1,99 @@
+"""Test SemanticRouter."""
+
+import time
+
+from ..semanticrouter import SemanticRouter
+
+
+def test_summarize() -> None:
+    router = SemanticRouter("", None)
+    summary: str = router._summarize(
+        ["SELECT 1;",
+         "SELECT * FROM orders WHERE order_total_eur = 0\n"
+         "AND order_total_eur = 100 AND customer_id = 1;",
+         "SELECT 2;"],
+        ["", "Warning: inconsistent expression", ""]
+    )
+    assert summary == \
+        "[2/3] SELECT * FROM orders WHERE order_total_eur = 0 AND order_...\n" \
+        "Warning: inconsistent expression"
+    assert router._summarize(["SELECT 1;", "SELECT 2;"], ["", ""]) == ""
+
+
+def test_switch_database() -> None:
+    router = SemanticRouter("host=/nonexistent dbname=pgdb", None)
+    pool = router.pool
+    router.switch_database({"dbname": "otherdb"})
+    assert "dbname=otherdb" in router.conninfo
+    assert router.pool is not pool
+    # switching back reuses connections kept for the database
+    router.switch_database({"dbname": "pgdb"})
+    assert router.pool is pool
+
+
+def test_replica() -> None:
+    router = SemanticRouter(
+        "host=primary dbname=pgdb",
+        {"AnalysisDsn": "host=replica dbname=pgdb"}
+    )
+    assert "host=replica" in router.pool.replica.conninfo
+    # other databases on the same server are analyzed on the replica too
+    router.switch_database({"dbname": "otherdb"})
+    assert "host=replica" in router.pool.replica.conninfo
+    assert "dbname=otherdb" in router.pool.replica.conninfo
+    router.switch_database({"host": "elsewhere"})
+    assert router.pool.replica is None
+    assert SemanticRouter("host=primary", None).pool.replica is None
+
+
+def test_profiles() -> None:
+    router = SemanticRouter("host=dev dbname=pgdb", {
+        "AnalysisMode": "full",
+        "Profiles": [{
+            "pattern": "*/reports",
+            "values": {"AnalysisMode": "plan-only", "AnalysisWorkers": 2,
+                       "AnalysisTimeoutMs": 500},
+        }],
+    })
+    assert router.analysis_mode == "full"
+    assert router.workers == router.max_workers
+    router.switch_database({"dbname": "reports"})
+    assert router.analysis_mode == "plan-only"
+    assert router.workers == 2
+    assert router.pool.statement_timeout_ms == 500
+    # runtime changes are kept per database
+    router.analysis_mode = "ast-only"
+    router.switch_database({"dbname": "pgdb"})
+    assert router.analysis_mode == "full"
+    router.switch_database({"dbname": "reports"})
+    assert router.analysis_mode == "ast-only"
+
+
+def test_syntax_analysis_before_indexing() -> None:
+    router = SemanticRouter("host=/nonexistent dbname=pgdb", None)
+    syntax_error = 'ERROR:  relation "ordrs" does not exist'
+    started: float = time.monotonic()
+    router.warm_up()
+    # nothing is suggested while the index has not been built
+    assert router.run_syntax_analysis(syntax_error) == ""
+    assert time.monotonic() - started < 1.0
+
+    identifiers = router.database.identifiers
+    identifiers.relation_names.add("orders")
+    identifiers.refreshed = time.monotonic()
+    assert '"orders"' in router.run_syntax_analysis(syntax_error)
+
+
+def test_background_analyses_do_not_hold_up_prompt() -> None:
+    router = SemanticRouter("host=/nonexistent dbname=pgdb", None)
+    # a script's analyses have taken every slot
+    for _ in range(router.workers):
+        router.database.slots.acquire()
+    summary = router.submit_analyses(["SELECT 1;", "SELECT 2;"])
+    # analyses that cannot connect find nothing to say, without waiting
+    assert router.run_analysis("SELECT 3;") == ""
+    assert router.run_analyses(["SELECT 4;", "SELECT 5;"]) == ""
+    assert not summary.done()
+    for _ in range(router.workers):
+        router.database.slots.release()
+    assert summary.result(timeout=30) == ""
@@ -0,0 +1,28 @@
+"""Test ServerOverhead."""
+
+from ..serveroverhead import ServerOverhead, Tally
+
+
+def test_record() -> None:
+    overhead = ServerOverhead()
+    with overhead.user_query() as tally:
+        overhead.record("EXPLAIN (FORMAT JSON) SELECT 1;", 2.0, 1)
+        overhead.record(
+            "SELECT column_name FROM information_schema.columns;", 1.0, 3
+        )
+        overhead.record("", 0.5, 0)  # rollback
+    assert tally == Tally(3, 1, 1, 4, 3.5)
+    with overhead.user_query():
+        overhead.record("EXPLAIN ANALYZE SELECT 1;", 5.0, 1)
+    # work done while typing is not counted against user queries
+    overhead.record("SELECT 1;", 1.0, 1)
+
+    assert overhead.user_queries == 2
+    assert overhead.total == Tally(4, 2, 1, 5, 8.5)
+    assert overhead.max == Tally(3, 1, 1, 4, 5.0)
+    assert overhead.background == Tally(1, 0, 0, 1, 1.0)
+    assert overhead.summary().splitlines()[2].split() == \
+        ["round", "trips", "4", "2.0", "3", "1"]
+
+    overhead.reset()
+    assert overhead.total == Tally()
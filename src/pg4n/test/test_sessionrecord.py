@@ -0,0 +1,120 @@
+"""Test SessionRecorder, SessionReader and replay."""
+
+from ..costgate import CostEstimate
+from ..psqlparser import PsqlParser
+from ..psqlwrapper import PsqlWrapper
+from ..replay import replay
+from ..sessionrecord import (HOLD, INPUT, OUTPUT, RESIZE, SessionReader,
+                             SessionRecorder, unpack_size)
+
+
+def record_session(path: str, capture_mode: str = "screen",
+                   echo: bytes = b'SELECT 1;') -> None:
+    recorder = SessionRecorder(path, 80, 24, capture_mode)
+    recorder.record_output(
+        b'psql (14.5)\r\nType "help" for help.\r\n\r\n\x1b[?2004hpgdb=# ')
+    recorder.record_input(b'SELECT 1;')
+    recorder.record_resize(100, 30)
+    recorder.record_output(echo)
+    recorder.record_input(b'\r')
+    recorder.record_output(b'\r\n\x1b[?2004l\r')
+    recorder.record_output(
+        b' ?column? \r\n----------\r\n        1\r\n(1 row)\r\n\r\n'
+        b'\x1b[?2004hpgdb=# ')
+    recorder.close()
+
+
+def test_record_and_read(tmp_path) -> None:
+    path: str = str(tmp_path / "session.rec")
+    record_session(path)
+
+    reader = SessionReader(path)
+    chunks = list(reader.chunks())
+    reader.close()
+    assert (reader.columns, reader.lines) == (80, 24)
+    assert reader.capture_mode == "screen"
+    assert [direction for _, direction, _ in chunks] == \
+        [OUTPUT, INPUT, RESIZE, OUTPUT, INPUT, OUTPUT, OUTPUT]
+    assert chunks[1][2] == b'SELECT 1;'
+    assert unpack_size(chunks[2][2]) == (100, 30)
+    timestamps = [timestamp for timestamp, _, _ in chunks]
+    assert timestamps == sorted(timestamps)
+
+    # interrupted recording is read up to the last complete chunk
+    with open(path, "rb+") as f:
+        f.truncate(f.seek(0, 2) - 1)
+    reader = SessionReader(path)
+    assert len(list(reader.chunks())) == 6
+    reader.close()
+
+
+def test_replay(tmp_path) -> None:
+    path: str = str(tmp_path / "session.rec")
+    record_session(path)
+
+    report = replay(path, inject="Test")
+    assert report.queries == ["SELECT 1;"]
+    assert report.injected == ["Test"]
+    assert len(report.latencies_ns) == 4
+    assert report.input_bytes == len(b'SELECT 1;\r')
+
+    assert replay(path).injected == []
+
+
+def test_replay_resize(tmp_path, monkeypatch) -> None:
+    path: str = str(tmp_path / "session.rec")
+    record_session(path)
+    sizes: list[tuple[int, int]] = []
+    resize = PsqlWrapper.resize
+
+    def record_size(psql: PsqlWrapper, cols: int, rows: int) -> None:
+        sizes.append((cols, rows))
+        resize(psql, cols, rows)
+
+    monkeypatch.setattr(PsqlWrapper, "resize", record_size)
+    assert replay(path).queries == ["SELECT 1;"]
+    assert sizes == [(100, 30)]
+
+
+def test_replay_capture_mode(tmp_path) -> None:
+    # keystrokes differ from what psql echoed, showing which one is captured
+    path: str = str(tmp_path / "session.rec")
+    record_session(path, echo=b'SELECT 2;')
+    assert replay(path).queries == ["SELECT 2;"]
+
+    record_session(path, "input", echo=b'SELECT 2;')
+    assert replay(path).queries == ["SELECT 1;"]
+
+
+def test_replay_cost_gate(tmp_path, capfd) -> None:
+    path: str = str(tmp_path / "session.rec")
+    psql = PsqlWrapper("", lambda x: "", lambda x: "", PsqlParser(),
+                       {"CostGateRows": 1000000},
+                       hook_estimate_f=lambda query, budget_ms: CostEstimate(
+                           rows=2e9, cost=4e7, seq_scan_bytes=0))
+    psql.recorder = SessionRecorder(path, 80, 24)
+    psql._record_and_intercept(b'\x1b[?2004hpgdb=# ')
+    psql._input(b'SELECT 1;')
+    psql._record_and_intercept(b'SELECT 1;')
+    assert psql._input(b'\r') == b''
+    assert psql._input(b'y') == b'\r'
+    psql._record_and_intercept(b'\r\n\x1b[?2004l\r')
+    psql._record_and_intercept(
+        b' ?column? \r\n----------\r\n        1\r\n(1 row)\r\n\r\n'
+        b'\x1b[?2004hpgdb=# ')
+    psql.recorder.close()
+    capfd.readouterr()
+
+    # held Return is recorded with the question, and the answer as input
+    reader = SessionReader(path)
+    chunks = list(reader.chunks())
+    reader.close()
+    assert [direction for _, direction, _ in chunks] == \
+        [OUTPUT, INPUT, OUTPUT, HOLD, INPUT, OUTPUT, OUTPUT]
+    assert b"Run it anyway? [y/N] " in chunks[3][2]
+
+    # answer is not taken for typing, and the question is not written out
+    report = replay(path)
+    assert report.queries == ["SELECT 1;"]
+    assert report.input_bytes == len(b'SELECT 1;y')
+    assert capfd.readouterr().out == ""
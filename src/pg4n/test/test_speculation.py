@@ -0,0 +1,72 @@
+"""Test Speculator."""
+
+import threading
+
+from ..speculation import Speculation, Speculator
+
+
+def test_take_waits_for_work() -> None:
+    started = threading.Event()
+
+    def work(text: str, speculation: Speculation) -> str:
+        started.set()
+        return text.upper()
+
+    speculator = Speculator(work, interval=0)
+    speculator.speculate("select 1\nfrom t;")
+    assert started.wait(1)
+    # typed on several lines, screen-scraped on one
+    assert speculator.take("select 1 from t;") == "SELECT 1\nFROM T;"
+    # results are only used once
+    assert speculator.take("select 1 from t;") is None
+    assert speculator.take("select 2;") is None
+
+    # whitespace of continuation lines differs once prompts are stripped
+    speculator.speculate("select a,\n       b\n  from t\twhere a = 1;")
+    assert speculator.take("select a, b\nfrom t where a = 1; ") == \
+        "SELECT A,\n       B\n  FROM T\tWHERE A = 1;"
+    speculator.close()
+
+
+def test_newer_statement_cancels_unfinished_work() -> None:
+    running = threading.Event()
+    interrupted = threading.Event()
+    texts: list[str] = []
+
+    def work(text: str, speculation: Speculation) -> str:
+        texts.append(text)
+        if text == "select 1;":
+            speculation.set_canceller(interrupted.set)
+            running.set()
+            interrupted.wait(1)
+            speculation.set_canceller(None)
+        return text
+
+    speculator = Speculator(work, interval=0)
+    speculator.speculate("select 1;")
+    assert running.wait(1)
+    speculator.speculate("select 12;")
+    assert interrupted.is_set()
+    assert speculator.take("select 12;") == "select 12;"
+    assert speculator.take("select 1;") is None
+    assert texts == ["select 1;", "select 12;"]
+    speculator.close()
+
+
+def test_rate_limit() -> None:
+    texts: list[str] = []
+
+    def work(text: str, speculation: Speculation) -> str:
+        texts.append(text)
+        return text
+
+    speculator = Speculator(work, interval=60)
+    speculator.speculate("select 1;")
+    assert speculator.take("select 1;") == "select 1;"
+    # queued work waits for its turn, and is superseded meanwhile
+    speculator.speculate("select 12;")
+    speculator.speculate("select 123;")
+    # unless its result is wanted right away
+    assert speculator.take("select 123;") == "select 123;"
+    assert texts == ["select 1;", "select 123;"]
+    speculator.close()
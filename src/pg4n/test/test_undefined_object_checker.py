@@ -0,0 +1,50 @@
+"""Test UndefinedObjectChecker."""
+
+from ..identifierindex import IdentifierIndex
+from ..undefined_object_checker import UndefinedObjectChecker
+
+
+def new_identifiers() -> IdentifierIndex:
+    identifiers = IdentifierIndex()
+    for relation in ("orders", "customers"):
+        identifiers.relation_names.add(relation)
+    for column in ("order_id", "order_total_eur", "customer_id"):
+        identifiers.column_names.add(column)
+    return identifiers
+
+
+def test_check() -> None:
+    identifiers = new_identifiers()
+
+    column_error = (
+        'ERROR:  column "ordr_id" does not exist\n'
+        'LINE 1: SELECT ordr_id FROM orders;\n'
+        '               ^'
+    )
+    checker = UndefinedObjectChecker(column_error, identifiers)
+    assert checker.is_undefined_object()
+    assert checker.check() == (
+        'Warning: Column "ordr_id" does not exist. Did you mean "order_id"? '
+        '[pg4n::UndefinedObject]'
+    )
+
+    relation_error = (
+        'ERROR:  relation "public.ordrs" does not exist\n'
+        'LINE 1: SELECT * FROM public.ordrs;\n'
+        '                      ^'
+    )
+    assert UndefinedObjectChecker(relation_error, identifiers).check() == (
+        'Warning: Relation "public.ordrs" does not exist. Did you mean '
+        '"orders"? [pg4n::UndefinedObject]'
+    )
+
+    qualified_error = 'ERROR:  column o.customer_ie does not exist\n^'
+    assert '"customer_id"' in \
+        UndefinedObjectChecker(qualified_error, identifiers).check()
+
+    nothing_similar = 'ERROR:  column "xyz" does not exist\n^'
+    assert UndefinedObjectChecker(nothing_similar, identifiers).check() is None
+
+    syntax_error = 'ERROR:  syntax error at or near "FORM"\n^'
+    assert not UndefinedObjectChecker(
+        syntax_error, identifiers).is_undefined_object()
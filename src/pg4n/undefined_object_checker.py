@@ -0,0 +1,65 @@
+import re
+from typing import Optional
+
+from .errfmt import ErrorFormatter
+from .identifierindex import IdentifierIndex
+
+
+class UndefinedObjectChecker:
+    # per errorMissingColumn and parserOpenTable in postgres
+    # backend/parser/parse_relation.c, and transformInsertStmt's
+    # checkInsertTargets in analyze.c
+    undefined_column: re.Pattern = re.compile(
+        r'column (?:"(?P<column>[^"]+)"(?: of relation "(?P<relation>[^"]+)")?'
+        r'|(?P<qualifier>[^\s".]+)\.(?P<qualified_column>\S+)) does not exist'
+    )
+    undefined_relation: re.Pattern = \
+        re.compile(r'relation "(?P<relation>[^"]+)" does not exist')
+
+    def __init__(self, syntax_error: str, identifiers: IdentifierIndex):
+        self.syntax_error = syntax_error
+        self.identifiers = identifiers
+
+    def is_undefined_object(self) -> bool:
+        """
+        Returns if the error is about a column or relation that does not
+        exist.
+        """
+        return self.undefined_column.search(self.syntax_error) is not None \
+            or self.undefined_relation.search(self.syntax_error) is not None
+
+    def check(self) -> Optional[str]:
+        """
+        Returns warning message with the closest existing identifiers, if the
+        error is about an undefined column or relation, otherwise None.
+        """
+
+        column_match = self.undefined_column.search(self.syntax_error)
+        if column_match is not None:
+            name = column_match.group("column") \
+                or column_match.group("qualified_column")
+            relation = column_match.group("relation") \
+                or column_match.group("qualifier")
+            kind = "Column"
+            suggestions = self.identifiers.suggest_columns(name, relation)
+        else:
+            relation_match = self.undefined_relation.search(self.syntax_error)
+            if relation_match is None:
+                return None
+            name = relation_match.group("relation")
+            kind = "Relation"
+            suggestions = self.identifiers.suggest_relations(name)
+
+        if suggestions == []:
+            return None
+
+        quoted = [f'"{suggestion}"' for suggestion in suggestions]
+        alternatives = quoted[0] if len(quoted) == 1 \
+            else ", ".join(quoted[:-1]) + " or " + quoted[-1]
+        warning = f'{kind} "{name}" does not exist. Did you mean {alternatives}?'
+        warning_name = type(self).__name__.rstrip("Checker")
+
+        formatter = ErrorFormatter(warning, warning_name)
+        warning_msg = formatter.format()
+
+        return warning_msg